@@ -3,9 +3,17 @@ import os
 import re
 import json
 import logging
+import threading
 import traceback
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from report_index import ReportIndex, parse_report_name
+from report_store import ReportStore, diff_summaries, encode_variants
+from jobs import JobManager, QueueFull, WORKERS as JOB_WORKERS
+from scheduler import Scheduler, DEFAULT_INTERVAL
+from recon import metrics
 
 # === Paths ===
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -24,6 +32,15 @@ logging.basicConfig(
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
+# domain -> reports ordered by time; kept current by save_report()
+REPORT_INDEX = ReportIndex(REPORTS_DIR)
+# gzip reports, stored as deltas against the previous scan of the same domain unless disabled
+REPORT_STORE = ReportStore(REPORTS_DIR, REPORT_INDEX, delta=os.environ.get("CYBERRECON_DELTA_REPORTS", "1") != "0")
+# parsed/serialised reports kept in memory; reports never change once written, so no invalidation
+REPORT_CACHE_SIZE = int(os.environ.get("CYBERRECON_REPORT_CACHE", "64"))
+# summary.json used to be rewritten on every scan; /summary now serves the latest report instead
+WRITE_SUMMARY_JSON = os.environ.get("CYBERRECON_WRITE_SUMMARY_JSON", "0") == "1"
+
 # Domain validation (simple)
 DOMAIN_REGEX = re.compile(r"^(?!-)(?:[a-zA-Z0-9-]{1,63}\.)+[a-zA-Z]{2,}$")
 def is_valid_domain(domain: str) -> bool:
@@ -31,10 +48,10 @@ def is_valid_domain(domain: str) -> bool:
 
 # Import your real scan builder
 try:
-    from scan_parser import build_summary_for_domain, write_summary_file
+    from scan_parser import build_summary_for_domain, build_summaries, write_summary_file
 except Exception:
     # Minimal fallback so the app still runs if scan_parser missing; replace as needed.
-    def build_summary_for_domain(domain):
+    def build_summary_for_domain(domain, refresh=False):
         return {
             "domain": domain,
             "scan_time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
@@ -46,10 +63,24 @@ except Exception:
             "snapshot": {},
             "status": "fallback"
         }
+    def build_summaries(domains, refresh=False, **kwargs):
+        for domain in domains:
+            yield build_summary_for_domain(domain, refresh=refresh)
     def write_summary_file(summary, out_path):
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(summary, f, indent=2, ensure_ascii=False, default=str)
 
+def save_report(summary):
+    """Store the timestamped report and return its file name."""
+    report_name = REPORT_STORE.save(summary)
+
+    if WRITE_SUMMARY_JSON:
+        # compatibility summary.json at project root
+        write_summary_file(summary, out_path=os.path.join(BASE_DIR, "summary.json"))
+
+    logging.info(f"Saved report: {report_name}")
+    return report_name
+
 # --- Routes ---
 
 @app.route("/", methods=["GET"])
@@ -67,53 +98,321 @@ def scan():
 
     logging.info(f"Starting scan for {target}")
     try:
-        summary = build_summary_for_domain(target)
-
-        # timestamped report
-        ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        report_name = f"{target}_{ts}.json"
-        report_path = os.path.join(REPORTS_DIR, report_name)
-        write_summary_file(summary, out_path=report_path)
-
-        # also write compatibility summary.json at project root
-        write_summary_file(summary, out_path=os.path.join(BASE_DIR, "summary.json"))
-
-        logging.info(f"Saved report: {report_path}")
+        # "refresh": true, or a list of module names, bypasses the result cache
+        summary = build_summary_for_domain(target, refresh=data.get("refresh") or False)
+        report_name = save_report(summary)
         return jsonify({"ok": True, "summary": summary, "report_file": f"/reports/{report_name}"})
     except Exception as e:
         tb = traceback.format_exc()
         logging.error(f"Scan error for {target}: {tb}")
         return jsonify({"ok": False, "error": str(e), "traceback_preview": tb.splitlines()[-10:]}), 500
 
+# === Async scan jobs ===
+def _run_job(job):
+    def on_result(domain, module, result, cached):
+        job.emit("module", {"module": module, "cached": cached, "result": result})
+
+    summary = None
+    for summary in build_summaries([job.domain], max_workers=5, refresh=job.refresh,
+                                   on_result=on_result, cancel=job.cancel_event):
+        pass
+    if summary is None:
+        return  # cancelled before completing
+    job.summary = summary
+    job.report_file = f"/reports/{save_report(summary)}"
+    job.emit("summary", {"summary": summary, "report_file": job.report_file})
+
+JOBS = JobManager(_run_job)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a scan and return immediately; follow it via /jobs/<id>/events (SSE)."""
+    data = request.get_json() or {}
+    target = (data.get("target") or "").strip().lower()
+    if not target:
+        return jsonify({"ok": False, "error": "No target provided"}), 400
+    if not is_valid_domain(target):
+        return jsonify({"ok": False, "error": "Invalid domain format"}), 400
+    try:
+        job = JOBS.submit(target, refresh=data.get("refresh") or False)
+    except QueueFull as e:
+        return jsonify({"ok": False, "error": str(e)}), 503, {"Retry-After": "10"}
+    logging.info(f"Queued scan job {job.id} for {target}")
+    return jsonify({
+        "ok": True,
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }), 202
+
+@app.route("/jobs", methods=["GET"])
+def job_stats():
+    return jsonify({"ok": True, **JOBS.stats()})
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+    return jsonify({"ok": True, **job.to_dict()})
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = JOBS.cancel(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+    return jsonify({"ok": True, **job.to_dict(with_summary=False)})
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Server-sent events: status changes, one `module` event per finished module, then `summary`."""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+
+    def stream():
+        sent = 0
+        while True:
+            events, finished = job.wait_events(sent)
+            for event, data in events:
+                yield _sse(event, data)
+            sent += len(events)
+            if finished and not events:
+                yield _sse("end", {"status": job.status})
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# === Watch list: recurring scans ===
+def _run_watched(domain, refresh):
+    summary = build_summary_for_domain(domain, refresh=refresh)
+    return save_report(summary)
+
+SCHEDULER = Scheduler(_run_watched)
+SCHEDULER_ENABLED = os.environ.get("CYBERRECON_SCHEDULER", "1") != "0"
+
+@app.before_request
+def start_scheduler():
+    # started by the process that serves requests, not at import: the debug reloader's
+    # watcher process imports this module too and would run every watched scan twice
+    if SCHEDULER_ENABLED:
+        SCHEDULER.start()
+
+@app.route("/watch", methods=["GET"])
+def list_watch():
+    return jsonify({"ok": True, "targets": SCHEDULER.targets(), **SCHEDULER.stats()})
+
+@app.route("/watch", methods=["POST"])
+def add_watch():
+    """
+    Re-scan a domain every `interval` seconds (default daily, +/-10% jitter).
+    Body: {"target": "a.com", "interval": 86400, "refresh": true, "overlap": "skip"|"merge"}.
+    """
+    data = request.get_json() or {}
+    target = (data.get("target") or "").strip().lower()
+    if not target:
+        return jsonify({"ok": False, "error": "No target provided"}), 400
+    if not is_valid_domain(target):
+        return jsonify({"ok": False, "error": "Invalid domain format"}), 400
+    try:
+        interval = float(data.get("interval", DEFAULT_INTERVAL))
+        t = SCHEDULER.add(target, interval=interval, refresh=data.get("refresh", True),
+                          overlap=data.get("overlap", "skip"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    logging.info(f"Watching {target} every {t.interval:.0f}s")
+    return jsonify({"ok": True, **t.to_dict()})
+
+@app.route("/watch/<domain>", methods=["DELETE"])
+def remove_watch(domain):
+    if not SCHEDULER.remove(domain.lower()):
+        return jsonify({"ok": False, "error": "Not watched"}), 404
+    return jsonify({"ok": True})
+
+@app.route("/watch/<domain>/run", methods=["POST"])
+def run_watch_now(domain):
+    t = SCHEDULER.run_now(domain.lower())
+    if t is None:
+        return jsonify({"ok": False, "error": "Not watched"}), 404
+    return jsonify({"ok": True, **t.to_dict()}), 202
+
+@app.route("/scan/batch", methods=["POST"])
+def scan_batch():
+    """
+    Scan many domains on one shared worker pool.
+    Body: {"targets": ["a.com", "b.com"], "refresh": false}. Responds with NDJSON, one line per
+    domain, streamed as each summary completes.
+    """
+    data = request.get_json() or {}
+    targets = (data.get("targets") if isinstance(data, dict) else None) or []
+    if not isinstance(targets, list):
+        return jsonify({"ok": False, "error": "targets must be a list of domains"}), 400
+    # anything that isn't a string can't be a domain: report it rather than fail on .strip()
+    invalid = [t for t in targets if not isinstance(t, str)]
+    if invalid:
+        return jsonify({"ok": False, "error": "Invalid domain format", "invalid": invalid}), 400
+    targets = [t for t in dict.fromkeys(t.strip().lower() for t in targets) if t]
+    if not targets:
+        return jsonify({"ok": False, "error": "No targets provided"}), 400
+    invalid = [t for t in targets if not is_valid_domain(t)]
+    if invalid:
+        return jsonify({"ok": False, "error": "Invalid domain format", "invalid": invalid}), 400
+
+    refresh = data.get("refresh") or False
+    logging.info(f"Starting batch scan for {len(targets)} targets")
+
+    def generate():
+        for summary in build_summaries(targets, refresh=refresh):
+            line = {"ok": True, "summary": summary}
+            try:
+                line["report_file"] = f"/reports/{save_report(summary)}"
+            except Exception as e:
+                logging.error(f"Could not save report for {summary['domain']}: {e}")
+            yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+        logging.info(f"Batch scan finished ({len(targets)} targets)")
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+# === Report serving ===
+class ReportCache:
+    """LRU of report name -> HTTP variants, plus the parsed summary and rendered page on first use."""
+
+    def __init__(self, size: int = REPORT_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._building = {}  # name -> Future: concurrent first requests share one build
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> dict:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                return entry
+            fut = self._building.get(name)
+            owner = fut is None
+            if owner:
+                fut = self._building[name] = Future()
+        if not owner:
+            return fut.result()
+        try:
+            entry = REPORT_STORE.http_variants(name)
+        except BaseException as e:
+            with self._lock:
+                self._building.pop(name, None)
+            fut.set_exception(e)
+            raise
+        with self._lock:
+            self._building.pop(name, None)
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        fut.set_result(entry)
+        return entry
+
+    def summary(self, name: str) -> dict:
+        entry = self.get(name)
+        if "summary" not in entry:
+            entry["summary"] = json.loads(entry["json"])
+        return entry["summary"]
+
+REPORT_CACHE = ReportCache()
+
+def _latest_name(domain=None):
+    REPORT_INDEX.refresh()
+    return REPORT_INDEX.latest(domain)
+
+def _latest_report(domain=None):
+    name = _latest_name(domain)
+    if name is None:
+        return None
+    return REPORT_CACHE.summary(name)
+
+def _cached_response(variants, mimetype, immutable=False):
+    """
+    Serve precompressed bytes with a strong ETag and Last-Modified: 304 when the client's
+    copy is current, otherwise the best encoding it accepts (br > gzip > identity).
+    """
+    accepts = request.accept_encodings
+    if variants.get("br") is not None and accepts["br"]:
+        body, encoding = variants["br"], "br"
+    elif accepts["gzip"]:
+        body, encoding = variants["gzip"], "gzip"
+    else:
+        body, encoding = variants["json"], None
+    resp = Response(body, mimetype=mimetype)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    # one strong ETag per representation, so caches never mix up encodings
+    resp.set_etag(variants["etag"] + (f"-{encoding}" if encoding else ""))
+    resp.last_modified = variants["last_modified"]
+    resp.vary.add("Accept-Encoding")
+    # a report file never changes; "latest" views must revalidate to see new scans
+    resp.cache_control.public = True
+    if immutable:
+        resp.cache_control.max_age = 365 * 24 * 3600
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+def _report_response(name, immutable=False):
+    return _cached_response(REPORT_CACHE.get(name), "application/json", immutable=immutable)
+
 @app.route("/reports", methods=["GET"])
 def list_reports():
-    files = sorted([f for f in os.listdir(REPORTS_DIR) if f.endswith(".json")], reverse=True)
-    reports = [{"name": f, "url": f"/reports/{f}"} for f in files]
-    return jsonify({"ok": True, "reports": reports})
+    """
+    Newest-first report listing.
+    Query params: domain (exact match), since/until (YYYYmmdd[_HHMMSS]), page, per_page.
+    """
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(500, max(1, int(request.args.get("per_page", 50))))
+    except ValueError:
+        return jsonify({"ok": False, "error": "page and per_page must be integers"}), 400
+
+    REPORT_INDEX.refresh()
+    total, rows = REPORT_INDEX.query(
+        domain=(request.args.get("domain") or "").strip().lower() or None,
+        since=request.args.get("since"),
+        until=request.args.get("until"),
+        offset=(page - 1) * per_page,
+        limit=per_page,
+    )
+    reports = [{"name": name, "url": f"/reports/{name}", "domain": domain, "timestamp": ts} for name, domain, ts in rows]
+    return jsonify({"ok": True, "reports": reports, "total": total, "page": page, "per_page": per_page})
 
 @app.route("/summary", methods=["GET"])
 def summary_compat():
     path = os.path.join(BASE_DIR, "summary.json")
-    if not os.path.exists(path):
+    if WRITE_SUMMARY_JSON and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as fh:
+            return jsonify(json.load(fh))
+    name = _latest_name()
+    if name is None:
         return jsonify({"error": "summary.json not found"}), 404
-    with open(path, "r", encoding="utf-8") as fh:
-        return jsonify(json.load(fh))
+    return _report_response(name)
 
 @app.route("/summary/latest", methods=["GET"])
 def latest_summary():
-    files = sorted([f for f in os.listdir(REPORTS_DIR) if f.endswith(".json")], reverse=True)
-    if not files:
+    name = _latest_name()
+    if name is None:
         return jsonify({"error": "no reports"}), 404
-    with open(os.path.join(REPORTS_DIR, files[0]), "r", encoding="utf-8") as fh:
-        return jsonify(json.load(fh))
+    return _report_response(name)
 
 @app.route("/summary/<domain>", methods=["GET"])
 def summary_for_domain(domain):
-    files = sorted([f for f in os.listdir(REPORTS_DIR) if f.startswith(domain) and f.endswith(".json")], reverse=True)
-    if not files:
+    name = _latest_name(domain.lower())
+    if name is None:
         return jsonify({"error": f"No reports for {domain}"}), 404
-    with open(os.path.join(REPORTS_DIR, files[0]), "r", encoding="utf-8") as fh:
-        return jsonify(json.load(fh))
+    return _report_response(name)
 
 @app.route("/report/<domain>", methods=["GET"])
 def report_page(domain):
@@ -121,18 +420,66 @@ def report_page(domain):
     Pretty HTML report page for a domain.
     Finds the latest report for this domain and renders report.html with `summary`.
     """
-    files = sorted([f for f in os.listdir(REPORTS_DIR) if f.startswith(domain) and f.endswith(".json")], reverse=True)
-    if not files:
+    name = _latest_name(domain.lower())
+    if name is None:
         return render_template("scan_report.html", target=domain, summary={}, error=f"No reports for {domain}")
-    with open(os.path.join(REPORTS_DIR, files[0]), "r", encoding="utf-8") as fh:
-        summary = json.load(fh)
-    return render_template("scan_report.html", target=domain, summary=summary)
+    entry = REPORT_CACHE.get(name)
+    if "html" not in entry:
+        # rendered once per report and cached alongside it, compressed like the JSON
+        html = render_template("scan_report.html", target=domain, summary=REPORT_CACHE.summary(name)).encode("utf-8")
+        entry["html"] = encode_variants(html, entry["last_modified"])
+    return _cached_response(entry["html"], "text/html")
+
+@app.route("/diff/<domain>", methods=["GET"])
+def diff_reports(domain):
+    """
+    What changed between two scans of a domain: subdomains, open ports, headers, DNS.
+    Defaults to the latest report against the one before it; ?from=<name>&to=<name> to pick.
+    """
+    domain = domain.lower()
+    REPORT_INDEX.refresh()
+    _, rows = REPORT_INDEX.query(domain=domain, limit=2)
+    new_name = request.args.get("to") or (rows[0][0] if rows else None)
+    old_name = request.args.get("from") or (rows[1][0] if len(rows) > 1 else None)
+    if not new_name or not old_name:
+        return jsonify({"ok": False, "error": f"Need at least two reports for {domain}"}), 404
+    for name in (old_name, new_name):
+        parsed = parse_report_name(name)
+        if not parsed or parsed[0] != domain or name not in REPORT_INDEX:
+            return jsonify({"ok": False, "error": f"Unknown report {name} for {domain}"}), 404
+    try:
+        diff = diff_summaries(REPORT_CACHE.summary(old_name), REPORT_CACHE.summary(new_name))
+    except FileNotFoundError as e:
+        return jsonify({"ok": False, "error": f"Report missing: {e.filename}"}), 404
+    return jsonify({"ok": True, "domain": domain, "from_report": old_name, "to_report": new_name, **diff})
 
-# Serve static JSON reports under /reports/<filename>
+# Serve JSON reports under /reports/<filename> from their compressed variants, built once per
+# report and kept in REPORT_CACHE; delta reports are rebuilt from their keyframe at that point
 @app.route("/reports/<path:filename>", methods=["GET"])
 def serve_report_file(filename):
+    name = os.path.basename(filename)
+    if parse_report_name(name):
+        REPORT_INDEX.refresh()
+        if name not in REPORT_INDEX:
+            return jsonify({"error": f"Report {filename} not found"}), 404
+        try:
+            return _report_response(name, immutable=True)
+        except FileNotFoundError:
+            return jsonify({"error": f"Report {filename} not found"}), 404
     return send_from_directory(REPORTS_DIR, filename)
 
+# Prometheus text exposition of module/step histograms, error/timeout counters and pool usage
+JOBS_BY_STATUS = metrics.Gauge("cyberrecon_jobs", "Scan jobs known to the job manager by status.", ("status",))
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    stats = JOBS.stats()
+    for status in ("queued", "running", "done", "failed", "cancelled"):
+        JOBS_BY_STATUS.set(stats["jobs"].get(status, 0), status=status)
+    metrics.POOL_SIZE.set(JOB_WORKERS, pool="jobs")
+    metrics.POOL_BUSY.set(stats["jobs"].get("running", 0), pool="jobs")
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 # --- Startup banner ---
 if __name__ == "__main__":
     host = "127.0.0.1"
@@ -143,4 +490,6 @@ if __name__ == "__main__":
     print(" Developer: Subhan Ali")
     print(f" Open in browser: {url}")
     print("=" * 60 + "\033[0m\n")
+    if SCHEDULER_ENABLED and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        SCHEDULER.start()   # the reloader's child serves: don't wait for the first request
     app.run(host=host, port=port, debug=True)
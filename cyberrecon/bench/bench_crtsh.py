@@ -0,0 +1,135 @@
+# bench/bench_crtsh.py
+# Peak memory / wall time of crt.sh parsing against a large recorded response
+# served by a local stub (python -m http.server in a subprocess).
+#
+#   python bench/bench_crtsh.py --records 100000
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from recon import subdomains_crtsh  # noqa: E402
+
+DOMAIN = "example.com"
+
+
+def write_recording(path, records, unique):
+    """crt.sh-shaped JSON: many certificates naming a smaller set of hosts."""
+    rnd = random.Random(1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(records):
+            host = f"host{rnd.randrange(unique)}.{DOMAIN}"
+            item = {
+                "issuer_ca_id": 183267,
+                "issuer_name": "C=US, O=Let's Encrypt, CN=R3",
+                "common_name": host,
+                "name_value": f"{host}\n*.{host}\nwww.{host}",
+                "id": 9000000000 + i,
+                "entry_timestamp": "2025-10-27T09:31:22.956",
+                "not_before": "2025-10-27T08:31:22",
+                "not_after": "2026-01-25T08:31:21",
+                "serial_number": f"{rnd.getrandbits(128):032x}",
+            }
+            f.write(("," if i else "") + json.dumps(item))
+        f.write("]")
+
+
+def serve(directory):
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    proc = subprocess.Popen([sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1"],
+                            cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return proc, port
+
+
+def whole_body_parse(url):
+    """The previous implementation: r.json() on the full body, filter afterwards."""
+    r = requests.get(url, timeout=60)
+    r.raise_for_status()
+    names = set()
+    for item in r.json():
+        name = item.get("name_value") or item.get("common_name")
+        for n in str(name).splitlines():
+            n = n.strip()
+            if n.endswith(DOMAIN):
+                names.add(n)
+    return names
+
+
+# elements the streaming parser must not emit before they end, whatever the chunk boundaries
+SPLIT_SAMPLE = ('[{"name_value": "a.example.com\\nb.example.com", "issuer_name": "CN=R\u00e9"}, '
+                '-35000000000.0, 1e5, -2.5E-3, true, false, null, "s\u00e9", [1, 2.0], 0, {}]')
+
+
+def check_chunk_splits(doc=SPLIT_SAMPLE):
+    """iter_json_array gives what json.loads does with the body cut into three chunks at every pair of offsets."""
+    data, want = doc.encode(), json.loads(doc)
+    for i in range(len(data) + 1):
+        for j in range(i, len(data) + 1):
+            got = list(subdomains_crtsh.iter_json_array([data[:i], data[i:j], data[j:]]))
+            assert got == want, f"split at {i}/{j}: {got!r}"
+    return len(data)
+
+
+def measure(fn):
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=100000)
+    ap.add_argument("--unique", type=int, default=5000)
+    args = ap.parse_args()
+
+    split_bytes = check_chunk_splits()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_recording(os.path.join(tmp, "crtsh.json"), args.records, args.unique)
+        size = os.path.getsize(os.path.join(tmp, "crtsh.json"))
+        proc, port = serve(tmp)
+        try:
+            url = f"http://127.0.0.1:{port}/crtsh.json"
+            subdomains_crtsh.CRTSH_URL = url
+
+            old, t_old, peak_old = measure(lambda: whole_body_parse(url))
+            new, t_new, peak_new = measure(lambda: subdomains_crtsh.crtsh_subdomains(DOMAIN, timeout=60))
+        finally:
+            proc.terminate()
+
+    assert new["ok"], new.get("error")
+    print(json.dumps({
+        "response_mb": round(size / 1e6, 1),
+        "records": args.records,
+        "unique_names": len(new["subdomains"]),
+        "whole_body": {"seconds": round(t_old, 3), "peak_mb": round(peak_old / 1e6, 1), "names": len(old)},
+        "streaming": {"seconds": round(t_new, 3), "peak_mb": round(peak_new / 1e6, 1)},
+        "chunk_split_check_bytes": split_bytes,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
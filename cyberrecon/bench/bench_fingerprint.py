@@ -0,0 +1,74 @@
+# bench/bench_fingerprint.py
+# Signature lookup cost as the table grows: prefix-bucketed Matcher vs trying
+# every regex in order.
+#
+#   python bench/bench_fingerprint.py --signatures 5000 --banners 2000
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from recon.fingerprint import BANNER_SIGNATURES, Matcher, Signature  # noqa: E402
+
+
+def synthetic(n):
+    """The real table plus `n` made-up products with their own banner prefixes."""
+    rnd = random.Random(7)
+    sigs = list(BANNER_SIGNATURES)
+    words = set()
+    while len(words) < n:
+        words.add("".join(rnd.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(6)))
+    for w in sorted(words):
+        sigs.insert(len(sigs) - 2, Signature("svc", rf"{w}/([\d.]+) ready", w, r"\1"))
+    return sigs, sorted(words)
+
+
+def linear(sigs, subject):
+    for sig in sigs:
+        m = sig.regex.match(subject)
+        if m:
+            return sig, m
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--signatures", type=int, default=5000)
+    ap.add_argument("--banners", type=int, default=2000)
+    args = ap.parse_args()
+
+    sigs, words = synthetic(args.signatures)
+    rnd = random.Random(1)
+    banners = [rnd.choice([f"{rnd.choice(words)}/1.{i % 10} ready\r\n",
+                           "SSH-2.0-OpenSSH_9.6\r\n",
+                           "HTTP/1.1 200 OK\r\nServer: nginx\r\n\r\n",
+                           "something nobody knows\r\n"]) for i in range(args.banners)]
+
+    t0 = time.perf_counter()
+    matcher = Matcher(sigs)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = [matcher.match(b) for b in banners]
+    t_fast = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    slow = [linear(sigs, b) for b in banners]
+    t_slow = time.perf_counter() - t0
+
+    assert [h and h[0] for h in fast] == [h and h[0] for h in slow], "matchers disagree"
+    print(json.dumps({
+        "signatures": len(sigs),
+        "banners": len(banners),
+        "build_s": round(build, 3),
+        "linear_us_per_banner": round(t_slow / len(banners) * 1e6, 1),
+        "bucketed_us_per_banner": round(t_fast / len(banners) * 1e6, 1),
+        "speedup": round(t_slow / t_fast, 1) if t_fast else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
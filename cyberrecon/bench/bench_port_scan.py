@@ -0,0 +1,121 @@
+# bench/bench_port_scan.py
+# Compare the old sequential connect_ex sweep with the asyncio engine
+# against local listening, closed and "filtered" ports.
+#
+#   python bench/bench_port_scan.py --open 20 --closed 970 --filtered 10
+import os
+import sys
+import time
+import json
+import socket
+import argparse
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from recon.port_scan import scan_ports  # noqa: E402
+
+
+def start_listeners(n):
+    socks = []
+    for _ in range(n):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(("127.0.0.1", 0))
+        s.listen(64)
+        socks.append(s)
+
+    def serve(sock):
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            try:
+                conn.sendall(b"HTTP/1.0 200 OK\r\nServer: bench\r\n\r\n")
+            finally:
+                conn.close()
+
+    for s in socks:
+        threading.Thread(target=serve, args=(s,), daemon=True).start()
+    return socks
+
+
+def filtered_ports(n):
+    """Listeners with a zero backlog that is already full: SYNs go unanswered like a firewall drop."""
+    keep = []
+    for _ in range(n):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind(("127.0.0.1", 0))
+        s.listen(0)
+        filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        filler.connect(s.getsockname())
+        keep += [s, filler]
+    return keep
+
+
+def closed_ports(n, exclude):
+    # bind-and-release to find ports nothing is listening on
+    out = []
+    while len(out) < n:
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        s.close()
+        if port not in exclude and port not in out:
+            out.append(port)
+    return out
+
+
+def sequential_scan(host, ports, timeout):
+    """The pre-asyncio implementation, kept here as the baseline."""
+    open_ports = []
+    for p in ports:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            if s.connect_ex((host, p)) == 0:
+                open_ports.append(p)
+                try:
+                    s.settimeout(0.6)
+                    s.send(b"HEAD / HTTP/1.0\r\n\r\n")
+                    s.recv(1024)
+                except Exception:
+                    pass
+    return open_ports
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--open", type=int, default=20)
+    ap.add_argument("--closed", type=int, default=970)
+    ap.add_argument("--filtered", type=int, default=10)
+    ap.add_argument("--timeout", type=float, default=1.0)
+    args = ap.parse_args()
+
+    listeners = start_listeners(args.open)
+    open_set = [s.getsockname()[1] for s in listeners]
+    blackholes = filtered_ports(args.filtered)
+    filtered_set = [s.getsockname()[1] for s in blackholes[::2]]
+    ports = open_set + filtered_set + closed_ports(args.closed, set(open_set + filtered_set))
+
+    t0 = time.perf_counter()
+    seq = sequential_scan("127.0.0.1", ports, args.timeout)
+    t_seq = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    res = scan_ports("127.0.0.1", ports=ports, timeout=args.timeout)
+    t_async = time.perf_counter() - t0
+
+    assert sorted(seq) == sorted(open_set), "baseline missed listeners"
+    assert res["open_ports"] == sorted(open_set), "engine missed listeners"
+    print(json.dumps({
+        "ports": len(ports),
+        "open": args.open,
+        "filtered": args.filtered,
+        "sequential_s": round(t_seq, 4),
+        "asyncio_s": round(t_async, 4),
+        "speedup": round(t_seq / t_async, 2) if t_async else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# bench/bench_suite.py
+# Offline benchmark of the recon modules and whole scans against local stand-ins
+# (bench/standins.py): per-module latency percentiles, batch throughput and peak memory.
+# Prints JSON; --out saves it and --baseline compares against an earlier run.
+#
+#   python bench/bench_suite.py --iterations 20 --out bench-now.json
+#   python bench/bench_suite.py --baseline bench-now.json --threshold 0.25
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import warnings
+import subprocess
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from standins import Standins  # noqa: E402
+
+import scan_parser  # noqa: E402
+from result_cache import RESULT_CACHE  # noqa: E402
+from recon import resolver as resolver_mod, subdomains_crtsh, surface  # noqa: E402
+from recon.resolver import Resolver, SHARED_CACHE  # noqa: E402
+from recon.http_fetch import PageFetcher, get_session, POOL_SIZE  # noqa: E402
+from recon.dns_info import get_all_dns  # noqa: E402
+from recon.headers_scan import fetch_headers  # noqa: E402
+from recon.port_scan import scan_ports  # noqa: E402
+from recon.screenshot import save_html_snapshot  # noqa: E402
+
+# whois has no stand-in: its result is pre-seeded in the result cache and never refreshed
+REFRESH = set(scan_parser.TASKS) - {"whois"}
+WHOIS_STUB = {"domain_name": None, "registrar": "bench", "creation_date": None, "expiration_date": None,
+              "name_servers": [], "emails": [], "status": "bench"}
+
+
+def percentiles(samples):
+    """Nearest-rank p50/p90/p99 plus mean/max, in milliseconds."""
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+
+    def rank(p):
+        return s[max(0, math.ceil(p / 100 * len(s)) - 1)]
+    return {
+        "n": len(s),
+        "p50_ms": round(rank(50) * 1000, 3),
+        "p90_ms": round(rank(90) * 1000, 3),
+        "p99_ms": round(rank(99) * 1000, 3),
+        "mean_ms": round(sum(s) / len(s) * 1000, 3),
+        "max_ms": round(s[-1] * 1000, 3),
+    }
+
+
+def timed(fn, iterations, cold=True):
+    samples = []
+    for _ in range(iterations):
+        if cold:
+            SHARED_CACHE.clear()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench_modules(domain, ports, iterations):
+    """Each recon module on its own, with fresh resolver/fetcher state per call."""
+    snap_dir = tempfile.mkdtemp(prefix="snapshots-", dir=".")
+    subs = subdomains_crtsh.crtsh_subdomains(domain)["subdomains"]
+    cases = {
+        "dns": lambda: get_all_dns(domain, resolver=Resolver()),
+        "headers": lambda: fetch_headers(domain, fetcher=PageFetcher(resolver=Resolver())),
+        "ports": lambda: scan_ports(domain, ports=ports, timeout=1.0, resolver=Resolver()),
+        "subdomains": lambda: subdomains_crtsh.crtsh_subdomains(domain),
+        "snapshot": lambda: save_html_snapshot(domain, out_dir=snap_dir, fetcher=PageFetcher(resolver=Resolver())),
+        "surface": lambda: surface.map_attack_surface(domain, subs, resolver=Resolver(), allow_private=True),
+    }
+    return {name: percentiles(timed(fn, iterations)) for name, fn in cases.items()}
+
+
+def bench_summaries(domains, iterations):
+    """build_summary_for_domain end to end; per-module figures come from summary["timings"]."""
+    totals, per_module = [], {}
+    for i in range(iterations):
+        SHARED_CACHE.clear()
+        domain = domains[i % len(domains)]
+        t0 = time.perf_counter()
+        summary = scan_parser.build_summary_for_domain(domain, refresh=REFRESH)
+        totals.append(time.perf_counter() - t0)
+        for name, seconds in summary.get("timings", {}).get("modules", {}).items():
+            per_module.setdefault(name, []).append(seconds)
+        errors = summary.get("errors")
+        if errors:
+            raise RuntimeError(f"scan of {domain} reported errors: {errors}")
+    return {"total": percentiles(totals), "modules": {k: percentiles(v) for k, v in sorted(per_module.items())}}
+
+
+def check_conditional_rescan(domain, site_statuses):
+    """A rescan of an unchanged page must send the stored validators and get a 304, not the page."""
+    scan_parser.build_summary_for_domain(domain, refresh=REFRESH)
+    before = site_statuses[304]
+    summary = scan_parser.build_summary_for_domain(domain, refresh=REFRESH)
+    snapshot = summary["results"].get("snapshot") or {}
+    not_modified = site_statuses[304] - before
+    if not snapshot.get("not_modified") or not not_modified:
+        raise RuntimeError(f"rescan of {domain} downloaded the unchanged page again: {snapshot}")
+    return {"not_modified_responses": not_modified}
+
+
+def bench_batch(domains, workers):
+    """Throughput of one batch, then peak Python memory of a second (tracemalloc slows it down)."""
+    SHARED_CACHE.clear()
+    t0 = time.perf_counter()
+    done = sum(1 for _ in scan_parser.build_summaries(domains, max_workers=workers, refresh=REFRESH))
+    elapsed = time.perf_counter() - t0
+
+    SHARED_CACHE.clear()
+    tracemalloc.start()
+    for _ in scan_parser.build_summaries(domains, max_workers=workers, refresh=REFRESH):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "domains": done,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "domains_per_s": round(done / elapsed, 2) if elapsed else None,
+        "peak_traced_mb": round(peak / 1e6, 2),
+    }
+
+
+def compare(current, baseline, threshold):
+    """Latencies that grew or throughput that fell by more than `threshold` (a fraction)."""
+    regressions = []
+
+    def check(path, new, old, higher_is_worse=True):
+        if not old or new is None:
+            return
+        change = (new - old) / old
+        if (change if higher_is_worse else -change) > threshold:
+            regressions.append({"metric": path, "baseline": old, "current": new, "change": round(change, 3)})
+
+    for section in ("modules",):
+        for name, stats in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name, {})
+            check(f"{section}.{name}.p50_ms", stats.get("p50_ms"), old.get("p50_ms"))
+            check(f"{section}.{name}.p90_ms", stats.get("p90_ms"), old.get("p90_ms"))
+    check("summary.total.p50_ms", current["summary"]["total"].get("p50_ms"),
+          baseline.get("summary", {}).get("total", {}).get("p50_ms"))
+    check("batch.domains_per_s", current["batch"]["domains_per_s"],
+          baseline.get("batch", {}).get("domains_per_s"), higher_is_worse=False)
+    check("batch.peak_traced_mb", current["batch"]["peak_traced_mb"], baseline.get("batch", {}).get("peak_traced_mb"))
+    return regressions
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=10, help="samples per module / per scan")
+    ap.add_argument("--batch", type=int, default=50, help="domains in the batch throughput run")
+    ap.add_argument("--workers", type=int, default=scan_parser.MAX_WORKERS)
+    ap.add_argument("--page-kb", type=int, default=64)
+    ap.add_argument("--http-delay", type=float, default=0.0, help="seconds before each HTTP response")
+    ap.add_argument("--dns-delay", type=float, default=0.0, help="seconds before each DNS answer")
+    ap.add_argument("--accept-delay", type=float, default=0.0, help="seconds between accepts on open ports")
+    ap.add_argument("--crtsh-certs", type=int, default=2000)
+    ap.add_argument("--crtsh-hosts", type=int, default=40)
+    ap.add_argument("--out", help="write the JSON result here")
+    ap.add_argument("--baseline", help="earlier JSON result to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    args = ap.parse_args()
+
+    warnings.filterwarnings("ignore", message="Unverified HTTPS request")
+    out_path = os.path.abspath(args.out) if args.out else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    cwd = os.getcwd()
+    domains = [f"bench{i}.test" for i in range(max(args.batch, 1))]
+
+    with Standins(domains, page_kb=args.page_kb, http_delay=args.http_delay, dns_delay=args.dns_delay,
+                  crtsh_certs=args.crtsh_certs, crtsh_hosts=args.crtsh_hosts,
+                  accept_delay=args.accept_delay) as s, tempfile.TemporaryDirectory() as workdir:
+        # point the recon modules at the stand-ins
+        resolver_mod.NAMESERVERS = s.nameservers
+        subdomains_crtsh.CRTSH_URL = s.crtsh_url
+        s.install(get_session(), pool_size=POOL_SIZE)
+        ports = s.tcp.all_ports
+        scan_parser.SCAN_PORTS = ports
+        surface.SURFACE_PORTS = ports
+        surface.ALLOW_PRIVATE = True
+        for d in domains:
+            RESULT_CACHE.get_or_compute("whois", d, lambda: dict(WHOIS_STUB))
+        # snapshots land in the working directory
+        os.chdir(workdir)
+        try:
+            result = {
+                "meta": {
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "git": _git_rev(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "tls": s.tls,
+                    "args": vars(args),
+                },
+                "modules": bench_modules(domains[0], ports, args.iterations),
+                "summary": bench_summaries(domains, args.iterations),
+                "batch": bench_batch(domains, args.workers),
+                "checks": {"conditional_rescan": check_conditional_rescan(domains[0], s.site_statuses)},
+            }
+        finally:
+            os.chdir(cwd)
+
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["max_rss_mb"] = round(rss / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            result["regressions"] = compare(result, json.load(f), args.threshold)
+
+    out = json.dumps(result, indent=2)
+    print(out)
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    if result.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# bench/standins.py
+# Local stand-ins for the services a scan talks to, so benchmarks never leave the machine:
+# stub DNS, HTTP/HTTPS site, fake crt.sh, TCP listeners (optionally slow to accept)
+# plus closed and filtered ports.
+import os
+import json
+import time
+import random
+import socket
+import hashlib
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import ssl
+except ImportError:
+    ssl = None
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rrset
+import dns.rdatatype
+
+LOOPBACK_IPS = ["127.0.0.1", "127.0.0.2", "127.0.0.3", "127.0.0.4"]
+
+
+def _ip_for(name: str, ips=LOOPBACK_IPS) -> str:
+    # stable spread of host names over the loopback addresses
+    return ips[int(hashlib.sha1(name.encode()).hexdigest(), 16) % len(ips)]
+
+
+# === DNS ===
+class StubDNS:
+    """
+    UDP DNS server answering for `zones` (apex domains). Every name under a zone gets
+    an A record on one of LOOPBACK_IPS; apexes also carry MX/NS/TXT/CAA. Names
+    listed in `nxdomain` and anything outside the zones answer NXDOMAIN.
+    """
+
+    def __init__(self, zones, delay: float = 0.0, nxdomain=()):
+        self.zones = [z.lower() for z in zones]
+        self.delay = delay
+        self.nxdomain = set(nxdomain)
+        self.queries = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _records(self, name: str, rtype: str):
+        zone = next((z for z in self.zones if name == z or name.endswith("." + z)), None)
+        if zone is None or name in self.nxdomain:
+            return None
+        if rtype == "A":
+            return [_ip_for(name)]
+        if name != zone:
+            return []
+        return {
+            "MX": [f"10 mail.{zone}."],
+            "NS": [f"ns1.{zone}.", f"ns2.{zone}."],
+            "TXT": ['"v=spf1 -all"'],
+            "CAA": ['0 issue "letsencrypt.org"'],
+        }.get(rtype, [])
+
+    def _answer(self, data: bytes, addr):
+        if self.delay:
+            time.sleep(self.delay)
+        query = dns.message.from_wire(data)
+        resp = dns.message.make_response(query)
+        resp.flags |= dns.flags.AA
+        q = query.question[0]
+        name = str(q.name).rstrip(".").lower()
+        records = self._records(name, dns.rdatatype.to_text(q.rdtype))
+        if records is None:
+            resp.set_rcode(dns.rcode.NXDOMAIN)
+        elif records:
+            resp.answer.append(dns.rrset.from_text(q.name, 300, "IN", q.rdtype, *records))
+        self.sock.sendto(resp.to_wire(), addr)
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            self.queries += 1
+            if self.delay:
+                threading.Thread(target=self._answer, args=(data, addr), daemon=True).start()
+            else:
+                self._answer(data, addr)
+
+    def close(self):
+        self.sock.close()
+
+
+# === HTTP / HTTPS ===
+def _self_signed_cert(directory: str):
+    """Key + certificate via the openssl CLI, or None when it isn't available."""
+    key, cert = os.path.join(directory, "key.pem"), os.path.join(directory, "cert.pem")
+    try:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                        "-subj", "/CN=cyberrecon-bench", "-keyout", key, "-out", cert],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def _site_handler(page_kb: int, delay: float):
+    body = ("<!doctype html><html><head><title>bench</title></head><body>"
+            + ("<p>" + "x" * 1000 + "</p>\n") * page_kb + "</body></html>").encode()
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        statuses = Counter()    # responses served, by status code
+
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            if self.headers.get("If-None-Match") == etag:
+                self.statuses[304] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.statuses[200] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Strict-Transport-Security", "max-age=63072000")
+            self.send_header("X-Frame-Options", "DENY")
+            self.send_header("X-Content-Type-Options", "nosniff")
+            self.send_header("Server", "bench/1.0")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def _crtsh_handler(certs: int, hosts: int):
+    cache = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            q = parse_qs(urlsplit(self.path).query).get("q", [""])[0]
+            domain = q.lstrip("%.").lower()
+            if domain not in cache:
+                rnd = random.Random(domain)
+                items = []
+                for i in range(certs):
+                    host = f"host{rnd.randrange(hosts)}.{domain}"
+                    items.append({"issuer_ca_id": 183267, "issuer_name": "C=US, O=Let's Encrypt, CN=R3",
+                                  "common_name": host, "name_value": f"{host}\n*.{host}",
+                                  "id": 9000000000 + i, "not_before": "2025-10-27T08:31:22",
+                                  "not_after": "2026-01-25T08:31:21"})
+                cache[domain] = json.dumps(items).encode()
+            body = cache[domain]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def _start_http(handler, tls=None):
+    server = _Server(("127.0.0.1", 0), handler)
+    if tls is not None:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(*tls)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StandinAdapter(HTTPAdapter):
+    """
+    Transport adapter that sends requests for the benchmark's domains to the local
+    site (keeping the Host header), so https://<domain> works without touching
+    /etc/hosts. The stand-in certificate is self-signed, hence verify=False.
+    """
+
+    def __init__(self, zones, https_port=None, http_port=None, **kwargs):
+        self.zones = [z.lower() for z in zones]
+        self.https_port = https_port
+        self.http_port = http_port
+        super().__init__(**kwargs)
+
+    def _routed(self, host: str) -> bool:
+        host = (host or "").lower()
+        return any(host == z or host.endswith("." + z) for z in self.zones)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if self._routed(parts.hostname):
+            if self.https_port:
+                netloc, scheme = f"127.0.0.1:{self.https_port}", "https"
+            else:
+                netloc, scheme = f"127.0.0.1:{self.http_port}", "http"
+            request.headers["Host"] = parts.hostname
+            request.url = urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+            kwargs["verify"] = False
+        return super().send(request, **kwargs)
+
+
+# === TCP ===
+class TcpPorts:
+    """
+    Open listeners on each address (accepting after `accept_delay`, answering with a
+    small banner), ports closed everywhere and "filtered" ports whose full zero-length
+    backlog leaves SYNs unanswered like a firewall drop.
+    """
+
+    def __init__(self, ips=LOOPBACK_IPS, open_per_ip: int = 2, closed: int = 4, filtered: int = 2,
+                 accept_delay: float = 0.0):
+        self.accept_delay = accept_delay
+        self._socks = []
+        self.open = {ip: [self._listen(ip) for _ in range(open_per_ip)] for ip in ips}
+        self.filtered = [self._blackhole(ips[0]) for _ in range(filtered)]
+        taken = {p for ports in self.open.values() for p in ports} | set(self.filtered)
+        self.closed = []
+        while len(self.closed) < closed:
+            s = socket.socket()
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+            s.close()
+            if port not in taken:
+                self.closed.append(port)
+                taken.add(port)
+
+    @property
+    def all_ports(self):
+        return sorted({p for ports in self.open.values() for p in ports} | set(self.filtered) | set(self.closed))
+
+    def _listen(self, ip: str) -> int:
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((ip, 0))
+        s.listen(64)
+        self._socks.append(s)
+        threading.Thread(target=self._accept_loop, args=(s,), daemon=True).start()
+        return s.getsockname()[1]
+
+    def _accept_loop(self, sock):
+        while True:
+            if self.accept_delay:
+                time.sleep(self.accept_delay)
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            try:
+                conn.sendall(b"SSH-2.0-bench\r\n")
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    def _blackhole(self, ip: str) -> int:
+        s = socket.socket()
+        s.bind((ip, 0))
+        s.listen(0)
+        filler = socket.socket()
+        filler.connect(s.getsockname())
+        self._socks += [s, filler]
+        return s.getsockname()[1]
+
+    def close(self):
+        for s in self._socks:
+            s.close()
+
+
+# === Everything together ===
+class Standins:
+    """Start every stand-in for `domains`; use as a context manager."""
+
+    def __init__(self, domains, page_kb: int = 64, http_delay: float = 0.0, dns_delay: float = 0.0,
+                 crtsh_certs: int = 2000, crtsh_hosts: int = 40, accept_delay: float = 0.0,
+                 open_per_ip: int = 2, closed: int = 4, filtered: int = 2):
+        self.domains = list(domains)
+        self._tmp = tempfile.TemporaryDirectory()
+        tls = _self_signed_cert(self._tmp.name) if ssl is not None else None
+        handler = _site_handler(page_kb, http_delay)
+        self.site_statuses = handler.statuses
+        self.http = _start_http(handler)
+        self.https = _start_http(handler, tls) if tls else None
+        self.crtsh = _start_http(_crtsh_handler(crtsh_certs, crtsh_hosts))
+        self.dns = StubDNS(self.domains, delay=dns_delay)
+        self.tcp = TcpPorts(open_per_ip=open_per_ip, closed=closed, filtered=filtered, accept_delay=accept_delay)
+
+    @property
+    def tls(self) -> bool:
+        return self.https is not None
+
+    @property
+    def nameservers(self) -> str:
+        return f"127.0.0.1:{self.dns.port}"
+
+    @property
+    def crtsh_url(self) -> str:
+        return f"http://127.0.0.1:{self.crtsh.server_address[1]}/"
+
+    def adapter(self, **kwargs) -> StandinAdapter:
+        return StandinAdapter(self.domains,
+                              https_port=self.https.server_address[1] if self.https else None,
+                              http_port=self.http.server_address[1], **kwargs)
+
+    def install(self, session: requests.Session, pool_size: int = 32):
+        """Route the benchmark domains of `session` (normally recon.http_fetch.get_session()) here."""
+        adapter = self.adapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    def close(self):
+        for server in (self.http, self.https, self.crtsh):
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        self.dns.close()
+        self.tcp.close()
+        self._tmp.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
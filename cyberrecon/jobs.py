@@ -0,0 +1,144 @@
+# jobs.py
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import OrderedDict
+
+MAX_QUEUE = 20       # jobs waiting for a worker
+WORKERS = 2          # scans running at once
+KEEP_FINISHED = 200  # finished jobs kept for status/replay
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """One queued domain scan plus the ordered event log clients stream from."""
+
+    def __init__(self, domain: str, refresh=False):
+        self.id = uuid.uuid4().hex[:16]
+        self.domain = domain
+        self.refresh = refresh
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.summary = None
+        self.report_file = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.events = []
+        self._cond = threading.Condition()
+
+    def emit(self, event: str, data: dict):
+        with self._cond:
+            self.events.append((event, data))
+            self._cond.notify_all()
+
+    def set_status(self, status: str, **extra):
+        now = time.time()
+        if status == "running":
+            self.started = now
+        elif status in FINISHED:
+            self.finished = now
+        self.status = status
+        self.emit("status", {"status": status, **extra})
+
+    def wait_events(self, start: int, timeout: float = 15.0):
+        """Events after index `start` (blocking up to `timeout` if none yet) and whether the job is over."""
+        with self._cond:
+            if len(self.events) <= start and self.status not in FINISHED:
+                self._cond.wait(timeout)
+            return self.events[start:], self.status in FINISHED
+
+    def to_dict(self, with_summary: bool = True):
+        out = {
+            "job_id": self.id,
+            "target": self.domain,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "modules_done": [d["module"] for e, d in self.events if e == "module"],
+            "error": self.error,
+            "report_file": self.report_file,
+        }
+        if with_summary:
+            out["summary"] = self.summary
+        return out
+
+
+class JobManager:
+    """Bounded queue of scan jobs served by a fixed pool of worker threads."""
+
+    def __init__(self, run, workers: int = WORKERS, max_queue: int = MAX_QUEUE, keep: int = KEEP_FINISHED):
+        self._run = run
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.keep = keep
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"scan-job-{i}", daemon=True).start()
+
+    def submit(self, domain: str, refresh=False) -> Job:
+        job = Job(domain, refresh=refresh)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFull(f"job queue is full ({self._queue.maxsize} waiting)")
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.emit("status", {"status": "queued", "position": self._queue.qsize()})
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status not in FINISHED:
+            job.cancel_event.set()
+            if job.status == "queued":
+                # the worker will skip it when it comes off the queue
+                job.set_status("cancelled")
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"queued": self._queue.qsize(), "max_queue": self._queue.maxsize, "jobs": counts}
+
+    def _prune(self):
+        finished = [jid for jid, j in self._jobs.items() if j.status in FINISHED]
+        for jid in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[jid]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job.cancel_event.is_set():
+                    continue
+                job.set_status("running")
+                self._run(job)
+                if job.cancel_event.is_set():
+                    job.set_status("cancelled")
+                elif job.status not in FINISHED:
+                    job.set_status("done")
+            except Exception as e:
+                logging.exception(f"Job {job.id} ({job.domain}) failed")
+                job.error = str(e)
+                job.set_status("failed", error=str(e))
+            finally:
+                self._queue.task_done()
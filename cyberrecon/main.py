@@ -1,26 +1,35 @@
 # main.py
+import sys
 import json
 import argparse
 from datetime import datetime
-from recon.dns_info import get_dns_records
+from recon.dns_info import get_all_dns
 from recon.headers_scan import fetch_headers
 from recon.port_scan import scan_ports
-from recon.subdomains_crtsh import get_subdomains
-from recon.whois_lookup import get_whois_info
-from recon.screenshot import take_screenshot
+from recon.subdomains_crtsh import crtsh_subdomains
+from recon.whois_lookup import lookup
+from recon.screenshot import save_html_snapshot
+from recon.surface import map_attack_surface
+from recon.http_fetch import PageFetcher
+from recon.resolver import Resolver
+from scan_parser import build_summaries, MAX_WORKERS
 
 def run_all_recon(domain, selected_modules=None):
     results = {"domain": domain, "timestamp": datetime.utcnow().isoformat()}
     print(f"\n Running recon for: {domain}")
     print("=" * 60)
 
+    resolver = Resolver()
+    fetcher = PageFetcher(resolver=resolver)
     modules = {
-        "whois": ("WHOIS Lookup", lambda: get_whois_info(domain)),
-        "dns": ("DNS Records", lambda: get_dns_records(domain)),
-        "subdomains": ("Subdomain Enumeration", lambda: get_subdomains(domain)),
-        "headers": ("Security Headers", lambda: fetch_headers(domain)),
-        "ports": ("Port Scan", lambda: scan_ports(domain, ports=[21,22,80,443,8080], timeout=1.5)),
-        "screenshot": ("Screenshot", lambda: take_screenshot(domain)),
+        "whois": ("WHOIS Lookup", lambda: lookup(domain)),
+        "dns": ("DNS Records", lambda: get_all_dns(domain, resolver=resolver)),
+        "subdomains": ("Subdomain Enumeration", lambda: crtsh_subdomains(domain)),
+        "surface": ("Attack Surface", lambda: map_attack_surface(
+            domain, (results.get("subdomains") or {}).get("subdomains", []), resolver=resolver, fetcher=fetcher)),
+        "headers": ("Security Headers", lambda: fetch_headers(domain, fetcher=fetcher)),
+        "ports": ("Port Scan", lambda: scan_ports(domain, ports=[21,22,80,443,8080], timeout=1.5, resolver=resolver)),
+        "screenshot": ("Screenshot", lambda: save_html_snapshot(domain, fetcher=fetcher)),
     }
 
     for key, (title, func) in modules.items():
@@ -39,13 +48,51 @@ def run_all_recon(domain, selected_modules=None):
     return results
 
 
+def read_targets(path):
+    targets = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip().lower()
+            if line:
+                targets.append(line)
+    return targets
+
+
+def run_batch(targets, out, max_workers=MAX_WORKERS, refresh=False):
+    """Stream one NDJSON line per domain as soon as its summary is complete."""
+    done = 0
+    for summary in build_summaries(targets, max_workers=max_workers, refresh=refresh):
+        out.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+        done += 1
+        print(f" [{done}/{len(targets)}] {summary['domain']} (risk {summary['risk_score']})", file=sys.stderr)
+    return done
+
+
 def main():
     parser = argparse.ArgumentParser(description="CyberRecon - Lightweight Recon Tool")
-    parser.add_argument("domain", help="Target domain (e.g. example.com)")
+    parser.add_argument("domain", nargs="?", help="Target domain (e.g. example.com)")
     parser.add_argument("-m", "--modules", nargs="+", help="Modules to run (e.g. dns whois ports)")
     parser.add_argument("-o", "--output", help="Output file name (optional)")
+    parser.add_argument("-t", "--targets-file", help="File with one domain per line; results stream as NDJSON")
+    parser.add_argument("-r", "--refresh", nargs="*", help="Ignore cached results (optionally only for the given modules)")
+    parser.add_argument("-w", "--workers", type=int, default=MAX_WORKERS, help="Shared worker pool size for batch mode")
     args = parser.parse_args()
 
+    if args.targets_file:
+        targets = read_targets(args.targets_file)
+        refresh = True if args.refresh == [] else (args.refresh or False)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                run_batch(targets, f, max_workers=args.workers, refresh=refresh)
+            print(f"\n Results saved to {args.output}", file=sys.stderr)
+        else:
+            run_batch(targets, sys.stdout, max_workers=args.workers, refresh=refresh)
+        return
+
+    if not args.domain:
+        parser.error("a domain or --targets-file is required")
+
     selected = args.modules or []
     report = run_all_recon(args.domain, selected_modules=selected)
 
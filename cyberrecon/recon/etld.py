@@ -0,0 +1,37 @@
+# recon/etld.py
+try:
+    import tldextract
+    # bundled Public Suffix List snapshot only: never fetch it over the network mid-scan
+    _extract = tldextract.TLDExtract(suffix_list_urls=())
+except Exception:
+    _extract = None
+
+# Fallback when tldextract isn't installed: multi-label public suffixes we see often,
+# plus the common <sld>.<ccTLD> second levels (co.uk, com.pk, org.au, ...).
+MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "ltd.uk", "plc.uk", "me.uk", "net.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au",
+    "co.jp", "ne.jp", "or.jp", "ac.jp", "go.jp",
+    "co.nz", "co.za", "co.in", "co.kr", "co.id", "co.il", "co.th",
+    "com.br", "com.cn", "com.mx", "com.tr", "com.sg", "com.my", "com.pk", "com.sa", "com.eg",
+    "github.io", "herokuapp.com", "blogspot.com", "appspot.com", "cloudfront.net",
+    "azurewebsites.net", "netlify.app", "vercel.app", "pages.dev", "workers.dev",
+}
+CCTLD_SECOND_LEVELS = {"co", "com", "net", "org", "edu", "gov", "ac", "mil", "nic", "web", "gob", "or", "ne"}
+
+
+def registrable_domain(name: str) -> str:
+    """eTLD+1 of a host name: www.shop.example.co.uk -> example.co.uk."""
+    name = name.strip().lower().rstrip(".")
+    if _extract is not None:
+        parts = _extract(name)
+        if parts.domain and parts.suffix:
+            return f"{parts.domain}.{parts.suffix}"
+        return name
+    labels = name.split(".")
+    if len(labels) <= 2:
+        return name
+    last_two = ".".join(labels[-2:])
+    if last_two in MULTI_LABEL_SUFFIXES or (len(labels[-1]) == 2 and labels[-2] in CCTLD_SECOND_LEVELS):
+        return ".".join(labels[-3:])
+    return last_two
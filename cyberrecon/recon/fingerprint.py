@@ -0,0 +1,398 @@
+# recon/fingerprint.py
+import re
+import ssl
+import asyncio
+import ipaddress
+import warnings
+from typing import Dict, List, Optional
+
+
+def _regex_parser():
+    """re's own pattern parser, for literal_prefix(); private API, so it may be missing."""
+    try:
+        from re import _parser  # Python 3.11+
+        return _parser
+    except ImportError:
+        pass
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import sre_parse
+        return sre_parse
+    except ImportError:
+        return None
+
+
+sre_parse = _regex_parser()   # None: every signature is tried unbucketed
+
+# === Timing ===
+SPEAK_WAIT = 0.6       # server-first services (SSH, SMTP, FTP...) normally greet well within this
+PASSIVE_WAIT = 0.25    # unknown ports: how long to listen before sending probes
+PROBE_WAIT = 0.6       # reply to a probe
+FOLLOWUP_WAIT = 0.05   # more of a reply that arrived in several segments
+MAX_READ = 1024
+PREFIX_LEN = 3         # literal prefix length used to bucket signatures
+
+# port -> service name, used when nothing matched
+PORT_SERVICES = {
+    21: "ftp", 22: "ssh", 23: "telnet", 25: "smtp", 53: "domain", 80: "http", 110: "pop3",
+    111: "rpcbind", 135: "msrpc", 139: "netbios-ssn", 143: "imap", 443: "https", 445: "microsoft-ds",
+    465: "smtps", 587: "submission", 993: "imaps", 995: "pop3s", 1433: "ms-sql-s", 1521: "oracle",
+    2049: "nfs", 3306: "mysql", 3389: "ms-wbt-server", 5432: "postgresql", 5900: "vnc",
+    6379: "redis", 8080: "http-proxy", 8443: "https-alt", 9200: "elasticsearch",
+    11211: "memcached", 27017: "mongodb",
+}
+
+# ports where the server talks first: listen before probing
+SERVER_FIRST = {21, 22, 23, 25, 110, 143, 587, 2525, 3306, 5900, 5901}
+
+
+# === Probes ===
+class Probe:
+    """Bytes to send (None = just listen) and whether to wrap the connection in TLS first."""
+
+    def __init__(self, name: str, payload: Optional[bytes], tls: bool = False):
+        self.name = name
+        self.payload = payload
+        self.tls = tls
+
+
+HTTP = Probe("http", b"HEAD / HTTP/1.0\r\n\r\n")
+HTTPS = Probe("https", b"HEAD / HTTP/1.0\r\n\r\n", tls=True)
+TLS_NULL = Probe("tls-null", None, tls=True)
+
+# probes per port, run concurrently (the first plain probe reuses the scan's connection)
+PORT_PROBES = {
+    53: [],
+    80: [HTTP], 81: [HTTP], 3000: [HTTP], 5000: [HTTP], 8000: [HTTP], 8008: [HTTP],
+    8080: [HTTP], 8081: [HTTP], 8888: [HTTP], 9000: [HTTP], 9200: [HTTP],
+    443: [HTTPS], 8443: [HTTPS, HTTP], 4443: [HTTPS],
+    465: [TLS_NULL], 993: [TLS_NULL], 995: [TLS_NULL],
+    554: [Probe("rtsp", b"OPTIONS / RTSP/1.0\r\nCSeq: 1\r\n\r\n")],
+    6379: [Probe("redis", b"PING\r\n")],
+    11211: [Probe("memcached", b"version\r\n")],
+}
+# anything else that stays silent: plain HTTP on the open connection and HTTP over TLS on a second
+DEFAULT_PROBES = [HTTP, HTTPS]
+
+
+# === Signatures ===
+class Signature:
+    """
+    `pattern` is matched at the start of the response (or of the HTTP Server header
+    for SERVER_SIGNATURES). `product` and `version` may be expand() templates such
+    as r"\\1". A None service keeps the port's service name.
+    """
+
+    def __init__(self, service: Optional[str], pattern: str, product: str = None, version: str = None,
+                 flags: int = re.S):
+        self.service = service
+        self.pattern = pattern
+        self.product = product
+        self.version = version
+        self.flags = flags
+        self.regex = re.compile(pattern, flags)
+        self.prefix = literal_prefix(pattern, flags)
+
+
+def literal_prefix(pattern: str, flags: int = 0) -> str:
+    """Literal characters every match of `pattern` must start with ("" if there's no working parser)."""
+    if sre_parse is None:
+        return ""
+    out = []
+    for op, arg in sre_parse.parse(pattern, flags):
+        if op is sre_parse.LITERAL:
+            out.append(chr(arg))
+        elif op is sre_parse.AT and arg is sre_parse.AT_BEGINNING:
+            continue
+        else:
+            break
+    return "".join(out)
+
+
+def _parser_works() -> bool:
+    try:
+        return literal_prefix(r"SSH-([\d.]+)") == "SSH-" and literal_prefix(r"\+OK") == "+OK" \
+            and literal_prefix("ab|cd") == ""
+    except Exception:
+        return False
+
+
+# a future Python may change the private parser: then skip the bucketing rather than mis-bucket
+if sre_parse is not None and not _parser_works():
+    sre_parse = None
+
+
+BANNER_SIGNATURES = [
+    Signature("ssh", r"SSH-([\d.]+)-OpenSSH[_-]([\w.]+)", "OpenSSH", r"\2"),
+    Signature("ssh", r"SSH-([\d.]+)-dropbear_([\w.]+)", "Dropbear sshd", r"\2"),
+    Signature("ssh", r"SSH-([\d.]+)-Cisco-([\w.]+)", "Cisco SSH", r"\2"),
+    Signature("ssh", r"SSH-([\d.]+)-libssh[_-]([\w.]+)", "libssh", r"\2"),
+    Signature("ssh", r"SSH-([\d.]+)-([^\s\r\n]+)", r"\2"),
+    Signature("ftp", r"220[- ][^\r\n]*\(vsFTPd ([\w.]+)\)", "vsftpd", r"\1"),
+    Signature("ftp", r"220[- ]ProFTPD ([\w.]+)", "ProFTPD", r"\1"),
+    Signature("ftp", r"220[- ][^\r\n]*Pure-FTPd", "Pure-FTPd"),
+    Signature("ftp", r"220[- ][^\r\n]*FileZilla Server(?: version)? ([\w.]+)", "FileZilla ftpd", r"\1"),
+    Signature("ftp", r"220[- ][^\r\n]*Microsoft FTP Service", "Microsoft ftpd"),
+    Signature("smtp", r"220[- ][^\r\n]*ESMTP Postfix", "Postfix smtpd"),
+    Signature("smtp", r"220[- ][^\r\n]*ESMTP Exim ([\w.]+)", "Exim smtpd", r"\1"),
+    Signature("smtp", r"220[- ][^\r\n]*ESMTP Sendmail ([\w./]+)", "Sendmail", r"\1"),
+    Signature("smtp", r"220[- ][^\r\n]*Microsoft ESMTP MAIL Service", "Microsoft Exchange smtpd"),
+    Signature("smtp", r"220[- ][^\r\n]*\bE?SMTP\b", None),
+    Signature("ftp", r"220[- ][^\r\n]*\bFTP\b", None, flags=re.S | re.I),
+    Signature(None, r"220[- ]"),
+    Signature("pop3", r"\+OK[^\r\n]*Dovecot", "Dovecot pop3d"),
+    Signature("pop3", r"\+OK"),
+    Signature("imap", r"\* OK[^\r\n]*Dovecot", "Dovecot imapd"),
+    Signature("imap", r"\* OK[^\r\n]*Courier-IMAP", "Courier imapd"),
+    Signature("imap", r"\* OK"),
+    Signature("redis", r"\+PONG", "Redis"),
+    Signature("redis", r"-NOAUTH", "Redis"),
+    Signature("redis", r"-DENIED Redis", "Redis"),
+    Signature("memcached", r"VERSION ([\d.]+)", "memcached", r"\1"),
+    Signature("rtsp", r"RTSP/1\.0 \d{3}", None),
+    Signature("vnc", r"RFB (\d{3}\.\d{3})", "VNC", r"\1"),
+    Signature("telnet", r"\xff[\xfb-\xfe]"),
+    Signature("mysql", r".\x00\x00\x00\x0a([\d.]+-MariaDB[\w.-]*)\x00", "MariaDB", r"\1"),
+    Signature("mysql", r".\x00\x00\x00\x0a([\d.]+[\w.-]*)\x00", "MySQL", r"\1"),
+    Signature("mysql", r".\x00\x00\x00\xffj\x04Host '", "MySQL"),
+    Signature("http", r"HTTP/1\.[01] \d{3}"),
+    Signature("http", r"HTTP/2 \d{3}"),
+]
+
+SERVER_SIGNATURES = [
+    Signature("http", r"nginx/([\d.]+)", "nginx", r"\1"),
+    Signature("http", r"nginx", "nginx"),
+    Signature("http", r"openresty/([\d.]+)", "OpenResty", r"\1"),
+    Signature("http", r"Apache/([\d.]+)", "Apache httpd", r"\1"),
+    Signature("http", r"Apache", "Apache httpd"),
+    Signature("http", r"Microsoft-IIS/([\d.]+)", "Microsoft IIS httpd", r"\1"),
+    Signature("http", r"Microsoft-HTTPAPI/([\d.]+)", "Microsoft HTTPAPI httpd", r"\1"),
+    Signature("http", r"lighttpd/([\d.]+)", "lighttpd", r"\1"),
+    Signature("http", r"LiteSpeed", "LiteSpeed httpd"),
+    Signature("http", r"cloudflare", "Cloudflare"),
+    Signature("http", r"Caddy", "Caddy"),
+    Signature("http", r"gunicorn/([\d.]+)", "gunicorn", r"\1"),
+    Signature("http", r"gunicorn", "gunicorn"),
+    Signature("http", r"Werkzeug/([\d.]+)", "Werkzeug httpd", r"\1"),
+    Signature("http", r"uvicorn", "uvicorn"),
+    Signature("http", r"Jetty\(([\w.-]+)\)", "Jetty", r"\1"),
+    Signature("http", r"Kestrel", "Kestrel"),
+    Signature("http", r"envoy", "Envoy"),
+    Signature("http", r"AmazonS3", "Amazon S3"),
+    Signature("http", r"awselb/([\d.]+)", "AWS ELB", r"\1"),
+    Signature("http", r"GSE", "Google GSE"),
+    Signature("http", r"gws", "Google web server"),
+    Signature("http", r"Varnish", "Varnish"),
+    Signature("http", r"squid/([\d.]+)", "Squid http proxy", r"\1"),
+    Signature("http", r"BaseHTTP/([\d.]+) Python/([\d.]+)", "Python BaseHTTPServer", r"\1"),
+]
+
+
+class Matcher:
+    """
+    Signatures bucketed by their first PREFIX_LEN literal characters, each bucket
+    compiled into one alternation. A lookup tries one bucket plus the few signatures
+    without a usable literal prefix, so cost stays flat as the table grows.
+    Earlier signatures win, as in a linear scan.
+    """
+
+    def __init__(self, signatures: List[Signature], prefix_len: int = PREFIX_LEN):
+        self.prefix_len = prefix_len
+        buckets, loose = {}, []
+        for i, sig in enumerate(signatures):
+            if len(sig.prefix) >= prefix_len:
+                buckets.setdefault(sig.prefix[:prefix_len].lower(), []).append((i, sig))
+            else:
+                loose.append((i, sig))
+        self._loose = self._compile(loose)
+        self._buckets = {key: self._compile(members) for key, members in buckets.items()}
+
+    @staticmethod
+    def _compile(members):
+        """(order, [Signature], combined regex or None)."""
+        sigs = [sig for _, sig in members]
+        order = [i for i, _ in members]
+        parts = []
+        for n, sig in enumerate(sigs):
+            scoped = "".join(c for f, c in ((re.I, "i"), (re.S, "s"), (re.M, "m")) if sig.flags & f)
+            body = f"(?{scoped}:{sig.pattern})" if scoped else f"(?:{sig.pattern})"
+            parts.append(f"(?P<s{n}>{body})")
+        try:
+            combined = re.compile("|".join(parts)) if parts else None
+        except re.error:
+            combined = None  # e.g. patterns with named groups: fall back to one regex each
+        return order, sigs, combined
+
+    @staticmethod
+    def _first(group, subject):
+        order, sigs, combined = group
+        if not sigs:
+            return None
+        if combined is not None:
+            m = combined.match(subject)
+            if m is None:
+                return None
+            n = int(m.lastgroup[1:])
+            return order[n], sigs[n], sigs[n].regex.match(subject)
+        for i, sig in zip(order, sigs):
+            m = sig.regex.match(subject)
+            if m:
+                return i, sig, m
+        return None
+
+    def match(self, subject: str):
+        """(Signature, re.Match) of the first signature matching `subject`, or None."""
+        hits = [h for h in (self._first(self._buckets.get(subject[:self.prefix_len].lower(), ([], [], None)), subject),
+                            self._first(self._loose, subject)) if h]
+        if not hits:
+            return None
+        _, sig, m = min(hits, key=lambda h: h[0])
+        return sig, m
+
+
+BANNER_MATCHER = Matcher(BANNER_SIGNATURES)
+SERVER_MATCHER = Matcher(SERVER_SIGNATURES)
+
+
+def _expand(m, template: Optional[str]) -> Optional[str]:
+    if not template or "\\" not in template:
+        return template
+    return m.expand(template).strip() or None
+
+
+def _header(text: str, name: str) -> Optional[str]:
+    m = re.search(rf"^{name}:[ \t]*([^\r\n]*)", text, re.I | re.M)
+    return m.group(1).strip() if m else None
+
+
+def identify(port: int, data: bytes, probe: str = None, tls: bool = False) -> Dict:
+    """Structured service/product/version for a response read from `port`."""
+    text = data.decode("latin-1")
+    out = {"service": PORT_SERVICES.get(port), "product": None, "version": None,
+           "method": "port", "probe": probe, "tls": tls}
+    hit = BANNER_MATCHER.match(text)
+    if hit is None:
+        return out
+    sig, m = hit
+    out["method"] = "match"
+    out["service"] = sig.service or out["service"]
+    out["product"] = _expand(m, sig.product)
+    out["version"] = _expand(m, sig.version)
+    if out["service"] == "http":
+        server = _header(text, "Server")
+        if server:
+            hit = SERVER_MATCHER.match(server)
+            if hit:
+                sig, m = hit
+                out["product"] = _expand(m, sig.product)
+                out["version"] = _expand(m, sig.version)
+            else:
+                out["product"] = server[:80]
+        if tls:
+            out["service"] = "https"
+    return out
+
+
+# === Network side ===
+def _tls_context():
+    ctx = ssl.create_default_context()
+    # fingerprinting, not trust: self-signed and mismatched certificates still count
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+_TLS = _tls_context()
+
+
+async def _read(reader, wait: float) -> bytes:
+    try:
+        data = await asyncio.wait_for(reader.read(MAX_READ), wait)
+    except (asyncio.TimeoutError, OSError, ssl.SSLError):
+        return b""
+    while data and len(data) < MAX_READ:
+        # stop at the end of an HTTP header block or of a one-line greeting
+        if b"\r\n\r\n" in data or (not data.startswith(b"HTTP/") and data.endswith(b"\n")):
+            break
+        try:
+            more = await asyncio.wait_for(reader.read(MAX_READ - len(data)), FOLLOWUP_WAIT)
+        except (asyncio.TimeoutError, OSError, ssl.SSLError):
+            break
+        if not more:
+            break
+        data += more
+    return data
+
+
+async def _close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+
+async def _run_probe(probe: Probe, ip: str, port: int, server_name: str, conn=None) -> bytes:
+    """Send `probe` on `conn` (reader, writer) or on a fresh connection, and return the reply."""
+    own = conn is None
+    try:
+        if own:
+            conn = await asyncio.wait_for(
+                asyncio.open_connection(ip, port, ssl=_TLS if probe.tls else None,
+                                        server_hostname=server_name if probe.tls else None),
+                PROBE_WAIT * 2)
+        reader, writer = conn
+        if probe.payload:
+            writer.write(probe.payload)
+            await writer.drain()
+        return await _read(reader, PROBE_WAIT)
+    except Exception:
+        return b""
+    finally:
+        if own and conn is not None:
+            await _close(conn[1])
+
+
+async def fingerprint(ip: str, port: int, reader, writer, host: str = None) -> Dict:
+    """
+    Identify the service on an open port: listen first where the server normally
+    speaks first (or the port is unknown), then run the port's probes concurrently.
+    Returns identify()'s dict plus "banner". Closes `writer`.
+    """
+    try:
+        server_name = None
+        if host:
+            try:
+                ipaddress.ip_address(host)
+            except ValueError:
+                server_name = host
+
+        probes = PORT_PROBES.get(port)
+        if probes is None or port in SERVER_FIRST:
+            data = await _read(reader, SPEAK_WAIT if port in SERVER_FIRST else PASSIVE_WAIT)
+            if data:
+                return dict(identify(port, data, "null"), banner=data.decode(errors="ignore").strip())
+            probes = probes or DEFAULT_PROBES
+
+        conn = (reader, writer)
+        tasks = []
+        for probe in probes:
+            # the scan's own connection carries the first plain-TCP probe; the rest open their own
+            use = conn if not probe.tls and conn is not None else None
+            if use is not None:
+                conn = None
+            tasks.append(_run_probe(probe, ip, port, server_name, use))
+        replies = await asyncio.gather(*tasks)
+
+        best = None
+        for probe, data in zip(probes, replies):
+            if not data:
+                continue
+            result = dict(identify(port, data, probe.name, probe.tls), banner=data.decode(errors="ignore").strip())
+            if result["method"] == "match":
+                return result
+            best = best or result
+        return best or dict(identify(port, b""), banner="")
+    finally:
+        await _close(writer)
@@ -1,16 +1,15 @@
 # recon/headers_scan.py
-import requests
+from recon.http_fetch import PageFetcher
 
-def fetch_headers(domain: str):
-    url = f"https://{domain}"
-    try:
-        r = requests.head(url, timeout=6, allow_redirects=True)
-        if r.status_code >= 400:
-            # fallback to GET
-            r = requests.get(url, timeout=6, allow_redirects=True)
-        return {"ok": True, "headers": dict(r.headers)}
-    except Exception as e:
-        return {"ok": False, "error": str(e), "headers": {}}
+def fetch_headers(domain: str, fetcher: PageFetcher = None):
+    # one GET shared with the snapshot module (see recon/http_fetch.py)
+    page = (fetcher or PageFetcher()).get(f"https://{domain}")
+    if not page["ok"]:
+        return {"ok": False, "error": page["error"], "headers": {}}
+    out = {"ok": True, "headers": page["headers"]}
+    if page.get("ip"):
+        out["ip"] = page["ip"]
+    return out
 
 def extract_security_headers(headers: dict):
     # normalize keys to lowercase for detection but return original-case mapping for readability
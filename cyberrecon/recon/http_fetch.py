@@ -0,0 +1,157 @@
+# recon/http_fetch.py
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from recon import metrics
+from recon.resolver import Resolver
+
+TIMEOUT = 6
+POOL_SIZE = 32
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide pooled session: keep-alive connections and TLS sessions survive across scans."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            # scans must not carry cookies from one target run into the next
+            s.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _session = s
+        return _session
+
+
+def _fetch(session, url: str, timeout: float, headers: dict = None) -> dict:
+    try:
+        r = session.get(url, timeout=timeout, allow_redirects=True, headers=headers)
+        return {
+            "ok": True,
+            "url": r.url,
+            "status": r.status_code,
+            "headers": dict(r.headers),
+            "text": r.text,
+            "redirects": [h.url for h in r.history],
+        }
+    except Exception as e:
+        if isinstance(e, requests.Timeout):
+            metrics.TIMEOUTS.inc(step="http_fetch")
+        return {"ok": False, "url": url, "error": str(e), "headers": {}}
+
+
+class PageFetcher:
+    """
+    Per-scan GET memo. The first module to ask for a URL performs the request;
+    concurrent and later callers in the same scan get the same response.
+
+    `stored(url)` may return (etag, last_modified, load_stored) for a copy of the page
+    kept from an earlier scan (see screenshot.stored_page): that first request then
+    carries the validators, whichever module makes it, and a 304 is rebuilt from the copy.
+    """
+
+    def __init__(self, session: requests.Session = None, timeout: float = TIMEOUT, resolver: Resolver = None,
+                 stored=None):
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.resolver = resolver
+        self.stored = stored
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> dict:
+        return self._memo(url, lambda: self._fetch_page(url, *self._validators(url)))
+
+    def get_conditional(self, url: str, etag: str = None, last_modified: str = None, load_stored=None) -> dict:
+        """
+        Like get(), but when nobody in this scan has fetched `url` yet, send the
+        validators of a stored copy so an unchanged page comes back as a bodiless 304.
+        `load_stored()` returns that copy ({"text", "headers", "url", "status"}); a 304 is
+        rebuilt from it into a full page (marked "not_modified") and memoized like any
+        other, so the rest of the scan reuses it instead of downloading again.
+        """
+        if not (etag or last_modified) or load_stored is None:
+            return self.get(url)
+        return self._memo(url, lambda: self._fetch_page(url, etag, last_modified, load_stored))
+
+    def _memo(self, url: str, fetch) -> dict:
+        with self._lock:
+            fut = self._pages.get(url)
+            owner = fut is None
+            if owner:
+                fut = self._pages[url] = Future()
+        if owner:
+            try:
+                page = fetch()
+            except Exception as e:
+                page = {"ok": False, "url": url, "error": str(e), "headers": {}}
+            fut.set_result(page)
+        return fut.result()
+
+    def _validators(self, url: str) -> tuple:
+        if self.stored is None:
+            return None, None, None
+        try:
+            return self.stored(url) or (None, None, None)
+        except Exception:
+            return None, None, None    # an unreadable stored copy just means a full download
+
+    def _fetch_page(self, url: str, etag: str = None, last_modified: str = None, load_stored=None) -> dict:
+        if not (etag or last_modified) or load_stored is None:
+            return self._get(url)
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        page = self._get(url, headers=headers)
+        if page.get("ok") and page["status"] == 304:
+            try:
+                page = self._not_modified(page, load_stored())
+            except Exception:
+                # stored copy unreadable: pay for the full download after all
+                page = self._get(url)
+        return page
+
+    @staticmethod
+    def _not_modified(page: dict, stored: dict) -> dict:
+        """A 304 turned back into the full page it stands for: stored body, stored headers updated by the 304's."""
+        headers = dict(stored.get("headers") or {})
+        for key, value in page["headers"].items():
+            for old in [k for k in headers if k.lower() == key.lower()]:
+                del headers[old]
+            headers[key] = value
+        full = {
+            "ok": True,
+            "url": stored.get("url") or page["url"],
+            "status": stored.get("status") or 200,
+            "headers": headers,
+            "text": stored["text"],
+            "redirects": page.get("redirects", []),
+            "not_modified": True,
+        }
+        if page.get("ip"):
+            full["ip"] = page["ip"]
+        return full
+
+    def _get(self, url: str, headers: dict = None) -> dict:
+        host = urlsplit(url).hostname
+        addrs = self.resolver.resolve_host(host) if self.resolver and host else None
+        if addrs == []:
+            # the scan's resolver got a negative answer for the name; skip the connect attempt
+            # (None -- lookup timed out or failed -- is not an answer: try the fetch anyway)
+            return {"ok": False, "url": url, "error": f"Could not resolve host: {host}", "headers": {}}
+        with metrics.span("http_fetch"):
+            page = _fetch(self.session, url, self.timeout, headers=headers)
+        if addrs:
+            page["ip"] = addrs[0]
+        return page
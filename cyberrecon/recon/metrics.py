@@ -0,0 +1,205 @@
+# recon/metrics.py
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# seconds; recon steps range from cached DNS answers to whole crt.sh downloads
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_str(names, values, extra=""):
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    parts = [f'{n}="{esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# === Metric types (Prometheus text exposition) ===
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: dict):
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_one(key, value))
+        return lines
+
+    def _render_one(self, key, value):
+        return [f"{self.name}{_label_str(self.labels, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labels, registry)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_one(self, key, state):
+        counts, total, n = state
+        lines, running = [], 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            running += c
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {running}")
+        lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {total}")
+        lines.append(f"{self.name}_count{_label_str(self.labels, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+MODULE_SECONDS = Histogram("cyberrecon_module_duration_seconds", "Wall time of recon modules that ran (cache hits excluded).", ("module",))
+STEP_SECONDS = Histogram("cyberrecon_step_duration_seconds", "Wall time of recon sub-steps (DNS queries, HTTP fetches, port batches).", ("step",))
+MODULE_RUNS = Counter("cyberrecon_module_runs_total", "Module results by source (computed, cache, inflight).", ("module", "source"))
+MODULE_ERRORS = Counter("cyberrecon_module_errors_total", "Modules that raised or returned an error.", ("module",))
+TIMEOUTS = Counter("cyberrecon_timeouts_total", "Timed-out network operations.", ("step",))
+POOL_BUSY = Gauge("cyberrecon_pool_busy", "Work items currently running in a pool.", ("pool",))
+POOL_SIZE = Gauge("cyberrecon_pool_size", "Capacity of the pools currently in use.", ("pool",))
+
+
+# === Per-scan timings ===
+class Timings:
+    """Module wall times and aggregated sub-step spans of one domain scan."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.modules = {}
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def module(self, name: str, seconds: float):
+        with self._lock:
+            self.modules[name] = seconds
+
+    def step(self, name: str, seconds: float):
+        with self._lock:
+            s = self.steps.get(name)
+            if s is None:
+                self.steps[name] = [1, seconds, seconds]
+            else:
+                s[0] += 1
+                s[1] += seconds
+                s[2] = max(s[2], seconds)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "total_s": round(time.perf_counter() - self.started, 4),
+                "modules": {k: round(v, 4) for k, v in sorted(self.modules.items())},
+                "steps": {k: {"count": c, "total_s": round(t, 4), "max_s": round(m, 4)}
+                          for k, (c, t, m) in sorted(self.steps.items())},
+            }
+
+
+_current = contextvars.ContextVar("cyberrecon_timings", default=None)
+
+
+@contextmanager
+def recording(timings: Timings):
+    """Spans opened inside the block (on this thread or via bind()) land in `timings`."""
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def bind(fn):
+    """Wrap `fn` for another thread so its spans still reach the caller's Timings."""
+    timings = _current.get()
+    if timings is None:
+        return fn
+
+    def run(*args, **kwargs):
+        with recording(timings):
+            return fn(*args, **kwargs)
+    return run
+
+
+def record_step(step: str, seconds: float):
+    STEP_SECONDS.observe(seconds, step=step)
+    timings = _current.get()
+    if timings is not None:
+        timings.step(step, seconds)
+
+
+@contextmanager
+def span(step: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_step(step, time.perf_counter() - start)
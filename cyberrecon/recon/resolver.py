@@ -0,0 +1,199 @@
+# recon/resolver.py
+import os
+import time
+import socket
+import ipaddress
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from recon import metrics
+
+try:
+    import dns.resolver
+    import dns.exception
+except Exception:
+    dns = None
+
+RECORD_TYPES = ["A", "AAAA", "MX", "NS", "TXT", "CNAME", "CAA"]
+LIFETIME = 5
+MIN_TTL = 30          # floor so TTL-0 records still get reused within a scan burst
+MAX_TTL = 3600
+NEGATIVE_TTL = 60     # NXDOMAIN / NOANSWER
+CACHE_SIZE = 4096
+MAX_WORKERS = 16
+
+# "127.0.0.1:5353" or "1.1.1.1,8.8.8.8" to bypass /etc/resolv.conf (e.g. a local stub)
+NAMESERVERS = os.environ.get("CYBERRECON_NAMESERVERS", "")
+
+
+class DnsCache:
+    """Thread-safe LRU of (name, rtype) -> values that expire with the record TTL."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, values = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return values
+
+    def put(self, key, values, ttl: float):
+        ttl = max(MIN_TTL, min(MAX_TTL, ttl))
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, values)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+SHARED_CACHE = DnsCache()
+
+
+def _parse_nameservers(spec: str):
+    servers, port = [], 53
+    for item in [s.strip() for s in spec.split(",") if s.strip()]:
+        host, _, p = item.rpartition(":") if item.count(":") == 1 else (item, "", "")
+        servers.append(host)
+        if p:
+            port = int(p)
+    return servers, port
+
+
+def _format(rtype: str, rdata) -> str:
+    if rtype == "TXT":
+        try:
+            return b"".join(rdata.strings).decode(errors="ignore")
+        except Exception:
+            return str(rdata)
+    if rtype in ("CNAME", "NS"):
+        return str(rdata.target).rstrip(".")
+    if rtype == "MX":
+        return f"{rdata.preference} {str(rdata.exchange).rstrip('.')}"
+    return rdata.to_text()
+
+
+class Resolver:
+    """
+    Resolves each (name, type) at most once per instance -- one instance per scan --
+    on top of a process-wide TTL cache shared by all scans.
+    """
+
+    def __init__(self, nameservers: List[str] = None, port: int = None,
+                 cache: DnsCache = SHARED_CACHE, lifetime: float = LIFETIME):
+        self.cache = cache
+        self.lifetime = lifetime
+        self._memo = {}
+        self._failed = set()   # keys whose lookup timed out or errored: the answer is unknown, not empty
+        self._lock = threading.Lock()
+        self._resolver = None
+        if dns is not None:
+            if nameservers is None and NAMESERVERS:
+                nameservers, env_port = _parse_nameservers(NAMESERVERS)
+                port = port or env_port
+            try:
+                self._resolver = dns.resolver.Resolver(configure=not nameservers)
+            except Exception:
+                # no usable resolv.conf: fall back to the system resolver via socket
+                return
+            if nameservers:
+                self._resolver.nameservers = list(nameservers)
+            if port:
+                self._resolver.port = port
+
+    def _query(self, name: str, rtype: str):
+        """Return (values, ttl); ttl None means "don't cache" (timeouts, server errors)."""
+        if self._resolver is None:
+            if rtype not in ("A", "AAAA"):
+                return [], None
+            family = socket.AF_INET if rtype == "A" else socket.AF_INET6
+            try:
+                infos = socket.getaddrinfo(name, None, family, socket.SOCK_STREAM)
+            except socket.gaierror as e:
+                # only "no such name/no data" is an answer; EAI_AGAIN and friends are failures
+                negative = (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME))
+                return [], NEGATIVE_TTL if e.errno in negative else None
+            return list(dict.fromkeys(i[4][0] for i in infos)), MIN_TTL
+        try:
+            answer = self._resolver.resolve(name, rtype, lifetime=self.lifetime)
+            return list(dict.fromkeys(_format(rtype, r) for r in answer)), answer.rrset.ttl
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return [], NEGATIVE_TTL
+        except dns.exception.Timeout:
+            metrics.TIMEOUTS.inc(step="dns_query")
+            return [], None
+        except Exception:
+            return [], None
+
+    def resolve(self, name: str, rtype: str = "A") -> List[str]:
+        key = (name.lower().rstrip("."), rtype.upper())
+        with self._lock:
+            fut = self._memo.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._memo[key] = Future()
+        if not owner:
+            return fut.result()
+
+        ttl = 0
+        try:
+            values = self.cache.get(key)
+            if values is None:
+                with metrics.span("dns_query"):
+                    values, ttl = self._query(*key)
+                if ttl is not None:
+                    self.cache.put(key, values, ttl)
+        except Exception:
+            values, ttl = [], None
+        if ttl is None:
+            with self._lock:
+                self._failed.add(key)
+        fut.set_result(values)
+        return values
+
+    def resolve_many(self, name: str, rtypes: Iterable[str] = RECORD_TYPES) -> Dict[str, List[str]]:
+        rtypes = list(rtypes)
+        with ThreadPoolExecutor(max_workers=len(rtypes)) as ex:
+            return dict(zip(rtypes, ex.map(metrics.bind(lambda t: self.resolve(name, t)), rtypes)))
+
+    def failed(self, name: str, rtype: str = "A") -> bool:
+        """True if the lookup of (name, rtype) in this scan timed out or errored, rather than answering."""
+        with self._lock:
+            return (name.lower().rstrip("."), rtype.upper()) in self._failed
+
+    def resolve_host(self, name: str) -> Optional[List[str]]:
+        """
+        IP addresses for a host name, IPv4 first. IP literals are returned as-is.
+        [] means the name doesn't resolve (NXDOMAIN / no records); None means we don't
+        know, because a lookup timed out or failed before any address came back.
+        """
+        try:
+            ipaddress.ip_address(name)
+            return [name]
+        except ValueError:
+            pass
+        addrs = self.resolve(name, "A") + self.resolve(name, "AAAA")
+        if not addrs and (self.failed(name, "A") or self.failed(name, "AAAA")):
+            return None
+        return addrs
+
+    def resolve_hosts(self, names: Iterable[str], max_workers: int = MAX_WORKERS) -> Dict[str, Optional[List[str]]]:
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(names))) as ex:
+            return dict(zip(names, ex.map(metrics.bind(self.resolve_host), names)))
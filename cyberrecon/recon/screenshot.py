@@ -1,17 +1,66 @@
 # recon/screenshot.py
-import requests
-import os
-from datetime import datetime
+from urllib.parse import urlsplit
 
-def save_html_snapshot(domain: str, out_dir="snapshots"):
+from recon.http_fetch import PageFetcher
+from recon.snapshot_store import get_store
+
+
+def stored_page(url: str, out_dir="snapshots"):
+    """
+    (etag, last_modified, load_stored) of the latest snapshot of `url` when it is a
+    domain's front page, for PageFetcher(stored=...); None if there is nothing to offer.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" or parts.path not in ("", "/") or parts.query or not parts.hostname:
+        return None
+    store = get_store(out_dir)
+    previous = store.latest(parts.hostname)
+    # versions from before headers were stored can't stand in for a full response
+    if not previous or previous.get("headers") is None:
+        return None
+    return (previous.get("etag"), previous.get("last_modified"),
+            lambda: dict(previous, text=store.read(previous["sha256"])))
+
+def save_html_snapshot(domain: str, out_dir="snapshots", fetcher: PageFetcher = None):
+    """
+    Store the page in the content-addressed snapshot store (recon/snapshot_store.py).
+    The previous version's ETag/Last-Modified are sent along, so an unchanged page
+    is neither downloaded nor written again.
+    """
     try:
-        r = requests.get(f"https://{domain}", timeout=6)
-        r.raise_for_status()
-        os.makedirs(out_dir, exist_ok=True)
-        fname = f"{domain.replace('.','_')}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.html"
-        path = os.path.join(out_dir, fname)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(r.text)
-        return {"ok": True, "path": path, "filepath": path}
+        url = f"https://{domain}"
+        store = get_store(out_dir)
+        fetcher = fetcher or PageFetcher()
+        # a no-op if another module of this scan already fetched the page (conditionally too,
+        # when its fetcher was built with stored=stored_page)
+        previous = stored_page(url, out_dir)
+        page = fetcher.get_conditional(url, *previous) if previous else fetcher.get(url)
+        if not page["ok"]:
+            raise RuntimeError(page["error"])
+        if page["status"] >= 400:
+            raise RuntimeError(f"{page['status']} error for url: {page['url']}")
+        headers = {k.lower(): v for k, v in page["headers"].items()}
+        not_modified = bool(page.get("not_modified"))
+        version = store.record(
+            domain,
+            content=None if not_modified else page["text"],
+            url=page["url"],
+            status=page["status"],
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            headers=page["headers"],
+        )
+        path = store.object_path(version["sha256"])
+        return {
+            "ok": True,
+            "path": path,
+            "filepath": path,
+            "sha256": version["sha256"],
+            "changed": version["changed"],
+            "not_modified": not_modified,
+            "first_seen": version["first_seen"],
+            "last_seen": version["last_seen"],
+            "size": version["size"],
+        }
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -0,0 +1,178 @@
+# recon/snapshot_store.py
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+
+KEEP_VERSIONS = int(os.environ.get("CYBERRECON_SNAPSHOT_KEEP", "20"))         # per domain
+MAX_AGE_DAYS = float(os.environ.get("CYBERRECON_SNAPSHOT_MAX_AGE_DAYS", "180"))  # 0 = keep forever
+
+
+class SnapshotStore:
+    """
+    Content-addressed HTML snapshots.
+
+        <root>/objects/ab/<sha256>.html.gz   page body, stored once however many scans saw it
+        <root>/index/<domain>.json           versions of a domain, oldest first
+
+    A version is {"sha256", "first_seen", "last_seen", "url", "status", "etag",
+    "last_modified", "headers", "size"}; a scan that finds the same content as the latest
+    version only moves its last_seen forward.
+    """
+
+    def __init__(self, root: str = "snapshots", keep: int = KEEP_VERSIONS, max_age_days: float = MAX_AGE_DAYS):
+        self.root = root
+        self.keep = keep
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+
+    # === Paths ===
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.html.gz")
+
+    def _index_path(self, domain: str) -> str:
+        return os.path.join(self.root, "index", f"{domain.replace(os.sep, '_')}.json")
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    # === Objects ===
+    def put_object(self, content: str) -> str:
+        """Store a page body (once) and return its sha256."""
+        raw = content.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            self._atomic_write(path, gzip.compress(raw, compresslevel=6))
+        return digest
+
+    def read(self, digest: str) -> str:
+        with gzip.open(self.object_path(digest), "rt", encoding="utf-8") as f:
+            return f.read()
+
+    # === Versions ===
+    def versions(self, domain: str) -> list:
+        try:
+            with open(self._index_path(domain), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def latest(self, domain: str):
+        versions = self.versions(domain)
+        return versions[-1] if versions else None
+
+    def _save_versions(self, domain: str, versions: list):
+        self._atomic_write(self._index_path(domain), json.dumps(versions, indent=1).encode("utf-8"))
+
+    def record(self, domain: str, content: str = None, url: str = None, status: int = None,
+               etag: str = None, last_modified: str = None, headers: dict = None) -> dict:
+        """
+        Record a scan of `domain`. Pass content=None when the server answered 304:
+        the latest version is confirmed unchanged. Returns the current version plus
+        "changed" (True when this scan added a new version).
+        """
+        now = datetime.utcnow().isoformat(timespec="seconds")
+        with self._lock:
+            # under the lock so gc() can't remove an object between its write and its pointer
+            digest = self.put_object(content) if content is not None else None
+            versions = self.versions(domain)
+            latest = versions[-1] if versions else None
+            if latest is not None and digest in (None, latest["sha256"]):
+                latest["last_seen"] = now
+                # a 304 may carry a fresh validator; keep whatever the server sent last
+                latest["etag"] = etag or latest.get("etag")
+                latest["last_modified"] = last_modified or latest.get("last_modified")
+                if headers is not None:
+                    latest["headers"] = headers
+                changed = False
+            elif digest is None:
+                raise ValueError(f"no stored snapshot of {domain} to confirm")
+            else:
+                latest = {
+                    "sha256": digest,
+                    "first_seen": now,
+                    "last_seen": now,
+                    "url": url,
+                    "status": status,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "headers": headers,
+                    "size": len(content.encode("utf-8")),
+                }
+                versions.append(latest)
+                changed = True
+            dropped = self._apply_retention(versions)
+            self._save_versions(domain, versions)
+        if dropped:
+            self.gc(dropped)
+        return dict(latest, changed=changed)
+
+    # === Retention ===
+    def _apply_retention(self, versions: list) -> set:
+        """Trim `versions` in place (the latest always survives); return digests no longer listed."""
+        before = {v["sha256"] for v in versions}
+        if self.max_age_days:
+            cutoff = datetime.utcfromtimestamp(time.time() - self.max_age_days * 86400).isoformat(timespec="seconds")
+            versions[:-1] = [v for v in versions[:-1] if v["last_seen"] >= cutoff]
+        if self.keep and len(versions) > self.keep:
+            del versions[:len(versions) - self.keep]
+        return before - {v["sha256"] for v in versions}
+
+    def prune(self) -> int:
+        """Apply the retention policy to every domain and delete unreferenced objects."""
+        dropped = set()
+        index_dir = os.path.join(self.root, "index")
+        with self._lock:
+            for fname in (os.listdir(index_dir) if os.path.isdir(index_dir) else []):
+                if not fname.endswith(".json"):
+                    continue
+                domain = fname[:-len(".json")]
+                versions = self.versions(domain)
+                gone = self._apply_retention(versions)
+                if gone:
+                    self._save_versions(domain, versions)
+                    dropped |= gone
+        return self.gc(dropped) if dropped else 0
+
+    def gc(self, candidates=None) -> int:
+        """Delete objects no domain points at (only `candidates`, if given). Returns the count removed."""
+        with self._lock:
+            live = set()
+            index_dir = os.path.join(self.root, "index")
+            for fname in (os.listdir(index_dir) if os.path.isdir(index_dir) else []):
+                if fname.endswith(".json"):
+                    live.update(v["sha256"] for v in self.versions(fname[:-len(".json")]))
+            if candidates is None:
+                objects_dir = os.path.join(self.root, "objects")
+                candidates = {f.split(".", 1)[0]
+                              for _, _, files in os.walk(objects_dir) for f in files if f.endswith(".html.gz")}
+            removed = 0
+            for digest in set(candidates) - live:
+                try:
+                    os.remove(self.object_path(digest))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+            return removed
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root: str = "snapshots") -> SnapshotStore:
+    """One store per directory so concurrent scans share its lock."""
+    with _stores_lock:
+        key = os.path.abspath(root)
+        if key not in _stores:
+            _stores[key] = SnapshotStore(root)
+        return _stores[key]
@@ -1,21 +1,107 @@
 # recon/subdomains_crtsh.py
+import os
+import json
+import codecs
+
 import requests
 
-def crtsh_subdomains(domain: str, timeout: int = 6):
-    url = f"https://crt.sh/?q=%25.{domain}&output=json"
-    try:
-        r = requests.get(url, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
-        names = set()
-        for item in data:
-            name = item.get("name_value") or item.get("common_name")
-            if not name:
+from recon import metrics
+from recon.http_fetch import get_session
+
+CRTSH_URL = os.environ.get("CYBERRECON_CRTSH_URL", "https://crt.sh/")
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of a top-level JSON array from an iterable of byte chunks,
+    holding at most one chunk plus one partial element in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buf, pos, started = "", 0, False
+    chunks = iter(chunks)
+    exhausted = False
+
+    while True:
+        # skip whitespace / separators up to the next element
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("crt.sh response is not a JSON array")
+                started, pos = True, pos + 1
                 continue
-            for n in str(name).splitlines():
-                n = n.strip()
-                if n.endswith(domain):
-                    names.add(n)
-        return {"ok": True, "subdomains": sorted(names)}
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # strings, objects and arrays end with their own closing character; a number or
+                # literal only ends where a separator follows, so one running up to the end of
+                # the buffer (or to a "." / "e" there) may still continue in the next chunk
+                if buf[pos] in '"{[' or exhausted or (end < len(buf) and buf[end] in " \t\r\n,]"):
+                    pos = end
+                    yield item
+                    continue
+        elif exhausted:
+            if not started:
+                return  # empty body
+            raise ValueError("truncated JSON array")
+
+        # need more input: drop what has been consumed and append the next chunk
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buf = buf[pos:] + utf8.decode(b"", final=True)
+        else:
+            buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+
+
+def normalize_name(name: str, domain: str):
+    """Lower-case, wildcard-stripped name if it belongs to `domain`, else None."""
+    n = name.strip().lower().rstrip(".")
+    while n.startswith("*."):
+        n = n[2:]
+    if n == domain or n.endswith("." + domain):
+        return n
+    return None
+
+
+def crtsh_subdomains(domain: str, timeout: int = 6, resolver=None):
+    domain = domain.lower().rstrip(".")
+    params = {"q": f"%.{domain}", "output": "json"}
+    try:
+        with metrics.span("crtsh_fetch"), \
+                get_session().get(CRTSH_URL, params=params, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            names, seen = set(), set()
+            # parse certificates as they arrive; only the de-duplicated names are kept
+            for item in iter_json_array(r.iter_content(CHUNK_SIZE)):
+                if not isinstance(item, dict):
+                    continue
+                name = item.get("name_value") or item.get("common_name")
+                if not name:
+                    continue
+                for n in str(name).splitlines():
+                    # the same names repeat across thousands of certificates
+                    if n in seen:
+                        continue
+                    seen.add(n)
+                    n = normalize_name(n, domain)
+                    if n:
+                        names.add(n)
+        out = {"ok": True, "subdomains": sorted(names)}
+        if resolver is not None:
+            # concurrent lookups through the scan's shared resolver cache
+            out["resolved"] = resolver.resolve_hosts(out["subdomains"])
+        return out
     except Exception as e:
+        if isinstance(e, requests.Timeout):
+            metrics.TIMEOUTS.inc(step="crtsh_fetch")
         return {"ok": False, "subdomains": [], "error": str(e)}
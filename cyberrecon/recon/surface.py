@@ -0,0 +1,112 @@
+# recon/surface.py
+import os
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from recon import metrics
+from recon.resolver import Resolver
+from recon.port_scan import scan_hosts
+from recon.http_fetch import PageFetcher
+from recon.headers_scan import extract_security_headers
+
+MAX_HOSTS = 256          # unique IPs probed per scan
+RESOLVE_WORKERS = 32
+HEADER_WORKERS = 16
+SURFACE_PORTS = [21, 22, 25, 80, 443, 8080, 8443]
+# lab / internal-network use: also scan names that resolve to private or loopback addresses
+ALLOW_PRIVATE = os.environ.get("CYBERRECON_SURFACE_ALLOW_PRIVATE", "0") == "1"
+
+# first open web port wins when picking the URL for the header check
+WEB_PORTS = [(443, "https://{}"), (80, "http://{}"), (8443, "https://{}:8443"), (8080, "http://{}:8080")]
+
+
+def _scannable(ip: str) -> bool:
+    try:
+        return ipaddress.ip_address(ip).is_global
+    except ValueError:
+        return False
+
+
+def _web_url(name: str, open_ports: List[int]):
+    for port, tmpl in WEB_PORTS:
+        if port in open_ports:
+            return tmpl.format(name)
+    return None
+
+
+def map_attack_surface(domain: str, names: List[str], resolver: Resolver = None, fetcher: PageFetcher = None,
+                       ports=None, timeout: float = 1.0, max_hosts: int = MAX_HOSTS,
+                       allow_private: bool = None) -> Dict:
+    """
+    Resolve every discovered name, collapse names that share an IP, then port-scan
+    each unique IP once and check headers on the live web hosts.
+    """
+    resolver = resolver or Resolver()
+    allow_private = ALLOW_PRIVATE if allow_private is None else allow_private
+    fetcher = fetcher or PageFetcher(resolver=resolver)
+    names = list(dict.fromkeys([domain] + [n for n in names if n]))
+
+    resolved = resolver.resolve_hosts(names, max_workers=RESOLVE_WORKERS)
+    by_ip, unresolved, dns_failed = {}, [], []
+    for name in names:
+        ips = resolved.get(name)
+        if ips is None:
+            dns_failed.append(name)   # lookup timed out/errored: unknown, not "doesn't resolve"
+            continue
+        if not ips:
+            unresolved.append(name)
+        for ip in ips:
+            by_ip.setdefault(ip, []).append(name)
+
+    skipped = [ip for ip in by_ip if not allow_private and not _scannable(ip)]
+    targets = [ip for ip in by_ip if ip not in skipped]
+    truncated = targets[max_hosts:]
+    targets = targets[:max_hosts]
+
+    scans = scan_hosts(targets, ports or SURFACE_PORTS, timeout=timeout, resolver=resolver) if targets else {}
+
+    hosts = {}
+    for ip, host_names in by_ip.items():
+        scan = scans.get(ip) or {}
+        hosts[ip] = {
+            "names": sorted(host_names),
+            "open_ports": scan.get("open_ports", []),
+            "banners": scan.get("banners", {}),
+            "services": scan.get("services", {}),
+            "live": bool(scan.get("open_ports")),
+            "scanned": ip in scans,
+        }
+
+    # one header check per live web host, using the apex name when it lives there
+    def check(ip):
+        host = hosts[ip]
+        name = domain if domain in host["names"] else host["names"][0]
+        url = _web_url(name, host["open_ports"])
+        page = fetcher.get(url)
+        if not page["ok"]:
+            return ip, {"url": url, "ok": False, "error": page["error"]}
+        return ip, {"url": url, "ok": True, "status": page["status"],
+                    "security_headers": extract_security_headers(page["headers"])}
+
+    web = [ip for ip, h in hosts.items() if _web_url(ip, h["open_ports"])]
+    if web:
+        with ThreadPoolExecutor(max_workers=min(HEADER_WORKERS, len(web))) as ex:
+            for ip, result in ex.map(metrics.bind(check), web):
+                hosts[ip]["headers"] = result
+
+    return {
+        "ok": True,
+        "hosts": hosts,
+        "unresolved": sorted(unresolved),
+        "dns_failed": sorted(dns_failed),
+        "skipped_private": skipped,
+        "truncated": truncated,
+        "stats": {
+            "names": len(names),
+            "resolved": len(names) - len(unresolved) - len(dns_failed),
+            "unique_ips": len(by_ip),
+            "scanned": len(scans),
+            "live": sum(1 for h in hosts.values() if h["live"]),
+        },
+    }
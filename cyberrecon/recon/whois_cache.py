@@ -0,0 +1,100 @@
+# recon/whois_cache.py
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DB_PATH = os.environ.get(
+    "CYBERRECON_WHOIS_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "whois.sqlite3"),
+)
+TTL = float(os.environ.get("CYBERRECON_WHOIS_TTL", str(7 * 24 * 3600)))   # registrations change rarely
+
+# per registry WHOIS server: one query every INTERVAL seconds, callers queue for their slot
+INTERVAL = float(os.environ.get("CYBERRECON_WHOIS_INTERVAL", "2.0"))
+MAX_WAIT = 300          # a queue longer than this serves the expired record, if any, instead of waiting
+BACKOFF = 30            # extra spacing after the server says we're over its limit
+
+
+class WhoisStore:
+    """Persistent registrable-domain -> WHOIS result map (sqlite, one shared connection)."""
+
+    def __init__(self, path: str = DB_PATH, ttl: float = TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS whois ("
+                               "domain TEXT PRIMARY KEY, result TEXT NOT NULL, fetched_at REAL NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, domain: str, stale: bool = False):
+        """(result, fetched_at) if a fresh entry exists (or any entry, with stale=True), else None."""
+        with self._lock:
+            row = self._db().execute("SELECT result, fetched_at FROM whois WHERE domain = ?", (domain,)).fetchone()
+        if row is None or (not stale and time.time() - row[1] > self.ttl):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, domain: str, result: dict):
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO whois (domain, result, fetched_at) VALUES (?, ?, ?)",
+                       (domain, json.dumps(result, default=str), time.time()))
+            db.commit()
+
+    def prune(self) -> int:
+        with self._lock:
+            db = self._db()
+            n = db.execute("DELETE FROM whois WHERE fetched_at < ?", (time.time() - self.ttl,)).rowcount
+            db.commit()
+        return n
+
+
+class RegistryLimiter:
+    """
+    Spaces queries to each WHOIS server INTERVAL seconds apart. Each caller reserves
+    the next free slot and sleeps until it, so a burst of lookups against one
+    registry turns into an orderly queue instead of a wall of throttling errors.
+    """
+
+    def __init__(self, interval: float = INTERVAL):
+        self.interval = interval
+        self._next = {}     # server -> monotonic time of its next free slot
+        self._lock = threading.Lock()
+
+    def acquire(self, server: str) -> float:
+        """Block until `server` may be queried; returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(server, now))
+            self._next[server] = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def delay(self, server: str) -> float:
+        """Seconds a caller arriving now would wait for `server`."""
+        with self._lock:
+            return max(0.0, self._next.get(server, 0.0) - time.monotonic())
+
+    def backoff(self, server: str, seconds: float = BACKOFF):
+        """Push the server's queue back after it reported a rate limit."""
+        with self._lock:
+            now = time.monotonic()
+            self._next[server] = max(self._next.get(server, now), now) + seconds
+
+    def queued(self) -> dict:
+        """Seconds of queue currently ahead of a new caller, per server."""
+        now = time.monotonic()
+        with self._lock:
+            return {s: round(t - now, 1) for s, t in self._next.items() if t > now}
@@ -1,19 +1,95 @@
 # recon/whois_lookup.py
+import json
+import time
+import threading
+from concurrent.futures import Future
+
 try:
     import whois
 except Exception:
     whois = None
 
-def lookup(domain: str):
-    if whois is None:
-        return {"error": "python-whois not installed"}
-    try:
-        w = whois.whois(domain)
+from recon import metrics
+from recon.etld import registrable_domain
+from recon.whois_cache import WhoisStore, RegistryLimiter, MAX_WAIT
+
+RETRIES = 2
+THROTTLE_HINTS = ("limit exceeded", "too many", "rate limit", "quota", "try again later", "exceeded the")
+
+STORE = WhoisStore()
+LIMITER = RegistryLimiter()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _registry(domain: str) -> str:
+    # one registry (and WHOIS server) per TLD
+    return domain.rsplit(".", 1)[-1]
+
+
+def _query(domain: str) -> dict:
+    """One rate-limited WHOIS query, retried with back-off while the registry throttles us."""
+    server = _registry(domain)
+    for attempt in range(RETRIES + 1):
+        LIMITER.acquire(server)
+        try:
+            with metrics.span("whois_query"):
+                w = whois.whois(domain)
+        except Exception as e:
+            if attempt < RETRIES and any(h in str(e).lower() for h in THROTTLE_HINTS):
+                LIMITER.backoff(server)
+                continue
+            raise
         result = {}
         # pack main keys safely
         for key in ["domain_name","registrar","creation_date","expiration_date","name_servers","emails","status"]:
             val = w.get(key) if isinstance(w, dict) else getattr(w, key, None)
             result[key] = val
-        return result
+        # dates etc. as the strings they become in stored reports, so cached == fresh
+        return json.loads(json.dumps(result, default=str))
+
+
+def _lookup_registrable(domain: str) -> dict:
+    cached = STORE.get(domain)
+    if cached is not None:
+        return cached[0]
+    if LIMITER.delay(_registry(domain)) > MAX_WAIT:
+        # the registry is backed up: an expired record now beats a fresh one in several minutes
+        stale = STORE.get(domain, stale=True)
+        if stale is not None:
+            fetched_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(stale[1]))
+            return dict(stale[0], deferred=True, fetched_at=fetched_at)
+    result = _query(domain)
+    STORE.put(domain, result)
+    return result
+
+
+def lookup(domain: str):
+    """
+    WHOIS for the registrable domain (eTLD+1) of `domain`: served from the persistent
+    store while fresh, otherwise one queued query shared by every concurrent caller.
+    While the registry's queue is longer than MAX_WAIT an expired record is returned
+    as is, marked "deferred", rather than waiting for the query.
+    """
+    if whois is None:
+        return {"error": "python-whois not installed"}
+    base = registrable_domain(domain)
+    with _inflight_lock:
+        fut = _inflight.get(base)
+        owner = fut is None
+        if owner:
+            fut = _inflight[base] = Future()
+    if owner:
+        try:
+            fut.set_result(_lookup_registrable(base))
+        except Exception as e:
+            fut.set_exception(e)
+        finally:
+            with _inflight_lock:
+                _inflight.pop(base, None)
+    try:
+        result = dict(fut.result())
     except Exception as e:
-        return {"error": str(e)}
+        return {"error": str(e), "registrable_domain": base}
+    result["registrable_domain"] = base
+    return result
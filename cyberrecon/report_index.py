@@ -0,0 +1,110 @@
+# report_index.py
+import os
+import re
+import bisect
+import threading
+
+# <domain>_<YYYYmmdd>_<HHMMSS>[.delta].json[.gz], as written by report_store.ReportStore
+REPORT_RE = re.compile(r"^(?P<domain>.+)_(?P<ts>\d{8}_\d{6})(?P<delta>\.delta)?\.json(?P<gz>\.gz)?$")
+
+
+def parse_report_name(name: str):
+    """Return (domain, ts, kind) for a report file name, or None if it isn't one. kind is full/delta."""
+    m = REPORT_RE.match(name)
+    if not m:
+        return None
+    return m.group("domain"), m.group("ts"), "delta" if m.group("delta") else "full"
+
+
+class ReportIndex:
+    """
+    In-memory index of the reports directory: domain -> reports ordered by time.
+
+    Built once from a directory listing, then kept current by add() when a report
+    is written and by refresh(), which only re-lists the directory when its mtime
+    changes (files copied in or deleted by hand).
+    """
+
+    def __init__(self, reports_dir: str):
+        self.reports_dir = reports_dir
+        self._lock = threading.RLock()
+        self._all = []          # sorted [(ts, name)]
+        self._by_domain = {}    # domain -> sorted [(ts, name)]
+        self._names = {}        # name -> domain
+        self._dir_mtime = None
+        self.refresh()
+
+    # --- maintenance ---
+    def add(self, name: str) -> bool:
+        parsed = parse_report_name(name)
+        if not parsed:
+            return False
+        domain, ts, _ = parsed
+        with self._lock:
+            if name in self._names:
+                return False
+            self._names[name] = domain
+            bisect.insort(self._all, (ts, name))
+            bisect.insort(self._by_domain.setdefault(domain, []), (ts, name))
+        return True
+
+    def written(self, name: str):
+        """
+        Record a report we just wrote, so it is listed straight away. The directory mtime is
+        left to refresh(): taking it here would also hide reports other processes wrote since.
+        """
+        self.add(name)
+
+    def remove(self, name: str):
+        with self._lock:
+            domain = self._names.pop(name, None)
+            if domain is None:
+                return
+            ts = parse_report_name(name)[1]
+            for entries in (self._all, self._by_domain[domain]):
+                i = bisect.bisect_left(entries, (ts, name))
+                if i < len(entries) and entries[i] == (ts, name):
+                    entries.pop(i)
+            if not self._by_domain[domain]:
+                del self._by_domain[domain]
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.reports_dir).st_mtime_ns
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if mtime == self._dir_mtime:
+                return
+            on_disk = set(os.listdir(self.reports_dir))
+            for name in set(self._names) - on_disk:
+                self.remove(name)
+            for name in on_disk - set(self._names):
+                self.add(name)
+            self._dir_mtime = mtime
+
+    # --- queries ---
+    def latest(self, domain: str = None):
+        with self._lock:
+            entries = self._all if domain is None else self._by_domain.get(domain, [])
+            return entries[-1][1] if entries else None
+
+    def query(self, domain: str = None, since: str = None, until: str = None, offset: int = 0, limit: int = 50):
+        """Newest-first page of report names; since/until are inclusive YYYYmmdd[_HHMMSS] bounds."""
+        with self._lock:
+            entries = self._all if domain is None else self._by_domain.get(domain, [])
+            lo = bisect.bisect_left(entries, (since,)) if since else 0
+            hi = bisect.bisect_right(entries, (until + "\uffff",)) if until else len(entries)
+            total = max(0, hi - lo)
+            end = max(lo, hi - offset)
+            start = max(lo, end - limit)
+            page = [(name, self._names[name], ts) for ts, name in reversed(entries[start:end])]
+        return total, page
+
+    def __contains__(self, name: str):
+        with self._lock:
+            return name in self._names
+
+    def domains(self):
+        with self._lock:
+            return sorted(self._by_domain)
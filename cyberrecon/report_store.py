@@ -0,0 +1,232 @@
+# report_store.py
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+from report_index import ReportIndex, parse_report_name
+
+KEYFRAME_INTERVAL = 10   # a full report at least every N scans of a domain bounds delta chains
+
+# headers that change on every response and would drown real changes in /diff
+VOLATILE_HEADERS = {"date", "expires", "age", "set-cookie", "etag", "last-modified", "x-request-id",
+                    "x-amz-cf-id", "cf-ray", "report-to", "nel", "x-fb-debug", "x-served-by", "x-timer"}
+
+
+# === Delta encoding ===
+# A delta is a dict node: {"$set": value} replaces, {"$keys": {k: delta}, "$del": [k]} edits a
+# dict, {"$add": [...], "$rm": [...]} edits a sorted list of unique scalars (subdomains, ports).
+
+def _is_sorted_scalar_set(v):
+    if not isinstance(v, list) or not all(isinstance(x, (str, int, float)) for x in v):
+        return False
+    try:
+        return all(a < b for a, b in zip(v, v[1:]))
+    except TypeError:
+        return False  # mixed str/int
+
+
+def make_delta(old, new):
+    """Delta turning `old` into `new`, or None if they are equal."""
+    if old == new:
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        keys = {}
+        for k, v in new.items():
+            d = make_delta(old[k], v) if k in old else {"$set": v}
+            if d is not None:
+                keys[k] = d
+        node = {}
+        if keys:
+            node["$keys"] = keys
+        dropped = [k for k in old if k not in new]
+        if dropped:
+            node["$del"] = dropped
+        return node
+    if _is_sorted_scalar_set(old) and _is_sorted_scalar_set(new):
+        o, n = set(old), set(new)
+        try:
+            # apply_delta re-sorts the union, so both sides must be mutually orderable
+            sorted(o | n)
+            return {"$add": sorted(n - o), "$rm": sorted(o - n)}
+        except TypeError:
+            pass
+    return {"$set": new}
+
+
+def apply_delta(old, delta):
+    if delta is None:
+        return old
+    if "$set" in delta:
+        return delta["$set"]
+    if "$add" in delta or "$rm" in delta:
+        return sorted((set(old) - set(delta.get("$rm", []))) | set(delta.get("$add", [])))
+    out = dict(old)
+    for k in delta.get("$del", []):
+        out.pop(k, None)
+    for k, d in delta.get("$keys", {}).items():
+        out[k] = apply_delta(out.get(k), d)
+    return out
+
+
+# === Semantic diff ===
+def _set_diff(old, new):
+    o, n = set(old or []), set(new or [])
+    return {"added": sorted(n - o, key=str), "removed": sorted(o - n, key=str)}
+
+
+def diff_summaries(old: dict, new: dict) -> dict:
+    """Human-level changes between two summaries of the same domain."""
+    ro, rn = old.get("results", {}), new.get("results", {})
+
+    def sub(r):
+        return (r.get("subdomains") or {}).get("subdomains") or []
+
+    def ports(r):
+        return (r.get("ports") or {}).get("open_ports") or []
+
+    def headers(r):
+        h = (r.get("headers") or {}).get("headers") or {}
+        return {k.lower(): v for k, v in h.items() if k.lower() not in VOLATILE_HEADERS}
+
+    ho, hn = headers(ro), headers(rn)
+    changed = {k: {"from": ho[k], "to": hn[k]} for k in ho.keys() & hn.keys() if ho[k] != hn[k]}
+    dns_o, dns_n = ro.get("dns") or {}, rn.get("dns") or {}
+    dns = {}
+    for rtype in sorted(set(dns_o) | set(dns_n)):
+        if isinstance(dns_o.get(rtype, []), list) and isinstance(dns_n.get(rtype, []), list):
+            d = _set_diff(dns_o.get(rtype), dns_n.get(rtype))
+            if d["added"] or d["removed"]:
+                dns[rtype] = d
+
+    p = _set_diff(ports(ro), ports(rn))
+    return {
+        "from": old.get("generated_at"),
+        "to": new.get("generated_at"),
+        "subdomains": _set_diff(sub(ro), sub(rn)),
+        "ports": {"opened": p["added"], "closed": p["removed"]},
+        "headers": {
+            "added": {k: hn[k] for k in sorted(hn.keys() - ho.keys())},
+            "removed": sorted(ho.keys() - hn.keys()),
+            "changed": changed,
+        },
+        "dns": dns,
+        "risk_score": {"from": old.get("risk_score"), "to": new.get("risk_score")},
+    }
+
+
+# === HTTP variants ===
+def _report_time(name):
+    ts = parse_report_name(os.path.basename(name))[1]
+    return datetime.strptime(ts, "%Y%m%d_%H%M%S").replace(tzinfo=timezone.utc)
+
+
+def encode_variants(body: bytes, last_modified: datetime) -> dict:
+    """A response body with its strong ETag and max-level gzip (and brotli, when installed) encodings."""
+    return {
+        "json": body,
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        "br": brotli.compress(body, quality=11) if brotli is not None else None,
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "last_modified": last_modified,
+    }
+
+
+# === Storage ===
+class ReportStore:
+    """
+    Reports on disk as gzip-compressed JSON. With `delta` on, a scan that follows an
+    earlier report of the same domain is stored as <domain>_<ts>.delta.json.gz holding
+    only the changes against that report; every KEYFRAME_INTERVAL-th report is full.
+    Plain .json reports written by older versions are still readable.
+    """
+
+    def __init__(self, reports_dir: str, index: ReportIndex, delta: bool = True,
+                 keyframe_interval: int = KEYFRAME_INTERVAL):
+        self.reports_dir = reports_dir
+        self.index = index
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.reports_dir, os.path.basename(name))
+
+    def _read_raw(self, name):
+        path = self._path(name)
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def _write(self, name, obj):
+        # write-then-rename so readers never see a half-written report
+        path = self._path(name)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as fh:
+            json.dump(obj, fh, ensure_ascii=False, default=str, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    # --- HTTP variants ---
+    def http_variants(self, name: str) -> dict:
+        """
+        A report's JSON response body and its compressed encodings: see encode_variants().
+        Built in memory from the stored report (nothing extra is written, so delta storage
+        keeps its savings); callers cache the result. Reports are immutable, so the ETag is strong.
+        """
+        if not parse_report_name(os.path.basename(name)):
+            raise FileNotFoundError(name)
+        body = json.dumps(self.load(name), ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+        return encode_variants(body, _report_time(name))
+
+    def load(self, name: str) -> dict:
+        """Full summary for a report name, rebuilding delta reports from their keyframe."""
+        chain = []
+        raw = self._read_raw(name)
+        while parse_report_name(name)[2] == "delta":
+            chain.append(raw["delta"])
+            name = raw["base"]
+            raw = self._read_raw(name)
+        summary = raw
+        for delta in reversed(chain):
+            summary = apply_delta(summary, delta)
+        return summary
+
+    def save(self, summary: dict) -> str:
+        """Store a summary and return the report file name."""
+        domain = summary["domain"]
+        with self._lock:
+            self.index.refresh()
+            latest = self.index.latest(domain)
+            ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            # names sort by timestamp, so never reuse the second of the previous report
+            while latest and ts == parse_report_name(latest)[1]:
+                time.sleep(0.05)
+                ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            base = latest if self.delta else None
+            depth = 0
+            base_summary = None
+            if base:
+                try:
+                    if parse_report_name(base)[2] == "delta":
+                        depth = self._read_raw(base).get("depth", 0)
+                    if depth + 1 < self.keyframe_interval:
+                        base_summary = self.load(base)
+                except Exception:
+                    base_summary = None  # unreadable base: fall back to a keyframe
+
+            if base_summary is not None:
+                name = f"{domain}_{ts}.delta.json.gz"
+                self._write(name, {"base": base, "depth": depth + 1, "delta": make_delta(base_summary, summary)})
+            else:
+                name = f"{domain}_{ts}.json.gz"
+                self._write(name, summary)
+            self.index.written(name)
+        return name
@@ -0,0 +1,111 @@
+# result_cache.py
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Freshness window per module, in seconds. 0 = never served from cache,
+# but concurrent scans of the same domain still share one computation.
+DEFAULT_TTLS = {
+    "whois": 24 * 3600,
+    "subdomains": 24 * 3600,
+    "dns": 300,
+    "headers": 0,
+    "ports": 0,
+    "snapshot": 0,
+    "surface": 0,
+}
+MAX_ENTRIES = 2048
+
+
+def _ttls_from_env(spec: str):
+    # CYBERRECON_CACHE_TTLS="whois=86400,dns=600"
+    out = {}
+    for item in spec.split(","):
+        name, _, val = item.partition("=")
+        if name.strip() and val.strip():
+            out[name.strip()] = float(val)
+    return out
+
+
+def _is_error(value) -> bool:
+    return isinstance(value, dict) and ("error" in value or value.get("ok") is False)
+
+
+def _cacheable(value) -> bool:
+    # a "deferred" result is a stand-in served while its source was backed up: look again next time
+    return not _is_error(value) and not (isinstance(value, dict) and value.get("deferred"))
+
+
+class ResultCache:
+    """
+    Bounded LRU of (module, domain) -> result with per-module freshness TTLs.
+    Concurrent requests for the same key are coalesced into one computation.
+    """
+
+    def __init__(self, ttls: dict = None, max_entries: int = MAX_ENTRIES):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self._data = OrderedDict()      # key -> (stored_at, value)
+        self._inflight = {}             # key -> Future
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if time.time() - stored_at > self.ttls.get(key[0], 0):
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get_or_compute(self, module: str, domain: str, compute, refresh: bool = False):
+        """Return (value, source) where source is "computed", "cache" or "inflight"."""
+        key = (module, domain)
+        with self._lock:
+            if not refresh:
+                value = self._fresh(key)
+                if value is not None:
+                    return copy.deepcopy(value), "cache"
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[key] = Future()
+
+        if not owner:
+            # someone is computing this right now: a result that fresh satisfies refresh too
+            return copy.deepcopy(fut.result()), "inflight"
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if self.ttls.get(module, 0) > 0 and _cacheable(value):
+                self._data[key] = (time.time(), value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        fut.set_result(value)
+        return copy.deepcopy(value), "computed"
+
+    def invalidate(self, module: str = None, domain: str = None):
+        with self._lock:
+            for key in [k for k in self._data if (module is None or k[0] == module) and (domain is None or k[1] == domain)]:
+                del self._data[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+RESULT_CACHE = ResultCache(ttls=_ttls_from_env(os.environ.get("CYBERRECON_CACHE_TTLS", "")))
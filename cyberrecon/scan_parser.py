@@ -1,9 +1,14 @@
 # scan_parser.py
 import os
 import json
+import time
 import logging
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from result_cache import RESULT_CACHE
+from recon import metrics
 
 # Safe imports
 try:
@@ -12,7 +17,10 @@ try:
     from recon.port_scan import scan_ports
     from recon.subdomains_crtsh import crtsh_subdomains
     from recon.whois_lookup import lookup
-    from recon.screenshot import save_html_snapshot
+    from recon.screenshot import save_html_snapshot, stored_page
+    from recon.http_fetch import PageFetcher
+    from recon.resolver import Resolver
+    from recon.surface import map_attack_surface
 except ImportError:
     logging.warning("Some recon modules missing — using fallbacks.")
 
@@ -24,47 +32,228 @@ def write_summary_file(summary: dict, out_path="summary.json"):
     return out_path
 
 
+# === Per-scan state ===
+class ScanContext:
+    """State shared by the modules scanning one domain (e.g. one HTTP fetch for headers + snapshot)."""
+
+    def __init__(self, domain: str):
+        self.domain = domain
+        self.results = {}   # finished module results, for modules that depend on others
+        self.timings = metrics.Timings()
+        self.resolver = Resolver()
+        # the page's ETag/Last-Modified from the last snapshot go out with the scan's first fetch of it
+        self.fetcher = PageFetcher(resolver=self.resolver, stored=stored_page)
+
+
 # === Task registry ===
+# ports probed on the apex host: a list, "80,443,8000-8100" or a preset name ("top100")
+SCAN_PORTS = os.environ.get("CYBERRECON_SCAN_PORTS", "21,22,23,25,53,80,443,8080")
+
 TASKS = {
-    "dns": lambda domain: get_all_dns(domain),
-    "headers": lambda domain: fetch_headers(domain),
-    "ports": lambda domain: scan_ports(domain, ports=[21,22,23,25,53,80,443,8080], timeout=1.0),
-    "subdomains": lambda domain: crtsh_subdomains(domain),
-    "whois": lambda domain: lookup(domain),
-    "snapshot": lambda domain: save_html_snapshot(domain),
+    "dns": lambda domain, ctx: get_all_dns(domain, resolver=ctx.resolver),
+    "headers": lambda domain, ctx: fetch_headers(domain, fetcher=ctx.fetcher),
+    "ports": lambda domain, ctx: scan_ports(domain, ports=SCAN_PORTS, timeout=1.0, resolver=ctx.resolver),
+    "subdomains": lambda domain, ctx: crtsh_subdomains(domain, resolver=ctx.resolver),
+    "whois": lambda domain, ctx: lookup(domain),
+    "snapshot": lambda domain, ctx: save_html_snapshot(domain, fetcher=ctx.fetcher),
+    "surface": lambda domain, ctx: map_attack_surface(
+        domain, (ctx.results.get("subdomains") or {}).get("subdomains", []),
+        resolver=ctx.resolver, fetcher=ctx.fetcher),
+}
+
+# modules that need another module's result first
+TASK_DEPENDS = {
+    "surface": ("subdomains",),
 }
 
 
-# === Core Builder ===
-def build_summary_for_domain(domain: str):
-    summary = {
+# === Batch limits ===
+# One pool is shared by every domain and module in a batch; the per-module
+# caps keep slow, rate-limited sources (whois, crt.sh) from being hammered
+# while the cheap modules run wide.
+MAX_WORKERS = 16
+MODULE_LIMITS = {
+    "dns": 8,
+    "headers": 8,
+    "ports": 8,
+    "subdomains": 2,
+    "whois": 2,
+    "snapshot": 4,
+    "surface": 4,
+}
+
+
+# fingerprinted services that rarely belong on the internet, and what each exposed one adds
+SERVICE_RISK = {
+    "telnet": 10, "redis": 10, "memcached": 10, "mongodb": 10, "elasticsearch": 8, "vnc": 8,
+    "ms-wbt-server": 8, "microsoft-ds": 8, "ftp": 5, "mysql": 5, "postgresql": 5, "ms-sql-s": 5,
+    "rpcbind": 5,
+}
+VERSION_DISCLOSURE_RISK = 1   # banner gives away product + version
+
+
+def _service_risk(services: dict) -> int:
+    score = 0
+    for svc in (services or {}).values():
+        score += SERVICE_RISK.get(svc.get("service"), 0)
+        if svc.get("product") and svc.get("version"):
+            score += VERSION_DISCLOSURE_RISK
+    return score
+
+
+def _new_summary(domain: str):
+    return {
         "domain": domain,
         "generated_at": datetime.utcnow().isoformat(),
         "results": {},
         "errors": [],
         "risk_score": 0,
+        "cached_modules": [],
     }
 
-    logging.info(f"Building summary for {domain}")
 
-    # Run all modules in parallel
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_task = {executor.submit(func, domain): name for name, func in TASKS.items()}
+def _run_task(name: str, domain: str, ctx: ScanContext, refresh):
+    """Run one module through the result cache; `refresh` is a bool or a set of module names."""
+    force = refresh is True or (bool(refresh) and name in refresh)
 
-        for future in as_completed(future_to_task):
-            task = future_to_task[future]
-            try:
-                result = future.result()
-                summary["results"][task] = result
-            except Exception as e:
-                summary["errors"].append(f"{task}: {e}")
-                summary["results"][task] = {"error": str(e)}
+    def compute():
+        start = time.perf_counter()
+        try:
+            with metrics.recording(ctx.timings):
+                return TASKS[name](domain, ctx)
+        finally:
+            elapsed = time.perf_counter() - start
+            ctx.timings.module(name, elapsed)
+            metrics.MODULE_SECONDS.observe(elapsed, module=name)
 
+    try:
+        value, source = RESULT_CACHE.get_or_compute(name, domain, compute, refresh=force)
+    except Exception:
+        metrics.MODULE_ERRORS.inc(module=name)
+        raise
+    metrics.MODULE_RUNS.inc(module=name, source=source)
+    if isinstance(value, dict) and (value.get("error") or value.get("ok") is False):
+        metrics.MODULE_ERRORS.inc(module=name)
+    return value, source
+
+
+def _finalize(summary: dict, ctx: ScanContext = None):
+    summary["cached_modules"].sort()
+    if ctx is not None:
+        summary["timings"] = ctx.timings.to_dict()
+        modules = summary["timings"]["modules"]
+        slowest = max(modules, key=modules.get) if modules else None
+        logging.info(f"Finished summary for {summary['domain']} in {summary['timings']['total_s']:.2f}s"
+                     + (f" (slowest: {slowest} {modules[slowest]:.2f}s)" if slowest else ""))
     # Simple heuristic: missing headers or open ports increase risk
     headers = summary["results"].get("headers", {}).get("headers", {})
     open_ports = summary["results"].get("ports", {}).get("open_ports", [])
     if "Content-Security-Policy" not in [k.lower() for k in headers.keys()]:
         summary["risk_score"] += 10
     summary["risk_score"] += len(open_ports) * 2
-
+    summary["risk_score"] += _service_risk(summary["results"].get("ports", {}).get("services"))
+    # every other exposed service on the wider attack surface counts too
+    apex_ip = summary["results"].get("ports", {}).get("ip")
+    for ip, host in (summary["results"].get("surface", {}).get("hosts") or {}).items():
+        if ip != apex_ip:
+            summary["risk_score"] += len(host.get("open_ports", [])) + _service_risk(host.get("services"))
     return summary
+
+
+def _next_ready(q: deque, name: str, ctx_by_domain: dict):
+    """Pop the first queued domain whose dependencies for module `name` have finished."""
+    deps = TASK_DEPENDS.get(name, ())
+    for i, domain in enumerate(q):
+        ctx = ctx_by_domain.get(domain)
+        if not deps or (ctx is not None and all(d in ctx.results for d in deps)):
+            del q[i]
+            return domain
+    return None
+
+
+# === Core Builder ===
+def build_summaries(domains, max_workers: int = MAX_WORKERS, module_limits: dict = None, refresh=False,
+                    on_result=None, cancel=None):
+    """
+    Scan many domains on one bounded pool, yielding each summary as soon as it is complete.
+    Module results may come from RESULT_CACHE; pass refresh=True (or a set of module
+    names) to recompute instead.
+
+    on_result(domain, module, result, cached) is called as each module finishes.
+    Setting the `cancel` threading.Event stops the batch: queued modules are
+    dropped and the generator returns without yielding the unfinished summaries.
+    """
+    if refresh and refresh is not True:
+        refresh = set(refresh)
+    domains = list(dict.fromkeys(domains))
+    limits = dict(MODULE_LIMITS, **(module_limits or {}))
+    queues = {name: deque(domains) for name in TASKS}
+    running = {name: 0 for name in TASKS}
+    remaining = {d: len(TASKS) for d in domains}
+    summaries, contexts = {}, {}
+
+    logging.info(f"Building summaries for {len(domains)} domain(s)")
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    in_flight = {}
+    metrics.POOL_SIZE.inc(max_workers, pool="scan")
+    try:
+        while in_flight or any(queues.values()):
+            if cancel is not None and cancel.is_set():
+                logging.info(f"Batch cancelled with {len(summaries)} summaries unfinished")
+                return
+            # fill free workers, round-robin over modules so a capped module can't starve the rest
+            progressed = True
+            while progressed and len(in_flight) < max_workers:
+                progressed = False
+                for name, q in queues.items():
+                    if q and running[name] < limits.get(name, max_workers) and len(in_flight) < max_workers:
+                        domain = _next_ready(q, name, contexts)
+                        if domain is None:
+                            continue
+                        if domain not in summaries:
+                            summaries[domain] = _new_summary(domain)
+                            contexts[domain] = ScanContext(domain)
+                            logging.info(f"Building summary for {domain}")
+                        in_flight[executor.submit(_run_task, name, domain, contexts[domain], refresh)] = (name, domain)
+                        running[name] += 1
+                        metrics.POOL_BUSY.inc(pool="scan")
+                        progressed = True
+
+            # wake up periodically when cancellable so a cancel isn't stuck behind a slow module
+            done, _ = wait(in_flight, timeout=0.5 if cancel is not None else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, domain = in_flight.pop(future)
+                running[task] -= 1
+                metrics.POOL_BUSY.dec(pool="scan")
+                summary = summaries[domain]
+                try:
+                    summary["results"][task], source = future.result()
+                    if source != "computed":
+                        summary["cached_modules"].append(task)
+                except Exception as e:
+                    source = "computed"
+                    summary["errors"].append(f"{task}: {e}")
+                    summary["results"][task] = {"error": str(e)}
+                contexts[domain].results[task] = summary["results"][task]
+                if on_result is not None:
+                    try:
+                        on_result(domain, task, summary["results"][task], source != "computed")
+                    except Exception as e:
+                        logging.warning(f"on_result callback failed for {domain}/{task}: {e}")
+
+                remaining[domain] -= 1
+                if remaining[domain] == 0:
+                    yield _finalize(summaries.pop(domain), contexts.pop(domain, None))
+    finally:
+        metrics.POOL_BUSY.dec(len(in_flight), pool="scan")
+        metrics.POOL_SIZE.dec(max_workers, pool="scan")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_summary_for_domain(domain: str, refresh=False):
+    batch = build_summaries([domain], max_workers=5, refresh=refresh)
+    try:
+        return next(batch)
+    finally:
+        batch.close()
@@ -0,0 +1,296 @@
+# scheduler.py
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from recon import metrics
+from recon.etld import registrable_domain
+
+WATCHLIST_PATH = os.environ.get(
+    "CYBERRECON_WATCHLIST",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "watchlist.json"),
+)
+DEFAULT_INTERVAL = 24 * 3600
+MIN_INTERVAL = 300
+JITTER = 0.1             # each run lands within +/-10% of its interval, so targets drift apart
+
+# global budgets: scans at once, scans started per RATE_WINDOW
+MAX_CONCURRENT = int(os.environ.get("CYBERRECON_SCHEDULER_CONCURRENCY", "2"))
+MAX_PER_WINDOW = int(os.environ.get("CYBERRECON_SCHEDULER_RATE", "30"))
+RATE_WINDOW = 3600
+# per host (registrable domain) budgets: watch entries for www.x.com and api.x.com hit the same people
+HOST_CONCURRENCY = 1
+HOST_SPACING = float(os.environ.get("CYBERRECON_SCHEDULER_HOST_SPACING", "60"))
+
+TICK = 1.0               # longest the loop sleeps before re-checking budgets
+OVERLAP_POLICIES = ("skip", "merge")
+
+SCHEDULED_RUNS = metrics.Counter("cyberrecon_scheduled_runs_total",
+                                 "Watch-list scans by outcome (done, failed, skipped, merged).", ("outcome",))
+
+
+class WatchTarget:
+    """One watched domain: how often to scan it and what happened last time."""
+
+    FIELDS = ("domain", "interval", "refresh", "overlap", "enabled", "next_run",
+              "last_started", "last_finished", "last_report", "last_error", "runs", "skipped", "merged")
+
+    def __init__(self, domain: str, interval: float = DEFAULT_INTERVAL, refresh=True, overlap: str = "skip",
+                 enabled: bool = True, next_run: float = None, **state):
+        self.domain = domain
+        self.interval = max(MIN_INTERVAL, float(interval))
+        self.refresh = refresh
+        self.overlap = overlap
+        self.enabled = enabled
+        # first run somewhere in the first interval rather than every new target at once
+        self.next_run = next_run if next_run is not None else time.time() + random.uniform(0, self.interval)
+        self.last_started = state.get("last_started")
+        self.last_finished = state.get("last_finished")
+        self.last_report = state.get("last_report")
+        self.last_error = state.get("last_error")
+        self.runs = state.get("runs", 0)
+        self.skipped = state.get("skipped", 0)
+        self.merged = state.get("merged", 0)
+        self.running = False
+        self.pending = None      # merged refresh request waiting for the running scan to finish
+
+    @property
+    def host(self):
+        return registrable_domain(self.domain)
+
+    def reschedule(self, now: float):
+        self.next_run = now + self.interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def to_dict(self):
+        out = {k: getattr(self, k) for k in self.FIELDS}
+        out["running"] = self.running
+        return out
+
+
+def _merge_refresh(a, b):
+    """Union of two refresh requests (False, True or a list of module names)."""
+    if a is True or b is True:
+        return True
+    merged = sorted(set(a or []) | set(b or []))
+    return merged or False
+
+
+class Scheduler:
+    """
+    Re-scans a persistent watch list on a fixed pool. Due targets start only while the
+    global (MAX_CONCURRENT at once, MAX_PER_WINDOW per hour) and per-host (HOST_CONCURRENCY
+    at once, HOST_SPACING apart) budgets allow, so load stays flat instead of spiking when
+    many targets come due together. A target that comes due while its previous scan is
+    still running is skipped, or with overlap="merge" run once more right after it.
+
+    `run(domain, refresh)` does the scan and returns the report file name.
+    """
+
+    def __init__(self, run, path: str = WATCHLIST_PATH, max_concurrent: int = MAX_CONCURRENT,
+                 max_per_window: int = MAX_PER_WINDOW, window: float = RATE_WINDOW,
+                 host_concurrency: int = HOST_CONCURRENCY, host_spacing: float = HOST_SPACING):
+        self._run = run
+        self.path = path
+        self.max_concurrent = max_concurrent
+        self.max_per_window = max_per_window
+        self.window = window
+        self.host_concurrency = host_concurrency
+        self.host_spacing = host_spacing
+        self._targets = {}
+        self._started = deque()     # monotonic start times within the rate window
+        self._host_running = {}     # host -> scans in progress
+        self._host_last = {}        # host -> monotonic time of its last start
+        self._running = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="watch")
+        self._thread = None
+        self._load()
+
+    # --- persistence ---
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                rows = json.load(fh)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.error(f"Could not read watch list {self.path}: {e}")
+            return
+        for row in rows:
+            t = WatchTarget(**{k: v for k, v in row.items() if k in WatchTarget.FIELDS})
+            self._targets[t.domain] = t
+
+    def _save(self):
+        # callers hold self._lock; write-then-rename so a crash never truncates the list
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump([t.to_dict() for t in self._targets.values()], fh, indent=2, default=str)
+        os.replace(tmp, self.path)
+
+    # --- watch list ---
+    def add(self, domain: str, interval: float = DEFAULT_INTERVAL, refresh=True, overlap: str = "skip") -> WatchTarget:
+        """Watch a domain, or update its settings if already watched (keeping its schedule)."""
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"overlap must be one of {', '.join(OVERLAP_POLICIES)}")
+        with self._lock:
+            t = self._targets.get(domain)
+            if t is None:
+                t = self._targets[domain] = WatchTarget(domain, interval, refresh, overlap)
+            else:
+                t.interval = max(MIN_INTERVAL, float(interval))
+                t.refresh, t.overlap, t.enabled = refresh, overlap, True
+                t.next_run = min(t.next_run, time.time() + t.interval)
+            self._save()
+        self._wake.set()
+        return t
+
+    def remove(self, domain: str) -> bool:
+        with self._lock:
+            if self._targets.pop(domain, None) is None:
+                return False
+            self._save()
+        return True
+
+    def get(self, domain: str):
+        with self._lock:
+            return self._targets.get(domain)
+
+    def targets(self):
+        with self._lock:
+            return [t.to_dict() for t in sorted(self._targets.values(), key=lambda t: t.next_run)]
+
+    def run_now(self, domain: str):
+        """Make a watched target due immediately (budgets still apply)."""
+        with self._lock:
+            t = self._targets.get(domain)
+            if t is None:
+                return None
+            t.next_run = time.time()
+        self._wake.set()
+        return t
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return {
+                "targets": len(self._targets),
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+                "started_in_window": len(self._started),
+                "max_per_window": self.max_per_window,
+                "window_seconds": self.window,
+                "hosts_running": {h: n for h, n in self._host_running.items() if n},
+            }
+
+    # --- loop ---
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="watch-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _expire(self, now):
+        while self._started and now - self._started[0] >= self.window:
+            self._started.popleft()
+
+    def _host_free(self, host, now):
+        if self._host_running.get(host, 0) >= self.host_concurrency:
+            return False
+        last = self._host_last.get(host)
+        return last is None or now - last >= self.host_spacing
+
+    def _dispatch(self) -> float:
+        """Start every due target the budgets allow; return seconds until it's worth looking again."""
+        now, mono = time.time(), time.monotonic()
+        started = []
+        with self._lock:
+            self._expire(mono)
+            wait = TICK
+            for t in sorted(self._targets.values(), key=lambda t: t.next_run):
+                if not t.enabled:
+                    continue
+                if t.next_run > now:
+                    wait = min(wait, t.next_run - now)
+                    break
+                if t.running:
+                    # due again before the last scan finished
+                    if t.overlap == "merge":
+                        t.pending = _merge_refresh(t.pending, t.refresh)
+                        t.merged += 1
+                        SCHEDULED_RUNS.inc(outcome="merged")
+                    else:
+                        t.skipped += 1
+                        SCHEDULED_RUNS.inc(outcome="skipped")
+                    t.reschedule(now)
+                    continue
+                if self._running >= self.max_concurrent or len(self._started) >= self.max_per_window:
+                    continue   # global budget spent; due targets keep their place in line
+                if not self._host_free(t.host, mono):
+                    continue
+                refresh = t.refresh if t.pending is None else t.pending
+                t.pending = None
+                self._claim(t, now, mono)
+                started.append((t, refresh))
+            if started:
+                self._save()
+        for t, refresh in started:
+            self._pool.submit(self._execute, t, refresh)
+        return wait
+
+    def _claim(self, t, now, mono):
+        t.running = True
+        t.last_started = now
+        t.reschedule(now)
+        self._running += 1
+        self._started.append(mono)
+        self._host_running[t.host] = self._host_running.get(t.host, 0) + 1
+        self._host_last[t.host] = mono
+
+    def _execute(self, t, refresh):
+        outcome = "done"
+        try:
+            report = self._run(t.domain, refresh)
+            error = None
+        except Exception as e:
+            logging.exception(f"Scheduled scan of {t.domain} failed")
+            report, error, outcome = None, str(e), "failed"
+        SCHEDULED_RUNS.inc(outcome=outcome)
+        with self._lock:
+            t.running = False
+            t.last_finished = time.time()
+            t.runs += 1
+            t.last_error = error
+            if report:
+                t.last_report = report
+            self._running -= 1
+            self._host_running[t.host] -= 1
+            if t.pending is not None:
+                # merged run: go again as soon as budgets allow, with the combined refresh
+                t.next_run = time.time()
+            if t.domain in self._targets:
+                self._save()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                wait = self._dispatch()
+            except Exception:
+                logging.exception("Watch scheduler tick failed")
+                wait = TICK
+            self._wake.wait(max(0.05, wait))
+            self._wake.clear()
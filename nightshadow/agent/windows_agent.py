@@ -44,9 +44,9 @@ def send_log(log_data):
     """Sends a single log dictionary to the Flask SIEM collector."""
     try:
         response = requests.post(SIEM_URL, json=log_data, timeout=5)
-        # Check if the SIEM sent an 'alert_triggered' flag
+        # The SIEM queues logs for processing; alerts show up on the dashboard
         result = response.json()
-        print(f"Log sent. Status: {result.get('status')}. Alert: {result.get('alert_triggered', 'None')}")
+        print(f"Log sent. Status: {result.get('status')}. Log ID: {result.get('log_id', 'None')}")
         
     except requests.exceptions.RequestException as e:
         print(f"!!! Error sending log: {e}. Is the SIEM backend running?")
@@ -0,0 +1,62 @@
+# vigilanteye/siem/alert_feed.py
+
+import queue
+import threading
+
+# --- Live Feed Configuration ---
+MAX_SUBSCRIBERS = 100    # open dashboard streams
+BUFFER = 1000            # alerts queued per subscriber before it is cut off
+
+
+class FeedFull(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.overflowed = False
+
+
+class AlertFeed:
+    """
+    Fan-out of newly committed alerts to the open /alerts/stream connections. A subscriber
+    that falls BUFFER alerts behind is cut off rather than allowed to grow without bound;
+    its browser reconnects with Last-Event-ID and catches up from the database.
+    """
+
+    def __init__(self, max_subscribers=MAX_SUBSCRIBERS, buffer=BUFFER):
+        self.max_subscribers = max_subscribers
+        self.buffer = buffer
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise FeedFull(f"{len(self._subscribers)} live streams open (limit {self.max_subscribers})")
+            sub = Subscription(self.buffer)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, alerts):
+        """Hands the alert dicts to every subscriber; never blocks the caller."""
+        if not alerts:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            for alert in alerts:
+                try:
+                    sub.queue.put_nowait(alert)
+                except queue.Full:
+                    sub.overflowed = True
+                    self.unsubscribe(sub)
+                    break
+
+    def __len__(self):
+        return len(self._subscribers)
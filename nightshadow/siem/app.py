@@ -1,19 +1,34 @@
 # vigilanteye/siem/app.py
 
-from flask import Flask, request, render_template
-import sqlite3
-from database import init_db, DB
-from processor import process_log
-from ueba import train_ueba_model 
+from flask import Flask, Response, request, render_template
+import gzip
+import queue
+from database import init_db, alerts_page, logs_page, summary
+from alert_feed import AlertFeed, FeedFull
+from pipeline import Pipeline, PipelineFull, PipelineStopped
+from cti import CTI
+from processor import CORRELATOR
+from ueba import UEBA, train_ueba_model
 import requests
 import json
 import time
 import os
+import io
 
 # --- External SIEM/Log Management Configuration (Hardcoded Placeholders) ---
 SPLUNK_HEC_TOKEN = "YOUR_SPLUNK_HEC_TOKEN"
 SPLUNK_HEC_URL = "https://your.splunk.server:8088/services/collector/event"
 
+# --- Batch ingestion limits ---
+MAX_BATCH_EVENTS = 5000
+MAX_BATCH_BYTES = 16 * 1024 * 1024 # decompressed; guards against gzip bombs
+
+# --- Dashboard ---
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BACKFILL = 500    # alerts per query when replaying missed alerts to a reconnecting live stream
+STREAM_HEARTBEAT = 15    # seconds between keepalive comments on an idle stream
+
 app = Flask(__name__)
 init_db()
 
@@ -37,14 +52,123 @@ def forward_log_to_siem_tool(log_data):
     #     pass
 
 
+# --- Processing Pipeline ---
+# Started on the first request rather than at import, so the debug reloader's
+# watcher process never runs workers (or recovery) of its own.
+ALERT_FEED = AlertFeed()
+PIPELINE = Pipeline(forward=forward_log_to_siem_tool, on_alerts=ALERT_FEED.publish)
+
+@app.before_request
+def start_pipeline():
+    PIPELINE.start()
+    UEBA.start_retraining()
+
+@app.route("/pipeline/stats", methods=["GET"])
+def pipeline_stats():
+    """Queue depth, processing lag and worker usage of the ingestion pipeline."""
+    return {**PIPELINE.stats(), "cti": dict(CTI.stats), "correlation": CORRELATOR.stats(),
+            "ueba": UEBA.stats(), "live_streams": len(ALERT_FEED)}
+
+
 @app.route("/")
 def dashboard():
-    """Serves the main SIEM Dashboard."""
-    conn = sqlite3.connect(DB)
-    logs = conn.execute("SELECT * FROM logs ORDER BY id DESC LIMIT 15").fetchall()
-    alerts = conn.execute("SELECT * FROM alerts ORDER BY id DESC").fetchall()
-    conn.close()
-    return render_template("dashboard.html", logs=logs, alerts=alerts)
+    """Serves the main SIEM Dashboard: the first page of alerts; the rest is paged and streamed in."""
+    logs = logs_page(limit=15)
+    alerts = alerts_page(limit=PAGE_SIZE)
+    return render_template("dashboard.html", logs=logs, alerts=alerts, summary=summary(),
+                           page_size=PAGE_SIZE)
+
+def _int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+def _page_response(rows):
+    return {"items": rows, "next_before": rows[-1]["id"] if rows else None}
+
+@app.route("/api/alerts", methods=["GET"])
+def api_alerts():
+    """Keyset-paged alerts: ?before=<id> for older pages, ?after=<id> for newer ones, ?rule_name= to filter."""
+    try:
+        before, after, limit = _int_arg("before"), _int_arg("after"), _int_arg("limit") or PAGE_SIZE
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}, 400
+    rows = alerts_page(before=before, after=after, limit=max(1, min(limit, MAX_PAGE_SIZE)),
+                       rule_name=request.args.get("rule_name"))
+    return _page_response(rows)
+
+@app.route("/api/logs", methods=["GET"])
+def api_logs():
+    """Keyset-paged logs, filterable by ?ip_address= and ?username=."""
+    try:
+        before, after, limit = _int_arg("before"), _int_arg("after"), _int_arg("limit") or PAGE_SIZE
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}, 400
+    rows = logs_page(before=before, after=after, limit=max(1, min(limit, MAX_PAGE_SIZE)),
+                     ip_address=request.args.get("ip_address"), username=request.args.get("username"))
+    return _page_response(rows)
+
+@app.route("/api/summary", methods=["GET"])
+def api_summary():
+    """Alert counts per rule and host, and per-minute volume for the last ?minutes= (default 60)."""
+    try:
+        minutes = _int_arg("minutes") or 60
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}, 400
+    return summary(minutes=max(1, min(minutes, 24 * 60)))
+
+def _sse(alert):
+    return f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(alert)}\n\n"
+
+@app.route("/alerts/stream", methods=["GET"])
+def alert_stream():
+    """
+    Server-Sent Events: every alert as it is committed. A reconnecting browser sends
+    Last-Event-ID (or ?after=<id>) and first gets what it missed, from the database.
+    """
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.args.get("after") or 0) or None
+    except ValueError:
+        last_id = None
+    try:
+        # subscribe before the backfill query, so nothing committed in between is missed
+        sub = ALERT_FEED.subscribe()
+    except FeedFull as e:
+        return {"status": "error", "error": str(e)}, 503
+
+    def generate():
+        backfilled = 0
+        try:
+            yield "retry: 3000\n\n"
+            if last_id is not None:
+                # page through everything missed, then go live; the feed covers anything newer
+                backfilled = last_id
+                while True:
+                    page = alerts_page(after=backfilled, limit=STREAM_BACKFILL)
+                    for alert in page:
+                        backfilled = alert["id"]
+                        yield _sse(alert)
+                    if len(page) < STREAM_BACKFILL:
+                        break
+            while not sub.overflowed:
+                try:
+                    alert = sub.queue.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if alert["id"] <= backfilled:
+                    continue    # already sent by the backfill
+                yield _sse(alert)
+            # fell too far behind: end the stream, the browser reconnects and backfills
+        finally:
+            ALERT_FEED.unsubscribe(sub)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # --- WEBHOOK 1: Agent/Snort Log Collector ---
 @app.route("/collect", methods=["GET", "POST"]) # <-- FIXED: Accepts GET and POST
@@ -57,22 +181,121 @@ def collect_log():
     if request.method == 'GET':
         return {"status": "Endpoint is running. Send POST request with log data."}
 
-    # 1. Store Log Locally
-    conn = sqlite3.connect(DB)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO logs(source, event, ip_address, username) VALUES(?,?,?,?)",
-                   (data.get("source"), data.get("event"), data.get("ip_address"), data.get("username")))
-    log_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    # 2. Forward to External SIEM (Splunk/ES)
-    forward_log_to_siem_tool(data)
+    error = log_error(data)
+    if error:
+        return {"status": "error", "error": error}, 400
 
-    # 3. Process with Custom Intelligence
-    rule_hit = process_log(log_id, data.get("event", ""), data)
+    # 1. Store Log Locally and queue it; forwarding (Splunk/ES) and our custom
+    #    intelligence run on the pipeline workers, not in the agent's request
+    log_row = (data.get("source"), data.get("event"), data.get("ip_address"), data.get("username"))
+    log_ids, error = enqueue([(log_row, data.get("event") or "", data)])
+    if error:
+        return error
     
-    return {"status": "received & processed", "alert_triggered": rule_hit}
+    return {"status": "queued", "log_id": log_ids[0]}, 202
+
+def log_error(log_data):
+    """Why a log can't be accepted, or None. Checked at ingest so one bad event never reaches a worker's batch."""
+    if not isinstance(log_data, dict):
+        return "Event must be a JSON object"
+    if not isinstance(log_data.get("event"), str):
+        return "event must be a string"
+    for field in ("source", "ip_address", "username"):
+        if not isinstance(log_data.get(field), (str, type(None))):
+            return f"{field} must be a string"
+    return None
+
+def enqueue(events):
+    """Hands events to the pipeline: (log_ids, None), or (None, error response) under backpressure."""
+    try:
+        return PIPELINE.submit(events), None
+    except PipelineFull as e:
+        return None, ({"status": "busy", "error": str(e)}, 429, {"Retry-After": str(PIPELINE.retry_after())})
+    except PipelineStopped as e:
+        return None, ({"status": "unavailable", "error": str(e)}, 503, {"Retry-After": "30"})
+
+# --- Batch helpers ---
+class BatchError(Exception):
+    pass
+
+def read_batch():
+    """
+    Parses a batch request body into a list of events.
+    Accepts a JSON array or NDJSON (one object per line), optionally gzip-compressed
+    (Content-Encoding: gzip, or a gzip body with any content type).
+    """
+    body = request.get_data(cache=False)
+    if request.headers.get("Content-Encoding", "").lower() == "gzip" or body[:2] == b"\x1f\x8b":
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(body)) as gz:
+                body = gz.read(MAX_BATCH_BYTES + 1)
+        except (OSError, EOFError) as e:
+            raise BatchError(f"Invalid gzip body: {e}")
+    if len(body) > MAX_BATCH_BYTES:
+        raise BatchError(f"Batch larger than {MAX_BATCH_BYTES} bytes")
+
+    text = body.decode("utf-8", errors="replace").strip()
+    try:
+        if text.startswith("["):
+            events = json.loads(text)
+        else:
+            events = [json.loads(line) for line in text.splitlines() if line.strip()]
+    except ValueError as e:
+        raise BatchError(f"Invalid JSON: {e}")
+    if not events:
+        raise BatchError("Empty batch")
+    if len(events) > MAX_BATCH_EVENTS:
+        raise BatchError(f"Batch has {len(events)} events, limit is {MAX_BATCH_EVENTS}")
+    return events
+
+def batch_response(events, to_log, event_prefix=""):
+    """
+    Runs a batch through `to_log` (event -> log_data), stores the valid events in one
+    transaction, queues them for processing and builds the per-event response.
+    """
+    results = []
+    log_rows = []
+    for i, event in enumerate(events):
+        error = "Event must be a JSON object" if not isinstance(event, dict) else None
+        if not error:
+            try:
+                log_data = to_log(event)
+            except ValueError as e:
+                error = str(e)
+            else:
+                error = log_error(log_data)
+        if error:
+            results.append({"index": i, "status": "rejected", "error": error})
+            continue
+        log_rows.append((i, log_data))
+    if log_rows:
+        log_ids, error = enqueue([((d.get("source"), event_prefix + d["event"], d.get("ip_address"), d.get("username")),
+                                   d["event"], d) for _, d in log_rows])
+        if error:
+            return error
+        results.extend({"index": i, "status": "queued", "log_id": log_id}
+                       for (i, _), log_id in zip(log_rows, log_ids))
+    results.sort(key=lambda r: r["index"])
+    accepted = len(log_rows)
+    return {
+        "status": "queued",
+        "received": len(events),
+        "accepted": accepted,
+        "rejected": len(events) - accepted,
+        "results": results,
+    }, 202
+
+@app.route("/collect/batch", methods=["POST"])
+def collect_batch():
+    """
+    Bulk version of /collect: a JSON array or NDJSON of log events, optionally gzipped.
+    All events are stored in one transaction and queued for processing.
+    """
+    try:
+        events = read_batch()
+    except BatchError as e:
+        return {"status": "error", "error": str(e)}, 400
+    return batch_response(events, lambda d: d)
 
 # --- WEBHOOK 2: Wazuh Alert Receiver (The primary integration point) ---
 @app.route("/wazuh_alert", methods=["GET", "POST"]) # <-- FIXED: Accepts GET and POST
@@ -85,37 +308,65 @@ def receive_wazuh_alert():
     if request.method == 'GET':
         return {"status": "Wazuh endpoint is running. Send POST request with alert JSON."}
 
-    wazuh_data = request.json
+    wazuh_data = request.get_json(silent=True)
+    try:
+        log_data = wazuh_to_log(wazuh_data)
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}, 400
+    error = log_error(log_data)
+    if error:
+        return {"status": "error", "error": error}, 400
     
+    # Create a local log entry for Wazuh alert for tracking; the pipeline runs our custom
+    # CTI/UEBA/SOAR logic on it
+    log_row = (log_data["source"], f"WAZUH ALERT: {log_data['event']}", log_data["ip_address"], 'system')
+    log_ids, error = enqueue([(log_row, log_data["event"], log_data)])
+    if error:
+        return error
+    
+    return {"status": "Wazuh alert queued", "log_id": log_ids[0]}, 202
+
+def _object(data, key):
+    """data[key] as a dict ({} if missing); ValueError if the sender put something else there."""
+    value = data.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{key} must be a JSON object")
+    return value
+
+def wazuh_to_log(wazuh_data):
+    """Maps a Wazuh integrator alert onto our log fields. Raises ValueError on a malformed alert."""
+    if not isinstance(wazuh_data, dict):
+        raise ValueError("Alert must be a JSON object")
     # Extracting necessary fields from Wazuh JSON structure
-    alert_info = wazuh_data.get('alert', {})
-    agent_info = wazuh_data.get('agent', {})
-    rule_info = alert_info.get('rule', {})
+    alert_info = _object(wazuh_data, 'alert')
+    agent_info = _object(wazuh_data, 'agent')
+    rule_info = _object(alert_info, 'rule')
 
-    source = agent_info.get('name', 'Wazuh Manager')
-    event_summary = rule_info.get('description', 'No description')
-    ip_address = agent_info.get('ip', 'N/A')
-    
-    # Create a local log entry for Wazuh alert for tracking
-    conn = sqlite3.connect(DB)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO logs(source, event, ip_address, username) VALUES(?,?,?,?)",
-                   (source, f"WAZUH ALERT: {event_summary}", ip_address, 'system'))
-    log_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-
-    # Process the new alert with our custom CTI/UEBA/SOAR logic
-    log_data = {"source": source, "event": event_summary, "ip_address": ip_address, "username": 'system'}
-    rule_hit = process_log(log_id, event_summary, log_data)
-    
-    return {"status": "Wazuh alert processed", "action_taken": rule_hit}
+    return {
+        "source": agent_info.get('name', 'Wazuh Manager'),
+        "event": rule_info.get('description', 'No description'),
+        "ip_address": agent_info.get('ip', 'N/A'),
+        "username": 'system',
+    }
+
+@app.route("/wazuh_alert/batch", methods=["POST"])
+def receive_wazuh_alert_batch():
+    """Bulk Wazuh delivery: a JSON array or NDJSON of integrator alerts, optionally gzipped."""
+    try:
+        alerts = read_batch()
+    except BatchError as e:
+        return {"status": "error", "error": str(e)}, 400
+    return batch_response(alerts, wazuh_to_log, event_prefix="WAZUH ALERT: ")
 
 # --- UEBA/Training endpoint ---
 @app.route("/train_ueba", methods=["GET"])
 def train_route():
-    train_ueba_model()
-    return {"status": "UEBA model training initiated. Check console for details."}
+    bundle = train_ueba_model()
+    if bundle is None:
+        return {"status": "UEBA model training skipped. Check console for details."}
+    return {"status": "UEBA model trained.", "version": bundle["version"], "samples": bundle["samples"]}
 
 
 if __name__ == "__main__":
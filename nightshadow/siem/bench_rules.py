@@ -0,0 +1,116 @@
+# vigilanteye/siem/bench_rules.py
+# Events per second of the compiled rule engine against the old one-rule-at-a-time loop,
+# as the rule set grows. Rules are synthetic: mostly keywords, some regexes, a few
+# field conditions, in the proportions of a typical Sigma import.
+#
+#   python bench_rules.py --sizes 10 100 1000 5000 --events 2000
+
+import argparse
+import json
+import random
+import re
+import string
+import time
+
+from rule_engine import CompiledRules, ahocorasick
+from rules import RULES
+
+SOURCES = ["Hassan-Laptop", "Subhan-Desktop", "Maaz-Workstation", "DC01", "web-01"]
+USERS = ["hassan", "subhan", "maaz", "administrator", "svc_backup"]
+
+
+def word(rnd, n=7):
+    return "".join(rnd.choice(string.ascii_lowercase) for _ in range(n))
+
+
+def synthetic_rules(n, rnd):
+    rules = list(RULES)
+    while len(rules) < n:
+        kind = rnd.random()
+        name = f"Synthetic {len(rules)}"
+        if kind < 0.80:
+            rules.append({"name": name, "keyword": f"{word(rnd)} {word(rnd, 5)}", "priority": rnd.randint(1, 10)})
+        elif kind < 0.95:
+            rules.append({"name": name, "regex": rf"{word(rnd)}=\d+ from \S+", "priority": rnd.randint(1, 10)})
+        else:
+            rules.append({"name": name, "keyword": word(rnd), "fields": {"username": rnd.choice(USERS)},
+                          "priority": rnd.randint(1, 10)})
+    return rules[:n]
+
+
+def synthetic_events(rules, n, rnd):
+    keywords = [r["keyword"] for r in rules if r.get("keyword")]
+    events = []
+    for i in range(n):
+        words = [word(rnd, rnd.randint(3, 9)) for _ in range(rnd.randint(6, 16))]
+        if rnd.random() < 0.2 and keywords:
+            words.insert(rnd.randrange(len(words)), rnd.choice(keywords))
+        if rnd.random() < 0.05:
+            words.append(f"id={i} from 10.0.0.{i % 255}")
+        events.append((" ".join(words), {"source": rnd.choice(SOURCES), "username": rnd.choice(USERS),
+                                         "ip_address": f"10.0.{i % 7}.{i % 251}"}))
+    return events
+
+
+def linear_matcher(rules):
+    """Every rule checked in turn: substring test, then regex, then fields."""
+    prepared = []
+    for order, r in enumerate(rules):
+        prepared.append((order, r, r.get("keyword", "").lower() or None,
+                         re.compile(r["regex"], re.IGNORECASE) if r.get("regex") else None,
+                         {k: str(v).lower() for k, v in (r.get("fields") or {}).items()}))
+
+    def match(text, data):
+        lower = text.lower()
+        hits = []
+        for order, r, kw, rx, fields in prepared:
+            if kw and kw not in lower:
+                continue
+            if rx and not rx.search(text):
+                continue
+            if any(str(data.get(k) or "").lower() != v for k, v in fields.items()):
+                continue
+            hits.append((-int(r.get("priority", 1)), order, r["name"]))
+        return [name for _, _, name in sorted(hits)]
+    return match
+
+
+def run(fn, events):
+    t0 = time.perf_counter()
+    out = [fn(text, data) for text, data in events]
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000, 10000])
+    ap.add_argument("--events", type=int, default=2000)
+    args = ap.parse_args()
+
+    rnd = random.Random(7)
+    results = []
+    for size in args.sizes:
+        rules = synthetic_rules(size, rnd)
+        events = synthetic_events(rules, args.events, rnd)
+
+        t0 = time.perf_counter()
+        compiled = CompiledRules(rules)
+        build = time.perf_counter() - t0
+
+        fast, t_fast = run(lambda t, d: [m.name for m in compiled.match(t, d)], events)
+        slow, t_slow = run(linear_matcher(rules), events)
+        assert fast == slow, f"engines disagree at {size} rules"
+
+        results.append({
+            "rules": size,
+            "compile_s": round(build, 3),
+            "linear_events_per_s": round(len(events) / t_slow),
+            "engine_events_per_s": round(len(events) / t_fast),
+            "speedup": round(t_slow / t_fast, 1),
+            "events_with_matches": sum(1 for m in fast if m),
+        })
+    print(json.dumps({"automaton": "pyahocorasick" if ahocorasick else "python", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+# vigilanteye/siem/correlation.py
+
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_right, insort
+from collections import OrderedDict
+
+from rule_engine import RuleMatch, RuleError, FIELDS
+
+# --- Correlation Configuration ---
+SNAPSHOT_PATH = os.environ.get("VIGILANTEYE_CORRELATION_STATE", "correlation_state.json")
+SNAPSHOT_INTERVAL = 30   # seconds between state snapshots to disk
+MAX_KEYS = 100000        # (rule, key) windows held in memory; least recently seen go first
+SWEEP_INTERVAL = 10      # seconds between sweeps for idle windows
+LOCK_STRIPES = 64        # locks shared out over the windows by key; batches sharing a stripe take turns
+MAX_STEP_EVENTS = 32     # events remembered per sequence step within its window
+
+
+def _condition(spec, name):
+    """Compiles a step/when spec ({"keyword": ...} or {"rule": base rule name}) into a predicate."""
+    keyword = (spec.get("keyword") or "").lower()
+    rule = spec.get("rule")
+    if not keyword and not rule:
+        raise RuleError(f"correlation rule {name!r}: a step needs a keyword or a rule")
+
+    def check(text, matched):
+        return (not keyword or keyword in text) and (not rule or rule in matched)
+    return check
+
+
+class ThresholdRule:
+    """Fires when `count` matching events share a `group_by` value within `window` seconds."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.priority = int(spec.get("priority", 1))
+        self.message = spec.get("message", "")
+        self.group_by = spec["group_by"]
+        self.count = int(spec["count"])
+        self.window = float(spec["window"])
+        self.when = _condition(spec.get("when") or spec, self.name)
+
+    def new_state(self):
+        return []    # (event time, event id) of the matching events in the window, oldest first
+
+    def copy(self, state):
+        return list(state)
+
+    def observe(self, state, text, matched, point):
+        """Updates the window; returns a detail string if the rule fires."""
+        if not self.when(text, matched):
+            return None
+        insort(state, point)     # events reach here out of order: keep the window in event time
+        while state[-1][0] - state[0][0] > self.window:
+            del state[0]
+        if len(state) >= self.count:
+            span = state[-1][0] - state[0][0]
+            state.clear()    # one alert per burst, not one per event after the threshold
+            return f"{self.count} events in {span:.0f}s"
+        return None
+
+    def expired(self, state, now):
+        return not state or now - state[-1][0] > self.window
+
+    def dump(self, state):
+        return [list(point) for point in state]
+
+    def load(self, data):
+        return sorted((float(ts), seq) for ts, seq in data)
+
+
+class SequenceRule:
+    """Fires when the `steps` happen in order for one `group_by` value, all within `window` seconds."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.priority = int(spec.get("priority", 1))
+        self.message = spec.get("message", "")
+        self.group_by = spec["group_by"]
+        self.window = float(spec["window"])
+        self.steps = [_condition(step, self.name) for step in spec["steps"]]
+        if len(self.steps) < 2:
+            raise RuleError(f"correlation rule {self.name!r}: a sequence needs at least two steps")
+
+    def new_state(self):
+        return [[] for _ in self.steps]    # per step: (event time, event id) of its events in the window
+
+    def copy(self, state):
+        return [list(points) for points in state]
+
+    def observe(self, state, text, matched, point):
+        hit = False
+        for step, points in zip(self.steps, state):
+            if step(text, matched):
+                insort(points, point)
+                if len(points) > MAX_STEP_EVENTS:
+                    del points[0]
+                hit = True
+        if not hit:
+            return None
+        newest = max(points[-1][0] for points in state if points)
+        for points in state:
+            while points and newest - points[0][0] > self.window:
+                del points[0]
+        span = self._chain(state)
+        if span is None:
+            return None
+        for points in state:
+            points.clear()
+        return f"{len(self.steps)}-step sequence in {span:.0f}s"
+
+    def _chain(self, state):
+        """Span of the shortest run of the steps in event order (each after the one before), or None."""
+        best = None
+        for start in state[0]:
+            point = start
+            for points in state[1:]:
+                i = bisect_right(points, point)
+                if i == len(points):
+                    break
+                point = points[i]
+            else:
+                span = point[0] - start[0]
+                if span <= self.window and (best is None or span < best):
+                    best = span
+        return best
+
+    def expired(self, state, now):
+        return not any(state) or now - max(points[-1][0] for points in state if points) > self.window
+
+    def dump(self, state):
+        return [[list(point) for point in points] for points in state]
+
+    def load(self, data):
+        if len(data) != len(self.steps):
+            raise ValueError(f"{len(data)} steps saved, rule has {len(self.steps)}")
+        return [sorted((float(ts), seq) for ts, seq in points) for points in data]
+
+
+RULE_TYPES = {"threshold": ThresholdRule, "sequence": SequenceRule}
+
+
+def _key(rule, log_data):
+    key = str(log_data.get(rule.group_by) or "").strip().lower()
+    return None if not key or key == "n/a" else key
+
+
+class CorrelationBatch:
+    """
+    The correlation step of one batch of events. observe() locks every window the batch
+    touches (lock stripes by key, always taken in the same order, so batches sharing a key
+    take turns) and updates copies of them; commit() installs the copies once the batch's
+    alerts are stored. A batch that fails before commit() leaves the windows as they were.
+    """
+
+    def __init__(self, correlator):
+        self.correlator = correlator
+        self._held = None       # stripe numbers locked by observe()
+        self._staged = {}       # (rule name, key) -> updated copy of the window
+        self._latest = None     # newest event time observed
+
+    def observe(self, events):
+        """
+        Feeds (log_text, log_data, matched_rules, (event time, event id)) events through every rule.
+        Returns the correlation rules each event completed, in order.
+        """
+        if self._held is not None:
+            raise RuntimeError("a correlation batch observes its events in one call")
+        correlator = self.correlator
+        keyed = [[(rule, _key(rule, data)) for rule in correlator.rules.values()] for _, data, _, _ in events]
+        self._held = sorted({hash((rule.name, key)) % LOCK_STRIPES for rules in keyed for rule, key in rules if key})
+        for i in self._held:
+            correlator._stripes[i].acquire()
+
+        fired = []
+        for (log_text, _, matched_rules, point), rules in zip(events, keyed):
+            text = (log_text or "").lower()
+            matched = set(matched_rules)
+            self._latest = point[0] if self._latest is None else max(self._latest, point[0])
+            completed = []
+            for rule, key in rules:
+                if key is None:
+                    continue
+                wkey = (rule.name, key)
+                state = self._staged.get(wkey)
+                if state is None:
+                    state = self._staged[wkey] = correlator._copy(rule, wkey)
+                detail = rule.observe(state, text, matched, point)
+                if detail:
+                    completed.append(correlator._match(rule, key, detail))
+            fired.append(completed)
+        return fired
+
+    def commit(self):
+        """Makes the observed events part of the windows. Call once the batch's outcome is stored."""
+        correlator = self.correlator
+        with correlator._lock:
+            if self._latest is not None:
+                correlator._clock = max(correlator._clock, self._latest)
+            now = correlator._clock
+            for wkey, state in self._staged.items():
+                if correlator.rules[wkey[0]].expired(state, now):
+                    # nothing worth remembering: don't let one-off events fill the table
+                    correlator._windows.pop(wkey, None)
+                else:
+                    correlator._windows[wkey] = state
+                    correlator._windows.move_to_end(wkey)
+            self._staged = {}
+            correlator._dirty = True
+            while len(correlator._windows) > correlator.max_keys:
+                correlator._windows.popitem(last=False)
+                correlator.evicted += 1
+            if time.time() - correlator._last_sweep >= SWEEP_INTERVAL:
+                correlator._sweep(now)
+        correlator._ensure_snapshotter()
+
+    def release(self):
+        self._staged = {}
+        for i in reversed(self._held or ()):
+            self.correlator._stripes[i].release()
+        self._held = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Correlator:
+    """
+    Streaming correlation over processed events. Each rule keeps one small window per
+    value of its group_by field (ip_address, username or source), all in memory: the
+    hot path never touches siem.db. Windows run on event time, not on when a worker gets
+    to the event, and are updated through a CorrelationBatch. They are capped at MAX_KEYS
+    (least recently seen evicted), idle ones are swept, and the state is snapshotted to
+    disk in the background so it survives restarts.
+    """
+
+    def __init__(self, rules, snapshot_path=SNAPSHOT_PATH, max_keys=MAX_KEYS,
+                 snapshot_interval=SNAPSHOT_INTERVAL):
+        self.rules = {}
+        for spec in rules:
+            rule_type = RULE_TYPES.get(spec.get("type"))
+            if rule_type is None:
+                raise RuleError(f"correlation rule {spec.get('name')!r}: unknown type {spec.get('type')!r}")
+            rule = rule_type(spec)
+            if rule.group_by not in FIELDS:
+                raise RuleError(f"correlation rule {rule.name!r}: cannot group by {rule.group_by!r}")
+            self.rules[rule.name] = rule
+        self.snapshot_path = snapshot_path
+        self.max_keys = max_keys
+        self.snapshot_interval = snapshot_interval
+        self._windows = OrderedDict()   # (rule name, key) -> state, least recently seen first
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._clock = 0.0               # newest event time committed: what windows expire against
+        self._ids = itertools.count(-1, -1)
+        self._last_sweep = time.time()
+        self._dirty = False
+        self._snapshotter = None
+        self.evicted = 0
+        self.restore()
+
+    def batch(self):
+        return CorrelationBatch(self)
+
+    def point(self, now=None):
+        """(event time, event id) for an event without a log id: ids count down from -1."""
+        return (time.time() if now is None else now, next(self._ids))
+
+    def observe(self, log_text, log_data, matched_rules=(), now=None):
+        """Feeds one event through every rule and commits it; returns the correlation rules it completed."""
+        with self.batch() as batch:
+            fired = batch.observe([(log_text, log_data, matched_rules, self.point(now))])[0]
+            batch.commit()
+        return fired
+
+    def _copy(self, rule, wkey):
+        with self._lock:
+            state = self._windows.get(wkey)
+            return rule.new_state() if state is None else rule.copy(state)
+
+    def _match(self, rule, key, detail):
+        return RuleMatch(rule.name, rule.priority, f"{rule.message} {detail} for {rule.group_by}={key}.".strip())
+
+    def _sweep(self, now):
+        self._last_sweep = time.time()
+        for wkey in [k for k, s in self._windows.items() if self.rules[k[0]].expired(s, now)]:
+            del self._windows[wkey]
+
+    def stats(self):
+        with self._lock:
+            return {"windows": len(self._windows), "max_keys": self.max_keys, "evicted": self.evicted,
+                    "rules": len(self.rules)}
+
+    # --- Persistence ---
+    def snapshot(self):
+        """Writes the live windows to disk (write-then-rename) if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._sweep(self._clock)
+            data = {"saved_at": time.time(), "clock": self._clock,
+                    "windows": [[name, key, self.rules[name].dump(state)]
+                                for (name, key), state in self._windows.items()]}
+            self._dirty = False
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.snapshot_path)
+        return True
+
+    def restore(self):
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"!!! CORRELATION: ignoring unreadable snapshot {self.snapshot_path}: {e} !!!")
+            return 0
+        restored = 0
+        with self._lock:
+            self._clock = now = float(data.get("clock") or time.time())
+            for name, key, dumped in data.get("windows", []):
+                rule = self.rules.get(name)
+                if rule is None:
+                    continue    # rule removed since the snapshot
+                try:
+                    state = rule.load(dumped)
+                except (TypeError, ValueError):
+                    continue    # saved by an older version of the rule
+                if not rule.expired(state, now):
+                    self._windows[(name, key)] = state
+                    restored += 1
+        if restored:
+            print(f"[CORRELATION] Restored {restored} open windows from {self.snapshot_path}.")
+        return restored
+
+    def _ensure_snapshotter(self):
+        if self._snapshotter is None and self.snapshot_path:
+            with self._lock:
+                if self._snapshotter is not None:
+                    return
+                self._snapshotter = threading.Thread(target=self._snapshot_loop, name="correlation-snapshot",
+                                                     daemon=True)
+            self._snapshotter.start()
+            atexit.register(self.snapshot)   # don't lose the last interval on a clean shutdown
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"!!! CORRELATION: snapshot failed: {e} !!!")
@@ -0,0 +1,265 @@
+# vigilanteye/siem/cti.py
+
+import ipaddress
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait as wait_futures
+
+import requests
+
+from database import connection, transaction
+
+# --- CTI Configuration ---
+ABUSEIPDB_API_KEY = os.environ.get("VIGILANTEYE_ABUSEIPDB_KEY", "")
+# point at a local stub of the API for testing
+ABUSEIPDB_URL = os.environ.get("VIGILANTEYE_ABUSEIPDB_URL", "https://api.abuseipdb.com/api/v2/check")
+MAX_AGE_DAYS = 90
+REQUEST_TIMEOUT = 3
+
+# Reported IPs stay reported for a while; clean ones are re-checked sooner in case they turn.
+POSITIVE_TTL = int(os.environ.get("VIGILANTEYE_CTI_POSITIVE_TTL", str(24 * 3600)))
+NEGATIVE_TTL = int(os.environ.get("VIGILANTEYE_CTI_NEGATIVE_TTL", str(6 * 3600)))
+ERROR_TTL = 60                 # API errors: memory only, so an outage doesn't become a lookup storm
+
+MEMORY_ENTRIES = 10000
+RATE = float(os.environ.get("VIGILANTEYE_CTI_RATE", "2"))   # API requests per second, all workers together
+WORKERS = 4                    # concurrent requests in flight
+WAIT = 10                      # longest a caller waits for a queued lookup
+THROTTLE_BACKOFF = 60          # pause after the API answers 429 without Retry-After
+PRUNE_INTERVAL = 3600          # seconds between sweeps of expired cti_cache rows
+
+
+def classify(score):
+    if score > 60:
+        return "MALICIOUS"
+    elif score > 20:
+        return "Suspicious"
+    return "CLEAN"
+
+def skip_reason(ip_address):
+    """Why an address needs no lookup (missing, not an IP, private/reserved), or None."""
+    if not ip_address:
+        return "N/A - No IP"
+    try:
+        ip = ipaddress.ip_address(str(ip_address).strip())
+    except ValueError:
+        return "N/A - Invalid IP"
+    if not ip.is_global:
+        return "N/A - Private/Reserved"
+    return None
+
+
+class RateLimiter:
+    """Spaces requests 1/rate seconds apart: each caller reserves the next slot and sleeps until it."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._next = max(self._next, time.monotonic()) + seconds
+
+
+class CTICache:
+    """In-memory LRU in front of the cti_cache table; entries expire per their own TTL."""
+
+    def __init__(self, size=MEMORY_ENTRIES):
+        self.size = size
+        self._entries = OrderedDict()  # ip -> (result, expires_at)
+        self._lock = threading.Lock()
+
+    def get_many(self, ips):
+        """Fresh cached results for the given IPs: memory first, then one query for the rest."""
+        now = time.time()
+        found = {}
+        missing = []
+        with self._lock:
+            for ip in ips:
+                entry = self._entries.get(ip)
+                if entry and entry[1] > now:
+                    self._entries.move_to_end(ip)
+                    found[ip] = entry[0]
+                else:
+                    missing.append(ip)
+        if missing:
+            with connection() as conn:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT ip, status, score, expires_at FROM cti_cache WHERE expires_at > ? "
+                        f"AND ip IN ({','.join('?' * len(chunk))})", [now, *chunk]).fetchall()
+                    for ip, status, score, expires_at in rows:
+                        found[ip] = {"status": status, "score": score}
+                        self._remember(ip, found[ip], expires_at)
+        return found
+
+    def put(self, ip, result, ttl, persist=True):
+        expires_at = time.time() + ttl
+        self._remember(ip, result, expires_at)
+        if persist:
+            with transaction() as conn:
+                conn.execute("INSERT OR REPLACE INTO cti_cache(ip, status, score, fetched_at, expires_at) "
+                             "VALUES(?,?,?,?,?)", (ip, result["status"], result["score"], time.time(), expires_at))
+
+    def _remember(self, ip, result, expires_at):
+        with self._lock:
+            self._entries[ip] = (result, expires_at)
+            self._entries.move_to_end(ip)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def prune(self):
+        with transaction() as conn:
+            return conn.execute("DELETE FROM cti_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class CTIClient:
+    """
+    AbuseIPDB lookups for the processor. Cached results are answered directly; misses go
+    on a queue that a few worker threads drain at RATE requests per second. A burst of
+    events from one IP costs one API call: every caller waits on the same pending lookup.
+    """
+
+    def __init__(self, api_key=ABUSEIPDB_API_KEY, url=ABUSEIPDB_URL, rate=RATE, workers=WORKERS,
+                 cache=None, session=None):
+        self.api_key = api_key
+        self.url = url
+        self.cache = cache or CTICache()
+        self.session = session or requests.Session()
+        self.limiter = RateLimiter(rate)
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._inflight = {}           # ip -> Future
+        self._lock = threading.Lock()
+        self._started = False
+        self.stats = {"api_calls": 0, "api_errors": 0, "cache_hits": 0, "coalesced": 0, "skipped": 0}
+
+    @property
+    def enabled(self):
+        return bool(self.api_key) and self.api_key != "YOUR_ACTUAL_ABUSEIPDB_KEY_HERE"
+
+    def check(self, ip_address, wait=WAIT):
+        return self.check_many([ip_address], wait=wait)[ip_address]
+
+    def check_many(self, ip_addresses, wait=WAIT):
+        """{ip: {"status", "score"}} for every address given, waiting up to `wait` seconds for API lookups."""
+        results, futures = self.lookup_many(ip_addresses)
+        if futures:
+            wait_futures(set(futures.values()), timeout=wait)
+        for ip, fut in futures.items():
+            if fut.done():
+                results[ip] = fut.result()
+            else:
+                # still queued: the answer lands in the cache for later events from this IP
+                results[ip] = {"status": "API_PENDING", "score": 0}
+        return results
+
+    def lookup_many(self, ip_addresses):
+        """
+        Non-blocking lookup: ({ip: result} for every address answerable now, {ip: Future}
+        for the ones waiting on the API). The Futures resolve with the same result dicts.
+        """
+        results = {}
+        lookups = {}                  # address as given -> normalised
+        for ip in set(ip_addresses):
+            if not self.enabled:
+                # If key is missing/placeholder, assume clean status for the demo
+                results[ip] = {"status": "N/A - Key Missing", "score": 0}
+                continue
+            reason = skip_reason(ip)
+            if reason:
+                results[ip] = {"status": reason, "score": 0}
+                self._count("skipped")
+            else:
+                lookups[ip] = str(ip).strip()
+        if not lookups:
+            return results, {}
+
+        cached = self.cache.get_many(sorted(set(lookups.values())))
+        self._count("cache_hits", len(cached))
+        submitted = {ip: self._submit(ip) for ip in set(lookups.values()) if ip not in cached}
+        futures = {}
+        for ip, norm in lookups.items():
+            if norm in cached:
+                results[ip] = cached[norm]
+            else:
+                futures[ip] = submitted[norm]
+        return results, futures
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _submit(self, ip):
+        with self._lock:
+            fut = self._inflight.get(ip)
+            if fut is not None:
+                self.stats["coalesced"] += 1
+                return fut
+            fut = self._inflight[ip] = Future()
+            if not self._started:
+                self._started = True
+                for i in range(self.workers):
+                    threading.Thread(target=self._worker, name=f"cti-{i}", daemon=True).start()
+                threading.Thread(target=self._prune_loop, name="cti-prune", daemon=True).start()
+        self._queue.put(ip)
+        return fut
+
+    def _worker(self):
+        while True:
+            ip = self._queue.get()
+            try:
+                result = self._lookup(ip)
+            except Exception:
+                result = {"status": "API_ERROR", "score": 0}
+            with self._lock:
+                fut = self._inflight.pop(ip, None)
+            if fut is not None:
+                fut.set_result(result)
+
+    def _prune_loop(self):
+        # only API answers add rows, so pruning starts with the first lookup
+        while True:
+            time.sleep(PRUNE_INTERVAL)
+            try:
+                removed = self.cache.prune()
+                if removed:
+                    print(f"[CTI] Pruned {removed} expired cache entries.")
+            except Exception as e:
+                print(f"!!! CTI: cache prune failed: {e} !!!")
+
+    def _lookup(self, ip):
+        self.limiter.acquire()
+        params = {'ipAddress': ip, 'maxAgeInDays': str(MAX_AGE_DAYS)}
+        headers = {'Accept': 'application/json', 'Key': self.api_key}
+        self._count("api_calls")
+        try:
+            response = self.session.get(self.url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 429:
+                self.limiter.pause(float(response.headers.get("Retry-After") or THROTTLE_BACKOFF))
+            response.raise_for_status()
+            score = int(response.json().get('data', {}).get('abuseConfidenceScore', 0) or 0)
+        except (requests.exceptions.RequestException, ValueError):
+            self._count("api_errors")
+            result = {"status": "API_ERROR", "score": 0}
+            self.cache.put(ip, result, ERROR_TTL, persist=False)
+            return result
+        result = {"status": classify(score), "score": score}
+        self.cache.put(ip, result, POSITIVE_TTL if score > 0 else NEGATIVE_TTL)
+        return result
+
+
+CTI = CTIClient()
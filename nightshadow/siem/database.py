@@ -1,36 +1,309 @@
 # vigilanteye/siem/database.py
 
+import calendar
+import re
 import sqlite3
+import threading
+import time
+import queue
+from contextlib import contextmanager
 
 DB = "siem.db"
 
+# --- Connection Tuning ---
+# WAL lets the dashboard read while the collector writes; NORMAL sync is durable
+# across app crashes in WAL mode and skips an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-32000",      # ~32 MB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",      # wait for the write lock instead of "database is locked"
+)
+POOL_SIZE = 8            # idle connections kept for reuse
+STATEMENT_CACHE = 256    # prepared statements cached per connection
+
+# --- Statements (kept as constants so every caller hits the same cached prepared statement) ---
+# new logs start unprocessed (0); the pipeline flags them 1 (processed) or -1 (failed)
+INSERT_LOG = "INSERT INTO logs(source, event, ip_address, username, received, processed) VALUES(?,?,?,?,?,0)"
+INSERT_ALERT = "INSERT INTO alerts(rule_name, message, log_id, priority) VALUES(?,?,?,?)"
+
+
+class ConnectionPool:
+    """
+    Reusable SQLite connections. A thread borrows one for the length of a `connection()`
+    block; nested blocks on the same thread get the same connection, so a `transaction()`
+    opened by the caller covers every write made by the functions it calls.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+
+    def _open(self):
+        # autocommit mode: transactions are only ever the explicit ones in transaction()
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if self._idle.qsize() < self.size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """One write transaction; joins the caller's if this thread already has one open."""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            # IMMEDIATE takes the write lock up front: no lock upgrade failures mid-transaction
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+POOL = ConnectionPool(DB)
+connection = POOL.connection
+transaction = POOL.transaction
+
+
 def init_db():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-
-    # Table for Raw Logs (simulating input from Wazuh/Agent/Snort)
-    c.execute("""CREATE TABLE IF NOT EXISTS logs(
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    source TEXT,
-                    event TEXT,
-                    ip_address TEXT,
-                    username TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )""")
-
-    # Table for Alerts (created by our custom Rule/CTI/UEBA processor)
-    c.execute("""CREATE TABLE IF NOT EXISTS alerts(
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    rule_name TEXT,
-                    message TEXT,
-                    priority INTEGER DEFAULT 1,
-                    log_id INTEGER,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )""")
-
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        # Table for Raw Logs (simulating input from Wazuh/Agent/Snort)
+        c.execute("""CREATE TABLE IF NOT EXISTS logs(
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        source TEXT,
+                        event TEXT,
+                        ip_address TEXT,
+                        username TEXT,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        processed INTEGER NOT NULL DEFAULT 1,
+                        received TEXT
+                    )""")
+        # Databases from before the processing pipeline: their logs were all processed inline
+        columns = [row[1] for row in c.execute("PRAGMA table_info(logs)")]
+        if "processed" not in columns:
+            c.execute("ALTER TABLE logs ADD COLUMN processed INTEGER NOT NULL DEFAULT 1")
+        # The event as received (JSON {"text", "data"}) until it is processed, for recovery
+        if "received" not in columns:
+            c.execute("ALTER TABLE logs ADD COLUMN received TEXT")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_unprocessed ON logs(id) WHERE processed = 0")
+
+        # Table for Alerts (created by our custom Rule/CTI/UEBA processor)
+        c.execute("""CREATE TABLE IF NOT EXISTS alerts(
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        rule_name TEXT,
+                        message TEXT,
+                        priority INTEGER DEFAULT 1,
+                        log_id INTEGER,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )""")
+
+        # Dashboard filters and keyset pages (SQLite appends the rowid to every index,
+        # so "WHERE rule_name = ? AND id < ? ORDER BY id DESC" is one index range scan)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_ip_address ON logs(ip_address)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_username ON logs(username)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts(timestamp)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_alerts_rule_name ON alerts(rule_name)")
+
+        init_summaries(c)
+
+        # AbuseIPDB results, so repeat offenders don't cost an API call per event (see cti.py)
+        c.execute("""CREATE TABLE IF NOT EXISTS cti_cache(
+                        ip TEXT PRIMARY KEY,
+                        status TEXT,
+                        score INTEGER,
+                        fetched_at REAL,
+                        expires_at REAL
+                    )""")
+
     print("Database initialized successfully.")
 
+# --- Summary tables ---
+# Counts the dashboard needs, kept current by triggers as logs and alerts are inserted,
+# so it never has to scan (or COUNT) the big tables.
+SUMMARY_TABLES = {
+    "rule_counts": """CREATE TABLE rule_counts(
+                        rule_name TEXT PRIMARY KEY,
+                        alerts INTEGER NOT NULL DEFAULT 0,
+                        last_alert_id INTEGER
+                    )""",
+    "host_counts": """CREATE TABLE host_counts(
+                        source TEXT PRIMARY KEY,
+                        logs INTEGER NOT NULL DEFAULT 0,
+                        alerts INTEGER NOT NULL DEFAULT 0
+                    )""",
+    "minute_counts": """CREATE TABLE minute_counts(
+                        minute TEXT PRIMARY KEY,
+                        logs INTEGER NOT NULL DEFAULT 0,
+                        alerts INTEGER NOT NULL DEFAULT 0
+                    )""",
+}
+
+SUMMARY_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS trg_logs_summary AFTER INSERT ON logs BEGIN
+           INSERT INTO host_counts(source, logs) VALUES(COALESCE(NEW.source, 'unknown'), 1)
+               ON CONFLICT(source) DO UPDATE SET logs = logs + 1;
+           INSERT INTO minute_counts(minute, logs) VALUES(substr(NEW.timestamp, 1, 16), 1)
+               ON CONFLICT(minute) DO UPDATE SET logs = logs + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_alerts_summary AFTER INSERT ON alerts BEGIN
+           INSERT INTO rule_counts(rule_name, alerts, last_alert_id) VALUES(NEW.rule_name, 1, NEW.id)
+               ON CONFLICT(rule_name) DO UPDATE SET alerts = alerts + 1, last_alert_id = NEW.id;
+           INSERT INTO host_counts(source, alerts)
+               VALUES(COALESCE((SELECT source FROM logs WHERE id = NEW.log_id), 'unknown'), 1)
+               ON CONFLICT(source) DO UPDATE SET alerts = alerts + 1;
+           INSERT INTO minute_counts(minute, alerts) VALUES(substr(NEW.timestamp, 1, 16), 1)
+               ON CONFLICT(minute) DO UPDATE SET alerts = alerts + 1;
+       END""",
+)
+
+def init_summaries(c):
+    """Creates the summary tables and their triggers; a new table is filled from existing rows first."""
+    existing = {row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    created = [name for name in SUMMARY_TABLES if name not in existing]
+    for name in created:
+        c.execute(SUMMARY_TABLES[name])
+    if "rule_counts" in created:
+        c.execute("""INSERT INTO rule_counts(rule_name, alerts, last_alert_id)
+                     SELECT rule_name, COUNT(*), MAX(id) FROM alerts GROUP BY rule_name""")
+    if "host_counts" in created:
+        c.execute("""INSERT INTO host_counts(source, logs, alerts)
+                     SELECT source, SUM(logs), SUM(alerts) FROM (
+                         SELECT COALESCE(source, 'unknown') AS source, COUNT(*) AS logs, 0 AS alerts
+                         FROM logs GROUP BY 1
+                         UNION ALL
+                         SELECT COALESCE(l.source, 'unknown'), 0, COUNT(*)
+                         FROM alerts a LEFT JOIN logs l ON l.id = a.log_id GROUP BY 1
+                     ) GROUP BY source""")
+    if "minute_counts" in created:
+        c.execute("""INSERT INTO minute_counts(minute, logs, alerts)
+                     SELECT minute, SUM(logs), SUM(alerts) FROM (
+                         SELECT substr(timestamp, 1, 16) AS minute, COUNT(*) AS logs, 0 AS alerts
+                         FROM logs GROUP BY 1
+                         UNION ALL
+                         SELECT substr(timestamp, 1, 16), 0, COUNT(*) FROM alerts GROUP BY 1
+                     ) GROUP BY minute""")
+    for trigger in SUMMARY_TRIGGERS:
+        c.execute(trigger)
+
+_SQL_TS = re.compile(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d")
+
+def log_time(value):
+    """Epoch seconds of a logs.timestamp (SQLite CURRENT_TIMESTAMP, UTC)."""
+    if value and _SQL_TS.match(value):
+        return calendar.timegm(time.strptime(value[:19], "%Y-%m-%d %H:%M:%S"))
+    return time.time()
+
+def insert_logs(rows):
+    """
+    Stores many (source, event, ip_address, username, received) rows with one executemany and
+    returns their log ids, in order. Runs in the caller's transaction if there is one.
+    """
+    with transaction() as conn:
+        conn.executemany(INSERT_LOG, rows)
+        # the write lock is held, so the AUTOINCREMENT ids we just got are contiguous
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+def insert_alerts(rows):
+    """
+    Stores (rule_name, message, log_id, priority) rows and returns their alert ids, in order.
+    Joins the caller's transaction.
+    """
+    if not rows:
+        return []
+    with transaction() as conn:
+        conn.executemany(INSERT_ALERT, rows)
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+# --- Dashboard queries ---
+# Keyset pagination: pages are addressed by an id bound, never OFFSET, so page 10,000
+# costs the same as page 1.
+ALERT_COLUMNS = ("id", "rule_name", "message", "priority", "log_id", "timestamp")
+LOG_COLUMNS = ("id", "source", "event", "ip_address", "username", "timestamp")
+
+def _page(table, columns, filters, before, after, limit):
+    where, params = [], []
+    for column, value in filters.items():
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if before is not None:
+        where.append("id < ?")
+        params.append(before)
+    if after is not None:
+        where.append("id > ?")
+        params.append(after)
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # "after" pages run oldest first (catching up on new rows), everything else newest first
+    sql += f" ORDER BY id {'ASC' if after is not None and before is None else 'DESC'} LIMIT ?"
+    params.append(limit)
+    with connection() as conn:
+        return [dict(zip(columns, row)) for row in conn.execute(sql, params)]
+
+def alerts_page(before=None, after=None, limit=50, rule_name=None):
+    """Alerts with id below `before` (newest first) or above `after` (oldest first)."""
+    return _page("alerts", ALERT_COLUMNS, {"rule_name": rule_name}, before, after, limit)
+
+def logs_page(before=None, after=None, limit=50, ip_address=None, username=None):
+    """Logs with id below `before` (newest first) or above `after` (oldest first)."""
+    return _page("logs", LOG_COLUMNS, {"ip_address": ip_address, "username": username}, before, after, limit)
+
+def summary(minutes=60, top=10):
+    """Alert counts per rule, the busiest hosts and per-minute volume, all from the summary tables."""
+    with connection() as conn:
+        rules = conn.execute("SELECT rule_name, alerts FROM rule_counts ORDER BY alerts DESC").fetchall()
+        hosts = conn.execute("SELECT source, logs, alerts FROM host_counts "
+                             "ORDER BY alerts DESC, logs DESC LIMIT ?", (top,)).fetchall()
+        per_minute = conn.execute("SELECT minute, logs, alerts FROM minute_counts "
+                                  "WHERE minute >= strftime('%Y-%m-%d %H:%M', 'now', ?) ORDER BY minute",
+                                  (f"-{int(minutes)} minutes",)).fetchall()
+    return {
+        "total_alerts": sum(n for _, n in rules),
+        "rules": [{"rule_name": r, "alerts": n} for r, n in rules],
+        "hosts": [{"source": h, "logs": l, "alerts": a} for h, l, a in hosts],
+        "per_minute": [{"minute": m, "logs": l, "alerts": a} for m, l, a in per_minute],
+    }
+
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
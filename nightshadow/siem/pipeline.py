@@ -0,0 +1,319 @@
+# vigilanteye/siem/pipeline.py
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from database import connection, transaction, insert_logs, insert_alerts, alerts_page, log_time
+from processor import CORRELATOR, evaluate_batch, event_ip, alert_rows, run_soar
+from cti import CTI
+
+# --- Pipeline Configuration ---
+MAX_PENDING = 10000      # events accepted but not yet processed; beyond this ingestion gets 429
+WORKERS = 4              # threads running rules/CTI/UEBA/SOAR
+MAX_WORK_BATCH = 200     # events a worker takes off the queue in one go
+RECOVERY_CHUNK = 500
+MAX_RETRIES = 3          # re-queues of an event whose batch hit a locked/busy database
+
+# logs.processed values
+PENDING, PROCESSED, FAILED = 0, 1, -1
+
+
+class PipelineFull(Exception):
+    pass
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+def transient(error):
+    """A database error worth retrying (locked/busy), as opposed to one caused by the events."""
+    return isinstance(error, sqlite3.OperationalError) and any(
+        word in str(error).lower() for word in ("locked", "busy"))
+
+
+class Pipeline:
+    """
+    Decouples ingestion from processing. submit() stores events (processed = 0) and
+    queues them; worker threads run the rule/CTI/UEBA checks (parking events whose CTI
+    lookup is still queued), store alerts and flag the logs processed in one transaction,
+    then call SOAR. Anything still unprocessed when
+    the app stops is picked up from the database by recover() on the next start.
+    Committed alerts are handed to `on_alerts` (e.g. the dashboard's live feed).
+    """
+
+    def __init__(self, forward=None, workers=WORKERS, max_pending=MAX_PENDING, on_alerts=None):
+        self.forward = forward
+        self.on_alerts = on_alerts
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue = queue.Queue()     # (log_id, log_text, log_data, enqueued_at, event_time)
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pending = 0
+        self._busy = 0
+        self._processed = 0
+        self._failed = 0
+        self._retries = {}              # log_id -> re-queues after transient errors
+        self._waiting_cti = 0           # events parked until their IP's AbuseIPDB lookup finishes
+        self._lags = deque(maxlen=1000)
+        self._running = False
+
+    # --- Ingestion side ---
+    def submit(self, events):
+        """
+        Stores (log_row, log_text, log_data) events and queues them for processing.
+        Returns their log ids. Raises PipelineFull when they would not fit, before storing anything.
+        """
+        if not self._running:
+            raise PipelineStopped("Processing pipeline is not running")
+        with self._lock:
+            if self._pending + len(events) > self.max_pending:
+                raise PipelineFull(f"{self._pending} events waiting for processing (limit {self.max_pending})")
+            self._pending += len(events)
+        try:
+            # the event exactly as the pipeline will see it, so recover() replays the same thing
+            log_ids = insert_logs([(*row, json.dumps({"text": log_text, "data": log_data}))
+                                   for row, log_text, log_data in events])
+        except Exception:
+            with self._lock:
+                self._pending -= len(events)
+            raise
+        now = time.time()
+        for log_id, (_, log_text, log_data) in zip(log_ids, events):
+            self._queue.put((log_id, log_text, log_data, now, now))
+        return log_ids
+
+    def retry_after(self):
+        """Rough seconds until there is room again, for the Retry-After header."""
+        lags = list(self._lags)
+        return max(1, min(60, int(sum(lags) / len(lags)) if lags else 5))
+
+    # --- Workers ---
+    def start(self):
+        # recovery finishes before anything is accepted, so no event can be queued twice
+        with self._start_lock:
+            if self._running:
+                return
+            self.recover()
+            for i in range(self.workers):
+                threading.Thread(target=self._worker, name=f"pipeline-{i}", daemon=True).start()
+            self._running = True
+
+    def recover(self):
+        """Re-queues logs stored but never processed, e.g. because the app stopped first."""
+        recovered = 0
+        last_id = 0
+        while True:
+            with connection() as conn:
+                rows = conn.execute("SELECT id, source, event, ip_address, username, timestamp, received FROM logs "
+                                    "WHERE processed = ? AND id > ? ORDER BY id LIMIT ?",
+                                    (PENDING, last_id, RECOVERY_CHUNK)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            now = time.time()
+            items, bad = [], []
+            for row in rows:
+                event = self._replay(row)
+                if event is None:
+                    bad.append((FAILED, row[0]))
+                else:
+                    items.append((row[0], *event, now, log_time(row[5])))
+            # rows that can't be rebuilt into an event would fail a whole batch: fail them here
+            if bad:
+                with transaction() as conn:
+                    conn.executemany("UPDATE logs SET processed = ? WHERE id = ?", bad)
+            with self._lock:
+                self._pending += len(items)
+                self._failed += len(bad)
+            for item in items:
+                self._queue.put(item)
+            recovered += len(items)
+        if recovered:
+            print(f"[PIPELINE] Recovered {recovered} unprocessed events.")
+        return recovered
+
+    @staticmethod
+    def _replay(row):
+        """(log_text, log_data) of a stored log, as submitted; None if it can't be processed."""
+        _, source, event, ip_address, username, _, received = row
+        if received is not None:
+            try:
+                received = json.loads(received)
+                log_text, log_data = received["text"], received["data"]
+            except (ValueError, TypeError, KeyError):
+                return None
+            return (log_text, log_data) if isinstance(log_text, str) and isinstance(log_data, dict) else None
+        # stored before logs kept the event as received: rebuild it from the columns
+        if not isinstance(event, (str, type(None))):
+            return None
+        return event or "", {"source": source, "event": event, "ip_address": ip_address, "username": username}
+
+    def _take(self):
+        items = [self._queue.get()]
+        while len(items) < MAX_WORK_BATCH:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _worker(self):
+        while True:
+            items = self._take()
+            with self._lock:
+                self._busy += 1
+            try:
+                self._handle(items)
+            except Exception as e:
+                # keep the worker alive; the events stay unprocessed and are recovered on restart
+                print(f"!!! PIPELINE ERROR: could not record outcome of {len(items)} events: {e} !!!")
+            finally:
+                done = time.time()
+                with self._lock:
+                    self._busy -= 1
+                    self._pending -= len(items)
+                    self._lags.extend(done - item[3] for item in items)
+
+    def _handle(self, items):
+        try:
+            ready, cti_results = self._await_cti(items)
+        except Exception as e:
+            self._fail(items, e)
+            return
+        if ready:
+            self._process(ready, cti_results)
+
+    def _await_cti(self, items):
+        """
+        Splits off the events whose IP is still waiting on an AbuseIPDB lookup. They are parked,
+        still processed = 0, and re-queued when the lookup finishes, so a slow or rate-limited
+        API delays their verdict instead of dropping it; the worker moves on without waiting.
+        Returns the events ready now and the CTI results for them.
+        """
+        ips = [event_ip(text, data) for _, text, data, _, _ in items]
+        results, futures = CTI.lookup_many(ips)
+        ready, waiting = [], {}
+        for item, ip in zip(items, ips):
+            fut = futures.get(ip)
+            if fut is not None and fut.done():
+                results[ip] = fut.result()
+            elif fut is not None:
+                waiting.setdefault(fut, []).append(item)
+                continue
+            ready.append(item)
+        if waiting:
+            parked = sum(len(group) for group in waiting.values())
+            with self._lock:
+                self._pending += parked     # the worker's count drops them; they aren't done yet
+                self._waiting_cti += parked
+            for fut, group in waiting.items():
+                fut.add_done_callback(lambda _, group=group: self._requeue(group))
+        return ready, results
+
+    def _requeue(self, items):
+        with self._lock:
+            self._waiting_cti -= len(items)
+        for item in items:
+            self._queue.put(item)
+
+    def _process(self, items, cti_results=None):
+        try:
+            log_ids, decisions, new_alerts = self._commit(items, cti_results)
+        except Exception as e:
+            if len(items) > 1 and not transient(e):
+                # one bad event must not take the rest of the batch with it: retry them one by one
+                print(f"!!! PIPELINE ERROR: batch of {len(items)} events failed ({e}); retrying singly !!!")
+                for item in items:
+                    self._process([item], cti_results)
+                return
+            self._fail(items, e)
+            return
+        with self._lock:
+            self._processed += len(items)
+            for log_id in log_ids:
+                self._retries.pop(log_id, None)
+        if self.forward:
+            for _, _, log_data, _, _ in items:
+                self.forward(log_data)
+        if new_alerts:
+            self.on_alerts(new_alerts)
+        run_soar(log_ids, decisions)
+
+    def _commit(self, items, cti_results=None):
+        """
+        Evaluates the events, stores their alerts and flags them processed, in one transaction.
+        Correlation windows move on event time and only once that transaction has committed.
+        """
+        log_ids = [log_id for log_id, _, _, _, _ in items]
+        with CORRELATOR.batch() as correlation:
+            decisions = evaluate_batch([(text, data) for _, text, data, _, _ in items], cti_results, correlation,
+                                       [(event_time, log_id) for log_id, _, _, _, event_time in items])
+            with transaction() as conn:
+                alert_ids = insert_alerts(alert_rows(log_ids, decisions))
+                # the event as received is only needed until it is processed
+                conn.executemany("UPDATE logs SET processed = ?, received = NULL WHERE id = ?",
+                                 [(PROCESSED, i) for i in log_ids])
+                # read back in the same transaction: the rows exactly as stored, timestamps included
+                new_alerts = alerts_page(after=alert_ids[0] - 1, limit=len(alert_ids)) \
+                    if alert_ids and self.on_alerts else []
+            correlation.commit()
+        return log_ids, decisions, new_alerts
+
+    def _fail(self, items, error):
+        log_ids = [log_id for log_id, _, _, _, _ in items]
+        if transient(error):
+            # the database was busy, not the events bad: they stay processed = 0 and go round again;
+            # past MAX_RETRIES they wait for recover() on the next start
+            with self._lock:
+                retry = [item for item in items if self._retries.get(item[0], 0) < MAX_RETRIES]
+                for item in retry:
+                    self._retries[item[0]] = self._retries.get(item[0], 0) + 1
+                for log_id in set(log_ids) - {item[0] for item in retry}:
+                    self._retries.pop(log_id, None)
+                self._pending += len(retry)
+            print(f"!!! PIPELINE WARNING: database busy, {len(retry)} of {len(items)} events re-queued: {error} !!!")
+            for item in retry:
+                self._queue.put(item)
+            return
+        print(f"!!! PIPELINE ERROR: {len(items)} events failed processing: {error} !!!")
+        # flag them so a restart doesn't retry a poison event forever
+        try:
+            with transaction() as conn:
+                conn.executemany("UPDATE logs SET processed = ? WHERE id = ?", [(FAILED, i) for i in log_ids])
+        except sqlite3.Error as e:
+            print(f"!!! PIPELINE ERROR: could not flag failed events (left for recovery): {e} !!!")
+        with self._lock:
+            self._failed += len(items)
+            for log_id in log_ids:
+                self._retries.pop(log_id, None)
+
+    # --- Monitoring ---
+    def stats(self):
+        with self._lock:
+            lags = sorted(self._lags)
+            oldest = None
+            with self._queue.mutex:
+                if self._queue.queue:
+                    oldest = time.time() - self._queue.queue[0][3]
+            return {
+                "running": self._running,
+                "workers": self.workers,
+                "busy_workers": self._busy,
+                "queue_depth": self._pending,
+                "waiting_on_cti": self._waiting_cti,
+                "max_pending": self.max_pending,
+                "oldest_waiting_seconds": round(oldest, 3) if oldest is not None else 0,
+                "processed": self._processed,
+                "failed": self._failed,
+                "lag_seconds": {
+                    "avg": round(sum(lags) / len(lags), 3) if lags else None,
+                    "p95": round(lags[min(len(lags) - 1, int(len(lags) * 0.95))], 3) if lags else None,
+                    "max": round(lags[-1], 3) if lags else None,
+                },
+            }
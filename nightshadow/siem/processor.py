@@ -1,17 +1,16 @@
 # vigilanteye/siem/processor.py
 
-from rules import RULES
-import sqlite3
-from database import DB
-import requests
+from rules import RULES, CORRELATION_RULES
+from rule_engine import RuleEngine
+from correlation import Correlator
+from database import insert_alerts
 import re
+import time
 from soar_actions import trigger_shuffle_workflow
-from ueba import check_anomaly 
+from ueba import score_anomalies, anomaly_alert
+from cti import CTI
 # import os removed
 
-# --- CTI Configuration ---
-ABUSEIPDB_API_KEY = ""
-
 def extract_ip(text):
     """Finds an IPv4 address in a log message."""
     ip_pattern = r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b'
@@ -19,69 +18,121 @@ def extract_ip(text):
     return match.group(0) if match else None
 
 def check_cti(ip_address):
-    """Checks the IP against AbuseIPDB."""
-    if not ip_address or not ABUSEIPDB_API_KEY or ABUSEIPDB_API_KEY == "YOUR_ACTUAL_ABUSEIPDB_KEY_HERE":
-        # If key is missing/placeholder, assume clean status for the demo
-        return {"status": "N/A - Key Missing", "score": 0}
-    
-    url = 'https://api.abuseipdb.com/api/v2/check'
-    params = {'ipAddress': ip_address, 'maxAgeInDays': '90'}
-    headers = {'Accept': 'application/json', 'Key': ABUSEIPDB_API_KEY}
-
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=3)
-        response.raise_for_status()
-        data = response.json().get('data', {})
-        score = data.get('abuseConfidenceScore', 0)
-        
-        if score > 60:
-            return {"status": "MALICIOUS", "score": score}
-        elif score > 20:
-            return {"status": "Suspicious", "score": score}
-        else:
-            return {"status": "CLEAN", "score": score}
-            
-    except requests.exceptions.RequestException:
-        return {"status": "API_ERROR", "score": 0}
+    """Checks the IP against AbuseIPDB (cached, rate-limited; see cti.py)."""
+    return CTI.check(ip_address)
+
+# Built-in rules plus the rule files in rule_engine.RULES_DIR, hot-reloaded
+ENGINE = RuleEngine(RULES)
+
+# Windowed rules over many events (thresholds, sequences); in memory, snapshotted to disk
+CORRELATOR = Correlator(CORRELATION_RULES)
+
+def match_rules(log_text, log_data=None):
+    """Every matching rule as (name, priority, message), highest priority first."""
+    return ENGINE.match(log_text, log_data)
+
+def match_rule(log_text, log_data=None):
+    """Name of the highest-priority matching rule, or None."""
+    matches = ENGINE.match(log_text, log_data)
+    return matches[0].name if matches else None
 
 def process_log(log_id, log_text, log_data):
     """The main function: checks rules, CTI, UEBA, and triggers SOAR."""
-    
-    ip_address = log_data.get('ip_address', extract_ip(log_text))
-    cti_result = check_cti(ip_address)
-    is_ueba_anomaly = check_anomaly(log_text, log_id) 
-
-    # 1. Rule Check
-    rule_hit = None
-    for rule in RULES:
-        if rule["keyword"] in log_text.lower():
-            rule_hit = rule["name"]
-            break
-
-    # 2. Decision Logic: Trigger Alert and SOAR Action
-    if rule_hit or cti_result["status"] == "MALICIOUS" or is_ueba_anomaly:
-        
-        # --- Create Local Alert (for dashboard display) ---
-        alert_name = rule_hit if rule_hit else "Intelligent Alert"
-        message = (
-            f"Rule: {rule_hit or 'N/A'}. "
-            f"CTI: {cti_result['status']} ({cti_result['score']}%). "
-            f"UEBA: {is_ueba_anomaly}. "
-            f"IP: {ip_address or 'None'}."
-        )
-        
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        c.execute("INSERT INTO alerts(rule_name, message, log_id, priority) VALUES(?,?,?,?)",
-                  (alert_name, message, log_id, 10))
-        conn.commit()
-        conn.close()
-        
-        print(f"[ALERT TRIGGERED] Rule: {alert_name}. CTI: {cti_result['status']}")
-
-        # 3. --- Execute SOAR Action (Full Integration: Calls Shuffle) ---
-        trigger_shuffle_workflow(log_id, alert_name, ip_address, cti_result, is_ueba_anomaly)
-
-        return alert_name
-            
-    return None
+    return process_batch([(log_id, log_text, log_data)])[0]
+
+def event_ip(log_text, log_data):
+    """The IP a log is about: its ip_address field, else the first IPv4 in its text."""
+    return log_data.get('ip_address', extract_ip(log_text))
+
+def evaluate_batch(events, cti_results=None, correlation=None, clock=None):
+    """
+    Runs rules, correlation, CTI and UEBA over a list of (log_text, log_data) without touching the database.
+    CTI is looked up once per distinct IP (unless `cti_results` already has every IP's answer)
+    and UEBA scores the whole batch in one model call.
+    Correlation goes through `correlation` (a CORRELATOR.batch() the caller commits once the
+    alerts are stored) at the events' `clock` values, (event time, log id). Without a batch the
+    windows are updated straight away; without a clock the events are taken to happen now.
+    Returns one (alert_name or None, [(rule_name, message, priority)], soar_args or None) per event.
+    """
+    if correlation is None:
+        with CORRELATOR.batch() as correlation:
+            decisions = evaluate_batch(events, cti_results, correlation, clock)
+            correlation.commit()
+        return decisions
+    if clock is None:
+        now = time.time()
+        clock = [CORRELATOR.point(now) for _ in events]
+    ip_addresses = [event_ip(text, data) for text, data in events]
+    if cti_results is None:
+        cti_results = CTI.check_many(ip_addresses)
+    anomalies = score_anomalies([text for text, _ in events], [data for _, data in events],
+                                [event_time for event_time, _ in clock])
+
+    # 1. Rule Check: all matching rules, highest priority first
+    rule_matches = [ENGINE.match(log_text, log_data) for log_text, log_data in events]
+    # ...then the windows each event completes (N failed logins from one IP, USB then malware, ...)
+    correlations = correlation.observe([
+        (log_text, {**log_data, 'ip_address': ip_address}, [m.name for m in matches], point)
+        for (log_text, log_data), ip_address, matches, point in zip(events, ip_addresses, rule_matches, clock)])
+
+    decisions = []
+    for ip_address, (is_ueba_anomaly, score, length), matches, correlated in zip(
+            ip_addresses, anomalies, rule_matches, correlations):
+        cti_result = cti_results[ip_address]
+        alerts = []
+        if is_ueba_anomaly:
+            rule_name, message, _, priority = anomaly_alert(None, score, length)
+            alerts.append((rule_name, message, priority))
+
+        details = {m.name: m.message for m in correlated}
+        if correlated:
+            matches = sorted(matches + correlated, key=lambda m: -m.priority)
+        rule_hit = matches[0].name if matches else None
+
+        # 2. Decision Logic: Trigger Alert and SOAR Action
+        if rule_hit or cti_result["status"] == "MALICIOUS" or is_ueba_anomaly:
+
+            # --- Create Local Alerts (for dashboard display): one per matching rule, at its priority ---
+            alert_name = rule_hit if rule_hit else "Intelligent Alert"
+            for name, priority in [(m.name, m.priority) for m in matches] or [(alert_name, 10)]:
+                message = (
+                    f"Rule: {name if matches else 'N/A'}. "
+                    + (f"Correlation: {details[name]} " if name in details else "") +
+                    f"CTI: {cti_result['status']} ({cti_result['score']}%). "
+                    f"UEBA: {is_ueba_anomaly}. "
+                    f"IP: {ip_address or 'None'}."
+                )
+                alerts.append((name, message, priority))
+            print(f"[ALERT TRIGGERED] Rule: {alert_name}. CTI: {cti_result['status']}")
+            decisions.append((alert_name, alerts, (alert_name, ip_address, cti_result, is_ueba_anomaly)))
+        else:
+            decisions.append((None, alerts, None))
+    return decisions
+
+def alert_rows(log_ids, decisions):
+    return [(rule_name, message, log_id, priority)
+            for log_id, (_, alerts, _) in zip(log_ids, decisions)
+            for rule_name, message, priority in alerts]
+
+def run_soar(log_ids, decisions):
+    # 3. --- Execute SOAR Action (Full Integration: Calls Shuffle) ---
+    # only after the alerts are committed, and never while holding the write lock
+    for log_id, (_, _, soar_args) in zip(log_ids, decisions):
+        if soar_args:
+            trigger_shuffle_workflow(log_id, *soar_args)
+
+def process_batch(events):
+    """
+    Runs the rule/CTI/UEBA/SOAR pipeline over already stored logs, given as
+    (log_id, log_text, log_data). All alerts are written in a single transaction.
+    Returns the triggered alert name (or None) for each event, in order.
+    """
+    log_ids = [log_id for log_id, _, _ in events]
+    now = time.time()
+    with CORRELATOR.batch() as correlation:
+        decisions = evaluate_batch([(text, data) for _, text, data in events], correlation=correlation,
+                                   clock=[(now, log_id) for log_id in log_ids])
+        insert_alerts(alert_rows(log_ids, decisions))
+        correlation.commit()
+    run_soar(log_ids, decisions)
+    return [alert_name for alert_name, _, _ in decisions]
@@ -0,0 +1,351 @@
+# vigilanteye/siem/rule_engine.py
+
+import fnmatch
+import ipaddress
+import json
+import os
+import re
+import threading
+import time
+import warnings
+from collections import namedtuple
+
+def _regex_parser():
+    """re's own pattern parser, for required_literal(); private API, so it may be missing."""
+    try:
+        from re import _parser  # Python 3.11+
+        return _parser
+    except ImportError:
+        pass
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import sre_parse
+        return sre_parse
+    except ImportError:
+        return None
+
+sre_parse = _regex_parser()   # None: regexes run without a literal prefilter
+
+try:
+    import ahocorasick  # pyahocorasick: C automaton, used when installed
+except ImportError:
+    ahocorasick = None
+
+try:
+    import yaml  # Sigma-style .yml rule files
+except ImportError:
+    yaml = None
+
+# --- Rule Engine Configuration ---
+RULES_DIR = os.environ.get("VIGILANTEYE_RULES_DIR", "rules.d")
+RELOAD_INTERVAL = 5      # seconds between checks of the rule files for changes
+MIN_LITERAL = 3          # shorter regex literals make a poor prefilter
+LINEAR_MAX_LITERALS = 128  # without pyahocorasick, fewer literals are faster found one `in` at a time
+FIELDS = ("source", "ip_address", "username")
+
+RuleMatch = namedtuple("RuleMatch", "name priority message")
+
+
+class RuleError(ValueError):
+    pass
+
+
+# --- Multi-pattern matching ---
+class Automaton:
+    """
+    Aho-Corasick automaton over a set of (lowercase) literals: one pass over the text
+    finds every literal it contains, however many there are. The pure-Python version
+    only pays off past LINEAR_MAX_LITERALS; below that each literal is looked up in turn.
+    """
+
+    def __init__(self, literals):
+        literals = sorted(set(literals))
+        self._c = None
+        self._linear = None
+        if ahocorasick is None and len(literals) <= LINEAR_MAX_LITERALS:
+            self._linear = literals
+            return
+        if ahocorasick is not None:
+            self._c = ahocorasick.Automaton()
+            for lit in literals:
+                self._c.add_word(lit, lit)
+            if literals:
+                self._c.make_automaton()
+            return
+
+        goto = [{}]
+        out = [()]
+        for lit in literals:
+            state = 0
+            for ch in lit:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = (lit,)
+
+        # breadth-first: a state's failure link is the longest proper suffix that is also a prefix
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def search(self, text):
+        """Set of literals occurring in `text`."""
+        if self._linear is not None:
+            return {lit for lit in self._linear if lit in text}
+        if self._c is not None:
+            if not len(self._c):
+                return set()
+            return {lit for _, lit in self._c.iter(text)}
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+def required_literal(pattern):
+    """
+    Longest run of plain characters every match of `pattern` must contain, lowercased;
+    None when there is no usable one (alternation at the top level, all wildcards, ...)
+    or no working regex parser.
+    """
+    if sre_parse is None:
+        return None
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+    best, run = "", []
+    for op, arg in parsed:
+        if op is sre_parse.BRANCH:
+            return None
+        if op is sre_parse.LITERAL:
+            run.append(chr(arg))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    if len(run) > len(best):
+        best = "".join(run)
+    return best.lower() if len(best) >= MIN_LITERAL else None
+
+
+def _parser_works():
+    try:
+        return required_literal(r"user=\d+ Failed Login") == " failed login" and required_literal("abcd|efgh") is None
+    except Exception:
+        return False
+
+# a future Python may change the private parser: then skip the prefilter rather than mis-filter
+if sre_parse is not None and not _parser_works():
+    sre_parse = None
+
+
+# --- Field conditions ---
+def _field_predicate(field, spec):
+    values = spec if isinstance(spec, list) else [spec]
+    exact, globs, networks = set(), [], []
+    for value in values:
+        value = str(value).strip().lower()
+        if field == "ip_address" and "/" in value:
+            try:
+                networks.append(ipaddress.ip_network(value, strict=False))
+                continue
+            except ValueError:
+                raise RuleError(f"invalid network {value!r} for ip_address")
+        if any(c in value for c in "*?["):
+            globs.append(value)
+        else:
+            exact.add(value)
+
+    def check(log_data):
+        value = str(log_data.get(field) or "").strip().lower()
+        if value in exact or any(fnmatch.fnmatchcase(value, g) for g in globs):
+            return True
+        if networks:
+            try:
+                ip = ipaddress.ip_address(value)
+            except ValueError:
+                return False
+            return any(ip in net for net in networks)
+        return False
+    return check
+
+
+class CompiledRules:
+    """One immutable, compiled rule set; RuleEngine swaps in a new one on reload."""
+
+    def __init__(self, rules):
+        self.rules = []
+        literals = []
+        self._keyword_rules = {}    # literal -> rule indexes satisfied by it
+        self._regex_by_literal = {} # literal -> regex indexes worth running when it's present
+        self._regexes = []          # (compiled, rule index)
+        self._unfiltered = []       # regex indexes with no usable literal: always run
+        self._field_only = []       # rule indexes with neither keywords nor regexes
+
+        for order, rule in enumerate(rules):
+            if not rule.get("enabled", True):
+                continue
+            name = rule.get("name")
+            if not name:
+                raise RuleError(f"rule #{order} has no name")
+            keywords = rule.get("keywords") or ([rule["keyword"]] if rule.get("keyword") else [])
+            regexes = rule.get("regexes") or ([rule["regex"]] if rule.get("regex") else [])
+            fields = rule.get("fields") or {}
+            unknown = set(fields) - set(FIELDS)
+            if unknown:
+                raise RuleError(f"rule {name!r}: unknown field(s) {', '.join(sorted(unknown))}")
+            if not (keywords or regexes or fields):
+                raise RuleError(f"rule {name!r} has no keyword, regex or field condition")
+
+            idx = len(self.rules)
+            self.rules.append({
+                "match": RuleMatch(name, int(rule.get("priority", 1)), rule.get("message", "")),
+                "order": order,
+                "keywords": bool(keywords),
+                "regexes": bool(regexes),
+                "fields": [_field_predicate(f, spec) for f, spec in fields.items()],
+            })
+            for kw in keywords:
+                kw = kw.lower()
+                literals.append(kw)
+                self._keyword_rules.setdefault(kw, []).append(idx)
+            for pattern in regexes:
+                try:
+                    compiled = re.compile(pattern, re.IGNORECASE)
+                except re.error as e:
+                    raise RuleError(f"rule {name!r}: bad regex {pattern!r}: {e}")
+                ridx = len(self._regexes)
+                self._regexes.append((compiled, idx))
+                lit = required_literal(pattern)
+                if lit:
+                    literals.append(lit)
+                    self._regex_by_literal.setdefault(lit, []).append(ridx)
+                else:
+                    self._unfiltered.append(ridx)
+            if not keywords and not regexes:
+                self._field_only.append(idx)
+
+        self.automaton = Automaton(literals)
+
+    def match(self, log_text, log_data=None):
+        """Every rule matching the event, highest priority first."""
+        log_data = log_data or {}
+        found = self.automaton.search((log_text or "").lower())
+
+        keyword_hits = set()
+        regex_candidates = set(self._unfiltered)
+        for lit in found:
+            keyword_hits.update(self._keyword_rules.get(lit, ()))
+            regex_candidates.update(self._regex_by_literal.get(lit, ()))
+        regex_hits = set()
+        for ridx in regex_candidates:
+            compiled, idx = self._regexes[ridx]
+            if idx not in regex_hits and compiled.search(log_text or ""):
+                regex_hits.add(idx)
+
+        matches = []
+        for idx in keyword_hits | regex_hits | set(self._field_only):
+            rule = self.rules[idx]
+            if rule["keywords"] and idx not in keyword_hits:
+                continue
+            if rule["regexes"] and idx not in regex_hits:
+                continue
+            if not all(check(log_data) for check in rule["fields"]):
+                continue
+            matches.append(rule)
+        matches.sort(key=lambda r: (-r["match"].priority, r["order"]))
+        return [r["match"] for r in matches]
+
+
+# --- Rule loading ---
+def load_rule_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yml", ".yaml")):
+            docs = [d for d in yaml.safe_load_all(f) if d]
+            data = docs[0] if len(docs) == 1 else docs
+        else:
+            data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("rules", [data])
+    if not isinstance(data, list):
+        raise RuleError(f"{path}: expected a rule or a list of rules")
+    return data
+
+
+class RuleEngine:
+    """
+    Built-in rules plus every rule file in `rules_dir` (.json, and .yml/.yaml when PyYAML is
+    installed), compiled into one CompiledRules. The files are re-checked at most every
+    RELOAD_INTERVAL seconds; a change recompiles and swaps the set in, a broken file keeps
+    the previous set running.
+    """
+
+    def __init__(self, builtin_rules=(), rules_dir=RULES_DIR, reload_interval=RELOAD_INTERVAL):
+        self.builtin_rules = list(builtin_rules)
+        self.rules_dir = rules_dir
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0.0
+        self.compiled = CompiledRules(self.builtin_rules)
+        self.reload()
+
+    def _rule_files(self):
+        if not self.rules_dir or not os.path.isdir(self.rules_dir):
+            return []
+        exts = (".json", ".yml", ".yaml") if yaml is not None else (".json",)
+        return sorted(os.path.join(self.rules_dir, f) for f in os.listdir(self.rules_dir) if f.endswith(exts))
+
+    def reload(self, force=False):
+        """Recompile if the rule files changed; returns True if a new rule set was swapped in."""
+        with self._lock:
+            self._checked = time.monotonic()
+            files = self._rule_files()
+            signature = []
+            for path in files:
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                signature.append((path, st.st_mtime_ns, st.st_size))
+            signature = tuple(signature)
+            if signature == self._signature and not force:
+                return False
+            try:
+                rules = list(self.builtin_rules)
+                for path, _, _ in signature:
+                    rules.extend(load_rule_file(path))
+                compiled = CompiledRules(rules)
+            except (OSError, ValueError, RuleError) as e:
+                print(f"!!! RULES ERROR: keeping previous rule set: {e} !!!")
+                self._signature = signature
+                return False
+            self.compiled = compiled
+            self._signature = signature
+        print(f"Rule engine loaded {len(compiled.rules)} rules from {len(signature)} file(s) + built-ins.")
+        return True
+
+    def match(self, log_text, log_data=None):
+        if time.monotonic() - self._checked >= self.reload_interval:
+            self.reload()
+        return self.compiled.match(log_text, log_data)
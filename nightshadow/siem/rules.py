@@ -7,16 +7,37 @@ RULES = [
         "message": "Immediate alert: Unauthorized USB device activity detected.",
         "priority": 8
     },
+    {
+        "name": "Critical: Malware Confirmation",
+        "keyword": "malware detected",
+        "message": "AV alert confirmation: Confirmed malware quarantined.",
+        "priority": 10
+    }
+]
+
+# Rules over several events (see correlation.py). group_by is ip_address, username or source;
+# a step matches on a keyword in the event text and/or the name of a rule above that matched it.
+CORRELATION_RULES = [
     {
         "name": "Suspicious: Failed Login Attempts",
-        "keyword": "failed login",
+        "type": "threshold",
+        "when": {"keyword": "failed login"},
+        "group_by": "ip_address",
+        "count": 5,
+        "window": 60,
         "message": "Multiple failed login attempts detected on endpoint.",
         "priority": 5
     },
     {
-        "name": "Critical: Malware Confirmation",
-        "keyword": "malware detected",
-        "message": "AV alert confirmation: Confirmed malware quarantined.",
+        "name": "Critical: USB Infection Chain",
+        "type": "sequence",
+        "steps": [
+            {"rule": "High Severity: USB Activity"},
+            {"rule": "Critical: Malware Confirmation"}
+        ],
+        "group_by": "source",
+        "window": 600,
+        "message": "USB device inserted and malware detected on the same host.",
         "priority": 10
     }
-]
\ No newline at end of file
+]
@@ -1,65 +1,307 @@
 # vigilanteye/siem/ueba.py
 
+import glob
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
 from sklearn.ensemble import IsolationForest
 import numpy as np
-import sqlite3
-from database import DB
+from database import connection, insert_alerts, log_time
+
+# --- UEBA Configuration ---
+MODEL_DIR = os.environ.get("VIGILANTEYE_MODEL_DIR", "models")
+RETRAIN_INTERVAL = int(os.environ.get("VIGILANTEYE_UEBA_RETRAIN", "3600"))  # seconds; 0 disables
+KEEP_MODELS = 3              # older model versions are deleted after a save
+TRAIN_CHUNK = 5000           # rows per query while streaming logs for training
+MAX_TRAIN_SAMPLES = 100000   # reservoir sample: training memory stays flat however big logs gets
+MIN_TRAIN_LOGS = 10
+MAX_PROFILES = 50000         # users + hosts with running statistics; least recently seen dropped
+MAX_HOSTS_PER_USER = 32
+
+ANOMALY_THRESHOLD = -0.1 # decision_function below this is a strong negative score (anomaly)
+
+# Bump when features() changes: models saved with another feature set are not loaded.
+FEATURE_VERSION = 2
+FEATURES = ("length", "user_length_z", "host_length_z", "user_gap_log", "new_host_for_user", "hour")
+
+
+# --- Per-user / per-host features ---
+class Profiles:
+    """
+    Running statistics per username and per source, updated one event at a time
+    (Welford mean/variance of message length, time of the last event, hosts a user
+    has been seen on), so a feature vector costs O(1) whatever the history.
+    """
+
+    def __init__(self, max_entries=MAX_PROFILES):
+        self.max_entries = max_entries
+        self.users = OrderedDict()   # username -> [count, mean, m2, last_ts, hosts]
+        self.hosts = OrderedDict()   # source -> [count, mean, m2, last_ts, None]
+        self.lock = threading.Lock()
+
+    def _entry(self, table, key):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, 0.0, 0.0, None, set() if table is self.users else None]
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _z(entry, value):
+        count, mean, m2 = entry[0], entry[1], entry[2]
+        if count < 2:
+            return 0.0
+        std = math.sqrt(m2 / (count - 1)) or 1.0
+        return max(-10.0, min(10.0, (value - mean) / std))
 
-# The global variable to hold the trained ML model
-ueba_model = None
+    @staticmethod
+    def _update(entry, value, ts):
+        entry[0] += 1
+        delta = value - entry[1]
+        entry[1] += delta / entry[0]
+        entry[2] += delta * (value - entry[1])
+        entry[3] = ts
+
+    def features(self, log_text, username, source, ts):
+        """The feature vector (see FEATURES) for one event, then folds the event into the profiles."""
+        length = len(log_text or "")
+        user = self._entry(self.users, (username or "").lower() or "-")
+        host_key = (source or "").lower() or "-"
+        host = self._entry(self.hosts, host_key)
+
+        gap = ts - user[3] if user[3] is not None else 86400.0
+        new_host = 1.0 if user[0] and host_key not in user[4] else 0.0
+        row = (length, self._z(user, length), self._z(host, length), math.log1p(max(gap, 0.0)), new_host,
+               time.gmtime(ts).tm_hour)
+
+        self._update(user, length, ts)
+        self._update(host, length, ts)
+        if len(user[4]) < MAX_HOSTS_PER_USER:
+            user[4].add(host_key)
+        return row
+
+
+# --- Training ---
+def stream_training_set(chunk=TRAIN_CHUNK, max_samples=MAX_TRAIN_SAMPLES):
+    """
+    Walks the logs table in id order, TRAIN_CHUNK rows per query (short reads, no long-lived
+    snapshot), building profiles as it goes. Returns (feature matrix, profiles, rows seen,
+    last log id); the matrix is a uniform reservoir sample of at most max_samples rows.
+    """
+    profiles = Profiles()
+    sample = np.empty((max_samples, len(FEATURES)), dtype=np.float64)
+    rnd = random.Random(42)
+    seen, last_id = 0, 0
+    while True:
+        with connection() as conn:
+            rows = conn.execute("SELECT id, event, username, source, timestamp FROM logs WHERE id > ? "
+                                "ORDER BY id LIMIT ?", (last_id, chunk)).fetchall()
+        if not rows:
+            break
+        for log_id, event, username, source, ts in rows:
+            row = profiles.features(event, username, source, log_time(ts))
+            if seen < max_samples:
+                sample[seen] = row
+            else:
+                slot = rnd.randint(0, seen)
+                if slot < max_samples:
+                    sample[slot] = row
+            seen += 1
+        last_id = rows[-1][0]
+    return sample[:min(seen, max_samples)], profiles, seen, last_id
+
+
+class UEBAModel:
+    """
+    The trained IsolationForest plus the live profiles. Models are saved under MODEL_DIR as
+    ueba-v<version>.joblib and the newest compatible one is loaded at start, so a restart (or
+    another worker process) scores with the same model. Retraining builds a complete new
+    model off to the side and swaps it in with one assignment; scoring never waits on it.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR):
+        self.model_dir = model_dir
+        self.current = None          # {"model", "version", "trained_at", "samples", "last_log_id"}
+        self.profiles = Profiles()
+        self._train_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._retrainer = None
+        self.load()
+
+    # --- Persistence ---
+    def _versions(self):
+        found = []
+        for path in glob.glob(os.path.join(self.model_dir, "ueba-v*.joblib")):
+            try:
+                found.append((int(os.path.basename(path)[6:-7]), path))
+            except ValueError:
+                continue
+        return sorted(found)
+
+    def load(self, newer_only=False):
+        """Loads the newest saved model with the current feature set; returns True if one was swapped in."""
+        for version, path in reversed(self._versions()):
+            if newer_only and self.current and version <= self.current["version"]:
+                return False
+            try:
+                bundle = joblib.load(path)
+            except Exception as e:
+                print(f"!!! UEBA: skipping unreadable model {path}: {e} !!!")
+                continue
+            if bundle.get("feature_version") != FEATURE_VERSION:
+                continue
+            bundle["version"] = version     # the version the file claimed, see save()
+            profiles = bundle.pop("profiles", None)
+            if profiles is not None and not self.profiles.users and not self.profiles.hosts:
+                profiles.lock = threading.Lock()
+                self.profiles = profiles
+            self.current = bundle
+            print(f"UEBA model v{version} loaded ({bundle['samples']} training samples).")
+            return True
+        return False
+
+    def save(self, bundle, profiles):
+        """
+        Writes the model to a temp file of its own, then hard-links it in as the next free
+        version: os.link fails if the name exists, so two processes saving at once get two
+        versions instead of one overwriting the other.
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".ueba-", suffix=".tmp", dir=self.model_dir)
+        lock, profiles.lock = profiles.lock, None   # locks don't pickle
+        try:
+            with os.fdopen(fd, "wb") as f:
+                joblib.dump({**bundle, "profiles": profiles}, f)
+            versions = self._versions()
+            version = max(versions[-1][0] + 1 if versions else 1, bundle["version"])
+            while True:
+                path = os.path.join(self.model_dir, f"ueba-v{version}.joblib")
+                try:
+                    os.link(tmp, path)
+                    break
+                except FileExistsError:
+                    version += 1
+        finally:
+            profiles.lock = lock
+            os.remove(tmp)
+        bundle["version"] = version
+        for _, old in self._versions()[:-KEEP_MODELS]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return path
+
+    # --- Training ---
+    def train(self):
+        """Trains a new model from the logs table, saves it and swaps it in. Returns the bundle or None."""
+        with self._train_lock:
+            started = time.time()
+            X, profiles, seen, last_id = stream_training_set()
+            if seen < MIN_TRAIN_LOGS:
+                print(f"Warning: Insufficient logs for training (<{MIN_TRAIN_LOGS}). Training skipped.")
+                return None
+            model = IsolationForest(contamination='auto', random_state=42)
+            model.fit(X)
+            bundle = {"model": model, "version": (self.current or {}).get("version", 0) + 1,
+                      "feature_version": FEATURE_VERSION, "features": FEATURES, "trained_at": time.time(),
+                      "samples": len(X), "logs_seen": seen, "last_log_id": last_id}
+            try:
+                self.save(bundle, profiles)
+            except OSError as e:
+                print(f"!!! UEBA: could not save model: {e} !!!")
+            if not self.profiles.users and not self.profiles.hosts:
+                # first model of this process: start from the history rather than from nothing
+                self.profiles = profiles
+            self.current = bundle
+            print(f"UEBA Model v{bundle['version']} trained successfully on {len(X)} of {seen} logs "
+                  f"in {time.time() - started:.1f}s!")
+            return bundle
+
+    def start_retraining(self, interval=RETRAIN_INTERVAL):
+        """Background thread: picks up models saved by other processes, retrains every `interval` seconds."""
+        if self._retrainer is not None or interval <= 0:
+            return
+        with self._start_lock:      # not _train_lock: a running /train_ueba must not hold up requests
+            if self._retrainer is not None:
+                return
+            self._retrainer = threading.Thread(target=self._retrain_loop, args=(interval,), name="ueba-retrain",
+                                               daemon=True)
+        self._retrainer.start()
+
+    def _retrain_loop(self, interval):
+        while True:
+            time.sleep(min(interval, 60))
+            try:
+                self.load(newer_only=True)
+                if self.current is None or time.time() - self.current["trained_at"] >= interval:
+                    self.train()
+            except Exception as e:
+                print(f"!!! UEBA: retraining failed: {e} !!!")
+
+    # --- Scoring ---
+    def score(self, log_texts, log_data=None, times=None):
+        """
+        Scores a batch of events with one decision_function call. Every event also updates
+        the profiles, whether or not a model is trained yet. `times` are the events' own
+        epoch times, as training uses; events without one are taken to happen now.
+        """
+        log_data = log_data or [{}] * len(log_texts)
+        times = times or [time.time()] * len(log_texts)
+        profiles = self.profiles
+        with profiles.lock:
+            rows = [profiles.features(text, data.get("username"), data.get("source"), ts)
+                    for text, data, ts in zip(log_texts, log_data, times)]
+        lengths = [len(text or "") for text in log_texts]
+        bundle = self.current        # one read: a concurrent swap can't mix two models in a batch
+        if bundle is None or not rows:
+            return [(False, None, n) for n in lengths]
+        scores = bundle["model"].decision_function(np.array(rows, dtype=np.float64))
+        return [(score < ANOMALY_THRESHOLD, score, n) for score, n in zip(scores, lengths)]
+
+    def stats(self):
+        bundle = self.current or {}
+        return {"version": bundle.get("version"), "trained_at": bundle.get("trained_at"),
+                "samples": bundle.get("samples"), "users": len(self.profiles.users),
+                "hosts": len(self.profiles.hosts)}
+
+
+UEBA = UEBAModel()
 
 def train_ueba_model():
-    """Trains the Isolation Forest model on log event lengths to establish a baseline."""
-    global ueba_model
-    conn = sqlite3.connect(DB)
-    # Fetch log events to train the model on log length as a behavioral metric
-    logs = conn.execute("SELECT event FROM logs").fetchall()
-    conn.close()
-
-    if len(logs) < 10:
-        print("Warning: Insufficient logs for training (<10). Training skipped.")
-        ueba_model = None
-        return 
-
-    # Prepare data for IsolationForest
-    data = [len(log[0]) for log in logs]
-    X = np.array(data).reshape(-1, 1)
-
-    # Train the model
-    ueba_model = IsolationForest(contamination='auto', random_state=42)
-    ueba_model.fit(X)
-    print("UEBA Model trained successfully!")
-
-def check_anomaly(log_text, log_id):
+    """Trains the Isolation Forest model on per-user/per-host behaviour to establish a baseline."""
+    return UEBA.train()
+
+def score_anomalies(log_texts, log_data=None, times=None):
+    """
+    Scores a list of log messages (and their log_data dicts, for the user/host features, and
+    event times) in one model call.
+    Returns a list of (is_anomaly, anomaly_score, log_length); all False if no model is trained.
     """
-    Checks a single log's length against the trained model using decision_function
+    return UEBA.score(log_texts, log_data, times)
+
+def anomaly_alert(log_id, anomaly_score, log_length):
+    """The (rule_name, message, log_id, priority) row for a UEBA alert."""
+    message = f"[UEBA ANOMALY] Score: {anomaly_score:.2f}. Length: {log_length} chars."
+    return ("UEBA Anomaly", message, log_id, 7)
+
+def check_anomaly(log_text, log_id, log_data=None):
+    """
+    Checks a single log against the trained model using decision_function
     to robustly identify anomalies, fixing the offset_ error.
     """
-    global ueba_model
-    if ueba_model is None:
-        return False
-    
-    log_length = len(log_text)
-    
-    # Use decision_function to get the anomaly score (lower score = higher anomaly)
-    try:
-        anomaly_score = ueba_model.decision_function(np.array([log_length]).reshape(1, -1))[0]
-    except AttributeError:
-        # Fallback in case of model load failure
-        return False
-    
-    # If the score is below the threshold, it is considered an anomaly
-    if anomaly_score < -0.1: # Threshold set to -0.1 for a strong negative score (anomaly)
-        
+    is_anomaly, anomaly_score, log_length = score_anomalies([log_text], [log_data or {}])[0]
+    if is_anomaly:
         # Insert a separate UEBA alert entry directly (since processor only returns True/False)
-        conn = sqlite3.connect(DB)
-        c = conn.cursor()
-        
-        message = f"[UEBA ANOMALY] Score: {anomaly_score:.2f}. Length: {log_length} chars."
-        c.execute("INSERT INTO alerts(rule_name, message, log_id, priority) VALUES(?,?,?,?)",
-                  ("UEBA Anomaly", message, log_id, 7))
-        conn.commit()
-        conn.close()
-        
+        insert_alerts([anomaly_alert(log_id, anomaly_score, log_length)])
         return True
-    return False
\ No newline at end of file
+    return False